@@ -6,7 +6,6 @@ This module contains API endpoints for the Cursus application.
 """
 
 import flask
-import datetime
 import json
 import os
 
@@ -15,16 +14,31 @@ from werkzeug import exceptions as WerkzeugExceptions
 
 from cursus.models import ActiveToken
 from cursus.util import CursusException
-from cursus.util.extensions import cache, db
+from cursus.util.metrics import (
+    RATE_LIMIT_REJECTIONS,
+    RESPONSE_CACHE,
+    TOKEN_CACHE,
+)
+from cursus.util.extensions import (
+    cache,
+    db,
+    limiter,
+    replicas,
+    response_cache,
+    token_cache,
+)
+from cursus.util.token_cache import MISSING
 
 from .search import (
     search_university,
     search_school,
     search_department,
     search_course,
+    search_all,
 )
 from .school import (
     school_by_id,
+    schools_by_ids,
     schools_by_univeristy_id,
 )
 from .university import (
@@ -33,8 +47,14 @@ from .university import (
     university_campuses_by_short_name,
     university_founders_by_short_name,
 )
-from .course import course_by_id, courses_by_department
-from .department import department_by_id, departments_by_university_id
+from .suggest import suggest
+from .export import export_courses, export_departments, export_schools
+from .course import course_by_id, courses_by_department, courses_by_ids
+from .department import (
+    department_by_id,
+    departments_by_ids,
+    departments_by_university_id,
+)
 
 
 def check_preflight_request(request: flask.Request) -> bool:
@@ -119,6 +139,10 @@ department_bp: Blueprint = Blueprint(
     name="department", import_name=__name__, url_prefix="/department/"
 )
 
+export_bp: Blueprint = Blueprint(
+    name="export", import_name=__name__, url_prefix="/export/"
+)
+
 ###############################################################################
 #                                                                             #
 #                                 Search API                                  #
@@ -137,6 +161,37 @@ search_bp.add_url_rule(
 
 search_bp.add_url_rule("/course", "course", view_func=search_course)
 
+search_bp.add_url_rule("/all", "all", view_func=search_all)
+
+###############################################################################
+#                                                                             #
+#                                 Suggest API                                 #
+#                                                                             #
+###############################################################################
+
+api_bp.add_url_rule("/suggest", "suggest", view_func=suggest, methods=["GET"])
+
+###############################################################################
+#                                                                             #
+#                                 Export API                                  #
+#                                                                             #
+###############################################################################
+
+export_bp.add_url_rule(
+    "/courses", "courses", view_func=export_courses, methods=["GET"]
+)
+
+export_bp.add_url_rule(
+    "/departments",
+    "departments",
+    view_func=export_departments,
+    methods=["GET"],
+)
+
+export_bp.add_url_rule(
+    "/schools", "schools", view_func=export_schools, methods=["GET"]
+)
+
 ###############################################################################
 #                                                                             #
 #                               University API                                #
@@ -189,6 +244,10 @@ school_bp.add_url_rule(
     methods=["GET"],
 )
 
+school_bp.add_url_rule(
+    "/batch", "batch", view_func=schools_by_ids, methods=["GET"]
+)
+
 ###############################################################################
 #                                                                             #
 #                                 Course API                                  #
@@ -206,6 +265,10 @@ course_bp.add_url_rule(
     methods=["GET"],
 )
 
+course_bp.add_url_rule(
+    "/batch", "batch", view_func=courses_by_ids, methods=["GET"]
+)
+
 ###############################################################################
 #                                                                             #
 #                               Department API                                #
@@ -226,6 +289,10 @@ department_bp.add_url_rule(
     methods=["GET"],
 )
 
+department_bp.add_url_rule(
+    "/batch", "batch", view_func=departments_by_ids, methods=["GET"]
+)
+
 
 @api_bp.route("/<path:path>", methods=["GET"])
 def not_found(path: str):
@@ -279,45 +346,80 @@ def before_request():
         )
 
     token = request.headers["X-CURSUS-API-TOKEN"]
-    token_from_cache = cache.get(token)
 
-    # Token is found from cache but it's blacklisted
-    if token_from_cache is False:
-        raise CursusException.UnauthorizedError("Invalid API Token")
+    # Hot tokens are validated by the in-process cache without any network
+    # round trip. Otherwise, the shared cache and then the database are used.
+    token_from_cache = token_cache.get(token)
+    token_source = "local"
 
-    # Token is found from cache and it's not revoked
-    if token_from_cache:
-        cache_item = json.loads(token_from_cache)
+    if token_from_cache is MISSING:
+        token_from_cache = cache.get(token)
+        token_source = "shared"
 
-        if "request_count" in cache_item and cache_item["request_count"] >= 50:
-            raise CursusException.ForbiddenError(
-                "API Token rate limit exceeded"
+        # No token is found from cache, so we need to check if there is one in
+        # db
+        if token_from_cache is None:
+            token_from_db = (
+                db.session.query(ActiveToken).filter_by(token=token).first()
             )
 
-        return None
+            # A token generated just now may not be on the replica yet
+            if token_from_db is None and replicas.reading_from_replica():
+                with replicas.primary():
+                    token_from_db = (
+                        db.session.query(ActiveToken)
+                        .filter_by(token=token)
+                        .first()
+                    )
 
-    # No token is found from cache, so we need to check if there is one in db
-    token_from_db = (
-        db.session.query(ActiveToken).filter_by(token=token).first()
-    )
+            if token_from_db is None:
+                raise CursusException.UnauthorizedError("Invalid API Token")
+
+            token_from_cache = token_from_db.user_id
+            token_source = "database"
+
+            # Cache the valid token for one hour (in seconds)
+            cache.set(token, token_from_cache, timeout=60 * 60)
+
+        token_cache.set(token, token_from_cache)
 
-    if token_from_db is None:
+    TOKEN_CACHE.inc(token_source)
+    flask.g.api_user = token_from_cache
+
+    # Token is found from cache but it's blacklisted
+    if token_from_cache is False:
         raise CursusException.UnauthorizedError("Invalid API Token")
 
-    now = datetime.datetime.utcnow()
+    # Users who just wrote read from the primary, which has their changes
+    replicas.follow(token_from_cache)
 
-    cache_item = {
-        "token": token_from_db.token,
-        "user_id": token_from_db.user_id,
-        "created": now.strftime("%a, %d %b %Y %H:%M:%S GMT"),
-        "expired": (now + datetime.timedelta(minutes=60)).strftime(
-            "%a, %d %b %Y %H:%M:%S GMT"
-        ),
-        "request_count": 0,
-    }
+    # Checking and consuming the rate limit is a single atomic operation, so
+    # parallel requests with the same token can't exceed the limit.
+    weight = limiter.weight_of(
+        flask.current_app.view_functions.get(request.endpoint), request
+    )
+    rate_limit = limiter.hit(token, weight)
+    flask.g.rate_limit = rate_limit
+    flask.g.rate_limit_weight = weight
+
+    if not rate_limit.allowed:
+        RATE_LIMIT_REJECTIONS.inc()
+        raise CursusException.ForbiddenError("API Token rate limit exceeded")
+
+    # Cached responses skip the endpoint handler, but only after the token has
+    # been validated and the request counted against the rate limit.
+    if response_cache.cacheable(request):
+        cached = response_cache.get(request)
+
+        if cached is not None:
+            RESPONSE_CACHE.inc("hit")
+            response = cached.to_response(request)
+            response.headers["X-Cursus-Cache"] = "HIT"
 
-    # Cache rate limit for one hour (in seconds)
-    cache.set(token, json.dumps(cache_item), timeout=60 * 60)
+            return response
+
+        RESPONSE_CACHE.inc("miss")
+        flask.g.response_cache_miss = True
 
 
 @api_bp.after_request
@@ -329,43 +431,35 @@ def after_request(response: flask.Response):
 
     make_cors_headers(response)
 
-    # A response that made it to the endpoint handler either succeeded (200) or
-    # failed (404) to retrieve the requested resource. In both cases, we want
-    # to increment the request count for the API token.
-    #
-    # Other HTTP status codes are already handled by the error handlers.
-    if response.status_code != 200 and response.status_code != 404:
-        return response
-
-    if request.method == "OPTIONS":
-        return response
-
-    token = request.headers["X-CURSUS-API-TOKEN"]
-    cache_item = cache.get(token)
-
-    cache_obj = json.loads(cache_item)
-    cache_obj["request_count"] += 1
+    if flask.g.pop("response_cache_miss", False):
+        if response.status_code == 200:
+            cached = response_cache.set(request, response)
 
-    # Compute the time to live up to one day starting from the time the token
-    # was first created.
+            response.set_etag(cached.etag)
+            response.headers["Cache-Control"] = "no-cache"
+            response.make_conditional(request)
 
-    expired_time = datetime.datetime.strptime(
-        cache_obj["expired"], "%a, %d %b %Y %H:%M:%S GMT"
-    )
+        response.headers["X-Cursus-Cache"] = "MISS"
 
-    ttl = expired_time - datetime.datetime.now()
+    rate_limit = flask.g.pop("rate_limit", None)
+    weight = flask.g.pop("rate_limit_weight", 1)
 
-    if ttl.seconds < 0:
-        ttl = datetime.timedelta(minutes=60)
+    if rate_limit is None:
+        return response
 
-    cache.set(token, json.dumps(cache_obj), timeout=ttl.seconds)
+    # A response that made it to the endpoint handler either succeeded (200) or
+    # failed (404) to retrieve the requested resource. A cached or conditional
+    # response (304) is served as well. In all cases, the request counts
+    # against the rate limit of the API token.
+    #
+    # Other HTTP status codes are handled by the error handlers, so the weight
+    # consumed by the request is given back.
+    if rate_limit.allowed and response.status_code not in (200, 304, 404):
+        limiter.refund(request.headers["X-CURSUS-API-TOKEN"], weight)
+        rate_limit.count -= weight
 
-    response.headers.add("X-Cursus-Limit", "50")
-    response.headers.add(
-        "X-Cursus-Remaining", str(50 - cache_obj["request_count"])
-    )
-    response.headers.add("X-Cursus-Start", cache_obj["created"])
-    response.headers.add("X-Cursus-TTL", str(ttl.seconds))
+    for header, value in rate_limit.headers().items():
+        response.headers[header] = value
 
     return response
 
@@ -439,3 +533,4 @@ api_bp.register_blueprint(university_bp)
 api_bp.register_blueprint(school_bp)
 api_bp.register_blueprint(course_bp)
 api_bp.register_blueprint(department_bp)
+api_bp.register_blueprint(export_bp)
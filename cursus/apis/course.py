@@ -7,7 +7,26 @@ Course API endpoint handlers
 import flask
 
 from cursus.models import Course
-from cursus.schema import CourseSchema
+from cursus.schema import CourseSchema, get_schema
+from cursus.util.batch import ids_weight, order_by_ids, parse_ids
+from cursus.util.extensions import limiter
+from cursus.util.pagination import SortKey, paginate_request
+
+COURSE_DUMP_FIELDS = (
+    "id",
+    "title",
+    "code",
+    "website",
+    "active",
+    "level",
+    "subject",
+    "modified_at",
+    "created_at",
+    "department_id",
+    "university_id",
+    "description",
+    "credits",
+)
 
 
 def _course_not_found_response(course_id):
@@ -43,28 +62,12 @@ def course_by_id(course_id: int):
 
     req = flask.request
 
-    dump_fields = (
-        "id",
-        "title",
-        "code",
-        "website",
-        "active",
-        "level",
-        "subject",
-        "modified_at",
-        "created_at",
-        "department_id",
-        "university_id",
-        "description",
-        "credits",
-    )
-
     courses = Course.query.filter(Course.id == course_id).first()
 
     if courses is None:
         return _course_not_found_response(course_id)
 
-    course_schema = CourseSchema(only=dump_fields)
+    course_schema = get_schema(CourseSchema, COURSE_DUMP_FIELDS)
 
     return flask.make_response(
         flask.jsonify(
@@ -77,12 +80,38 @@ def course_by_id(course_id: int):
     )
 
 
+@limiter.weighted(ids_weight)
+def courses_by_ids():
+    """Get a list of courses by their ids, in the requested order"""
+
+    req = flask.request
+
+    ids = parse_ids(req.args, flask.current_app.config["BATCH_MAX_IDS"])
+    courses = Course.query.filter(Course.id.in_(ids)).all()
+    found, missing = order_by_ids(ids, courses, lambda course: course.id)
+
+    course_schema = get_schema(CourseSchema, COURSE_DUMP_FIELDS, many=True)
+
+    response = flask.make_response(
+        flask.jsonify(
+            {
+                "message": "success",
+                "count": len(found),
+                "missing": missing,
+                "result": course_schema.dump(found),
+            }
+        )
+    )
+    response.mimetype = "application/json"
+
+    return response, 200
+
+
 def courses_by_department(department_id: int):
     """Get a list of courses by a department id"""
 
     req = flask.request
 
-    page = req.args.get("page", 1, type=int)
     filters = req.args.get("filters", None, type=str)
 
     dump_fields = (
@@ -116,17 +145,21 @@ def courses_by_department(department_id: int):
             elif f == "active":
                 courses = courses.filter(Course.active)
 
-    course_schema = CourseSchema(many=True, only=dump_fields)
+    course_schema = get_schema(CourseSchema, dump_fields, many=True)
 
-    course_page = courses.paginate(page=page, per_page=10, error_out=True)
+    course_page = paginate_request(
+        courses, [SortKey("id", Course.id)], req.args
+    )
 
     response = flask.make_response(
         flask.jsonify(
             {
                 "message": "success",
-                "page": page,
+                "page": course_page.page,
                 "total_pages": course_page.pages,
-                "total_results": courses.count(),
+                "total_results": course_page.total,
+                "has_next": course_page.has_next,
+                "next_cursor": course_page.next_cursor,
                 "results_per_page": 10,
                 "department_id": department_id,
                 "result": course_schema.dump(course_page, many=True),
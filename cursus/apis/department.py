@@ -7,7 +7,25 @@ Department API endpoint handlers
 import flask as fl
 
 from cursus.models import Department
-from cursus.schema import DepartmentSchema
+from cursus.schema import DepartmentSchema, get_schema
+from cursus.util.batch import ids_weight, order_by_ids, parse_ids
+from cursus.util.extensions import limiter
+from cursus.util.pagination import SortKey, paginate_request
+
+DEPARTMENT_DUMP_FIELDS = (
+    "id",
+    "name",
+    "code",
+    "website",
+    "undergraduate",
+    "graduate",
+    "active",
+    "special_name",
+    "created_at",
+    "modified_at",
+    "university_id",
+    "school_id",
+)
 
 
 def _department_not_found_response(department_id):
@@ -36,28 +54,45 @@ def department_by_id(department_id: int):
     if department is None:
         return _department_not_found_response(department_id)
 
-    dump_fields = (
-        "id",
-        "name",
-        "code",
-        "website",
-        "undergraduate",
-        "graduate",
-        "active",
-        "special_name",
-        "created_at",
-        "modified_at",
-        "university_id",
-        "school_id",
+    department_schema = get_schema(DepartmentSchema, DEPARTMENT_DUMP_FIELDS)
+
+    res = fl.make_response(
+        fl.jsonify(
+            {
+                "message": "success",
+                "result": department_schema.dump(department),
+            }
+        )
     )
 
-    department_schema = DepartmentSchema(only=dump_fields)
+    res.mimetype = "application/json"
+
+    return res, 200
+
+
+@limiter.weighted(ids_weight)
+def departments_by_ids():
+    """Get a list of departments by their ids, in the requested order"""
+
+    req = fl.request
+
+    ids = parse_ids(req.args, fl.current_app.config["BATCH_MAX_IDS"])
+    departments = Department.query.filter(Department.id.in_(ids)).all()
+    found, missing = order_by_ids(
+        ids, departments, lambda department: department.id
+    )
+
+    department_schema = get_schema(
+        DepartmentSchema, DEPARTMENT_DUMP_FIELDS, many=True
+    )
 
     res = fl.make_response(
         fl.jsonify(
             {
                 "message": "success",
-                "result": department_schema.dump(department),
+                "count": len(found),
+                "missing": missing,
+                "result": department_schema.dump(found),
             }
         )
     )
@@ -72,7 +107,6 @@ def departments_by_university_id(university_id: int):
 
     req = fl.request
 
-    page = req.args.get("page", default=1, type=int)
     school_id = req.args.get("school_id", default=None, type=str)
     filter = req.args.get("filter", default=None, type=str)
 
@@ -105,19 +139,23 @@ def departments_by_university_id(university_id: int):
         "modified_at": False,
     }
 
-    department_page = departments.paginate(page=page, per_page=10)
+    department_page = paginate_request(
+        departments, [SortKey("id", Department.id)], req.args
+    )
 
     only_fields = [k for k, v in dump_fields.items() if v]
-    department_schema = DepartmentSchema(only=only_fields)
+    department_schema = get_schema(DepartmentSchema, only_fields)
 
     res = fl.make_response(
         fl.jsonify(
             {
                 "message": "success",
                 "university_id": university_id,
-                "page": page,
+                "page": department_page.page,
                 "total_pages": department_page.pages,
-                "total_results": departments.count(),
+                "total_results": department_page.total,
+                "has_next": department_page.has_next,
+                "next_cursor": department_page.next_cursor,
                 "max_results_per_page": 10,
                 "results": department_schema.dump(department_page, many=True),
             }
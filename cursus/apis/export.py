@@ -0,0 +1,195 @@
+# -*- coding: utf-8 -*-
+
+"""
+Bulk export endpoint handlers
+
+An export streams every matching row as NDJSON or CSV. Rows are read from a
+server-side cursor in batches of `EXPORT_BATCH_SIZE` and serialized batch by
+batch into a generator response, so memory use doesn't depend on the size of
+the export. The response is gzip-compressed on the fly for clients that
+accept it. An export counts once against the rate limit, like any request.
+"""
+
+import io
+import csv
+import json
+import zlib
+
+from typing import Iterator, Sequence
+
+import flask
+import sqlalchemy as sa
+
+from cursus.models import Course, Department, School
+from cursus.schema import CourseSchema, DepartmentSchema, SchoolSchema
+from cursus.schema.fast import get_row_serializer
+from cursus.util.exceptions import BadRequestError
+from cursus.util.extensions import db
+
+from .course import COURSE_DUMP_FIELDS
+from .department import DEPARTMENT_DUMP_FIELDS
+
+SCHOOL_EXPORT_FIELDS = (
+    "id",
+    "name",
+    "website",
+    "university_id",
+    "created_at",
+    "modified_at",
+)
+
+# Media types of the export formats
+EXPORT_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+
+def _columns(model, fields: Sequence[str]) -> list[sa.Column]:
+    table = model.__table__
+
+    return [table.c[name] for name in fields if name in table.c]
+
+
+def _ndjson(serialized: Iterator[list[dict]], fields) -> Iterator[str]:
+    for items in serialized:
+        yield "".join(
+            json.dumps(item, separators=(",", ":")) + "\n" for item in items
+        )
+
+
+def _csv_value(value):
+    if isinstance(value, bool):
+        return "true" if value else "false"
+
+    return value
+
+
+def _csv(serialized: Iterator[list[dict]], fields) -> Iterator[str]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    writer.writerow(fields)
+
+    for items in serialized:
+        writer.writerows(
+            [_csv_value(item.get(name)) for name in fields] for item in items
+        )
+
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+    # The header of an empty export
+    yield buffer.getvalue()
+
+
+def _gzip(chunks: Iterator[str]) -> Iterator[bytes]:
+    compressor = zlib.compressobj(wbits=16 + zlib.MAX_WBITS)
+
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode())
+
+        if data:
+            yield data
+
+    yield compressor.flush()
+
+
+def _export(name: str, statement: sa.Select, schema_cls, fields):
+    req = flask.request
+
+    export_format = req.args.get("format", "ndjson", type=str).lower()
+
+    if export_format not in EXPORT_FORMATS:
+        raise BadRequestError(
+            f"Query string `format` must be one of "
+            f"{', '.join(EXPORT_FORMATS)}"
+        )
+
+    batch_size = int(flask.current_app.config["EXPORT_BATCH_SIZE"])
+    serializer = get_row_serializer(schema_cls, fields)
+    encode = _ndjson if export_format == "ndjson" else _csv
+
+    def serialized() -> Iterator[list[dict]]:
+        # `yield_per` streams the rows from a server-side cursor instead of
+        # buffering the whole result
+        result = db.session.execute(
+            statement.execution_options(yield_per=batch_size)
+        )
+
+        try:
+            for rows in result.partitions():
+                yield serializer.dump(rows)
+        finally:
+            result.close()
+
+    chunks = encode(serialized(), fields)
+    headers = {
+        "Content-Disposition": (
+            f'attachment; filename="{name}.{export_format}"'
+        ),
+        "Vary": "Accept-Encoding",
+    }
+
+    if "gzip" in req.accept_encodings:
+        chunks = _gzip(chunks)
+        headers["Content-Encoding"] = "gzip"
+
+    return flask.Response(
+        flask.stream_with_context(chunks),
+        mimetype=EXPORT_FORMATS[export_format],
+        headers=headers,
+    )
+
+
+def export_courses():
+    """Export courses, optionally of a university or a department"""
+
+    req = flask.request
+
+    university = req.args.get("university", None, type=int)
+    department = req.args.get("department", None, type=int)
+
+    statement = sa.select(*_columns(Course, COURSE_DUMP_FIELDS)).order_by(
+        Course.id
+    )
+
+    if university is not None:
+        statement = statement.where(Course.university_id == university)
+
+    if department is not None:
+        statement = statement.where(Course.department_id == department)
+
+    return _export("courses", statement, CourseSchema, COURSE_DUMP_FIELDS)
+
+
+def export_departments():
+    """Export departments, optionally of a university"""
+
+    university = flask.request.args.get("university", None, type=int)
+
+    statement = sa.select(
+        *_columns(Department, DEPARTMENT_DUMP_FIELDS)
+    ).order_by(Department.id)
+
+    if university is not None:
+        statement = statement.where(Department.university_id == university)
+
+    return _export(
+        "departments", statement, DepartmentSchema, DEPARTMENT_DUMP_FIELDS
+    )
+
+
+def export_schools():
+    """Export schools, optionally of a university"""
+
+    university = flask.request.args.get("university", None, type=int)
+
+    statement = sa.select(*_columns(School, SCHOOL_EXPORT_FIELDS)).order_by(
+        School.id
+    )
+
+    if university is not None:
+        statement = statement.where(School.university_id == university)
+
+    return _export("schools", statement, SchoolSchema, SCHOOL_EXPORT_FIELDS)
@@ -5,19 +5,14 @@ School API endpoint handlers
 """
 
 import flask
-import sqlalchemy as sa
 
-from cursus.schema import SchoolSchema
-from cursus.models import School, Department
-from cursus.util.extensions import db
+from sqlalchemy.orm import selectinload
 
-
-def _map_school_with_count(school):
-    if school is None:
-        return None
-
-    school[0].total_departments = school[1]
-    return school[0]
+from cursus.schema import SchoolSchema, get_schema
+from cursus.models import School
+from cursus.util.batch import ids_weight, order_by_ids, parse_ids
+from cursus.util.extensions import limiter
+from cursus.util.pagination import SortKey, paginate_request
 
 
 def schools_by_univeristy_id(university_id: int):
@@ -25,7 +20,6 @@ def schools_by_univeristy_id(university_id: int):
 
     req = flask.request
 
-    page = req.args.get("page", 1, type=int)
     sort_by = req.args.get("sort_by", None, type=str)
 
     dump_fields = (
@@ -37,25 +31,20 @@ def schools_by_univeristy_id(university_id: int):
         "total_departments",
     )
 
-    schools = (
-        db.session.query(
-            School,
-            sa.func.coalesce(sa.func.count(Department.id), 0).label(
-                "total_departments"
-            ),
-        )
-        .outerjoin(Department, full=True)
-        .group_by(School.id)
-        .filter(
-            School.university_id == university_id,
-        )
-    )
+    schools = School.query.filter(School.university_id == university_id)
+
+    sort_keys = [SortKey("id", School.id)]
 
     if sort_by:
         if sort_by == "name":
             schools = schools.order_by(School.name)
+            sort_keys.insert(0, SortKey("name", School.name))
         elif sort_by == "depnum":
-            schools = schools.order_by(sa.desc("total_departments"))
+            schools = schools.order_by(School.department_count.desc())
+            sort_keys.insert(
+                0,
+                SortKey("depnum", School.department_count, descending=True),
+            )
 
     if schools is None:
         return flask.make_response(
@@ -68,19 +57,19 @@ def schools_by_univeristy_id(university_id: int):
             200,
         )
 
-    school_schema = SchoolSchema(only=dump_fields)
-
-    school_page = schools.paginate(page=page, per_page=10, error_out=True)
+    school_schema = get_schema(SchoolSchema, dump_fields)
 
-    school_page.items = list(map(_map_school_with_count, school_page.items))
+    school_page = paginate_request(schools, sort_keys, req.args)
 
     response = flask.make_response(
         flask.jsonify(
             {
                 "message": "Success",
-                "total": schools.count(),
-                "page": page,
+                "total": school_page.total,
+                "page": school_page.page,
                 "pages": school_page.pages,
+                "has_next": school_page.has_next,
+                "next_cursor": school_page.next_cursor,
                 "university_id": university_id,
                 "result": school_schema.dump(school_page, many=True),
             }
@@ -109,36 +98,22 @@ def school_by_id(id: int):
         "total_departments": True,
     }
 
-    school = (
-        db.session.query(
-            School,
-            sa.func.coalesce(sa.func.count(Department.id), 0).label(
-                "total_departments"
-            ),
-        )
-        .outerjoin(Department, full=True)
-        .group_by(School.id)
-        .filter(
-            School.id == id,
-        )
-        .first()
-    )
+    school = School.query.filter(School.id == id)
 
     if show_departments:
         dump_fields["departments"] = True
+        school = school.options(selectinload(School.departments))
 
-    if school is not None:
-        print(school)
-        school[0].total_departments = school[1]
+    school = school.first()
 
     only_fields = tuple([key for key, value in dump_fields.items() if value])
-    school_schema = SchoolSchema(only=only_fields)
+    school_schema = get_schema(SchoolSchema, only_fields)
 
     response = flask.make_response(
         flask.jsonify(
             {
                 "message": "Success" if school else "Not found",
-                "result": school_schema.dump(school[0] if school else None),
+                "result": school_schema.dump(school),
             }
         )
     )
@@ -146,3 +121,47 @@ def school_by_id(id: int):
     response.mimetype = "application/json"
 
     return response, 200
+
+
+@limiter.weighted(ids_weight)
+def schools_by_ids():
+    """Get a list of schools by their ids, in the requested order"""
+
+    req = flask.request
+
+    show_departments = req.args.get("show_deps", "false").lower() == "true"
+    ids = parse_ids(req.args, flask.current_app.config["BATCH_MAX_IDS"])
+
+    dump_fields = [
+        "id",
+        "name",
+        "university_id",
+        "website",
+        "created_at",
+        "modified_at",
+        "total_departments",
+    ]
+
+    schools = School.query.filter(School.id.in_(ids))
+
+    if show_departments:
+        dump_fields.append("departments")
+        schools = schools.options(selectinload(School.departments))
+
+    found, missing = order_by_ids(ids, schools.all(), lambda school: school.id)
+
+    school_schema = get_schema(SchoolSchema, dump_fields, many=True)
+
+    response = flask.make_response(
+        flask.jsonify(
+            {
+                "message": "Success",
+                "count": len(found),
+                "missing": missing,
+                "result": school_schema.dump(found),
+            }
+        )
+    )
+    response.mimetype = "application/json"
+
+    return response, 200
@@ -9,13 +9,17 @@ import sqlalchemy as sa
 
 from typing import Optional
 
+from sqlalchemy.orm import selectinload
+
 from cursus.util.extensions import db
 from cursus.schema import (
     UniversitySchema,
     SchoolSchema,
     DepartmentSchema,
     CourseSchema,
+    get_schema,
 )
+from cursus.schema.fast import get_row_serializer
 from cursus.models import (
     University,
     UniversityCampus,
@@ -23,23 +27,53 @@ from cursus.models import (
     Department,
     Course,
 )
+from cursus.models.course import SEARCH_DOCUMENT
 from cursus.util.exceptions import (
     BadRequestError,
 )
+from cursus.util.facets import Facet, facet_counts, parse_facets
+from cursus.util.pagination import SortKey, paginate_request
+from cursus.util.search import get_search_backend
 
+# Columns of a course row, without the full-text document
+COURSE_COLUMNS = tuple(
+    column for column in Course.__table__.c if column.key != "search_vector"
+)
 
-def _search_require_query_string(query: Optional[str]):
-    if not query:
-        raise BadRequestError(
-            "Query string cannot be empty while using this endpoint"
-        )
+# Display names of the course levels
+COURSE_LEVELS = {1: "undergraduate", 2: "graduate", 3: "doctorate"}
+
+# Facets of the course and department searches, by columns of their queries
+COURSE_FACETS = (
+    Facet(
+        "level",
+        "level",
+        format=lambda level: COURSE_LEVELS.get(level, "unknown"),
+    ),
+    Facet("subject", "subject"),
+    Facet("university", "university_id", label="university_name"),
+    Facet("active", "active"),
+)
+DEPARTMENT_FACETS = (
+    Facet("university", "university_id", label="university_name"),
+    Facet("school", "school_id", label="school_name"),
+    Facet("type", "type"),
+    Facet("undergraduate", "undergraduate"),
+    Facet("graduate", "graduate"),
+    Facet("active", "active"),
+)
+
+# Default and maximum number of results per entity of the federated search
+SEARCH_ALL_LIMIT = 5
+SEARCH_ALL_MAX_LIMIT = 20
+
+# Modes of the course search: substring of the title, or keywords of the
+# title, subject and description
+COURSE_SEARCH_MODES = ("title", "fulltext")
 
-    if len(query) < 3:
-        raise BadRequestError(
-            "Query string must be at least 3 characters long"
-        )
 
-    return f"%{query}%"
+def _search_require_query_string(query: Optional[str]):
+    return get_search_backend().validate(query)
 
 
 def _map_item_school_search(item: tuple[School, str]):
@@ -53,7 +87,6 @@ def search_university():
 
     req = flask.request
 
-    page = req.args.get("page", 1, type=int)
     before = req.args.get("beofore", None, type=int)
     after = req.args.get("after", None, type=int)
     query = req.args.get("query", None, type=str)
@@ -77,7 +110,7 @@ def search_university():
     }
 
     universities = University.query.filter(
-        University.full_name.ilike(search_string)
+        get_search_backend().contains(University.full_name, search_string)
     )
 
     if country_code:
@@ -119,27 +152,37 @@ def search_university():
         elif after is not None:
             universities = universities.filter(University.established <= after)
 
+    sort_keys = [SortKey("id", University.id)]
+
     if sort_by_year:
+        established = sa.func.coalesce(University.established, 0)
+
+        # Both pagination modes sort on the same expression, so universities
+        # without a founding year are at the same place in either mode
         if sort_by_year == "asc":
-            universities = universities.order_by(University.established.asc())
+            universities = universities.order_by(established.asc())
+            sort_keys.insert(0, SortKey("established", established))
         elif sort_by_year == "desc":
-            universities = universities.order_by(University.established.desc())
+            universities = universities.order_by(established.desc())
+            sort_keys.insert(
+                0, SortKey("established", established, descending=True)
+            )
 
     only_fields = tuple([key for key, value in dump_fields.items() if value])
-    university_schema = UniversitySchema(only=only_fields)
+    university_schema = get_schema(UniversitySchema, only_fields)
 
-    university_page = universities.paginate(
-        page=page, per_page=10, error_out=True
-    )
+    university_page = paginate_request(universities, sort_keys, req.args)
 
     response = flask.make_response(
         flask.jsonify(
             {
                 "message": "Success",
-                "total": universities.count(),
+                "total": university_page.total,
                 "count": len(university_page.items),
-                "page": page,
+                "page": university_page.page,
                 "pages": university_page.pages,
+                "has_next": university_page.has_next,
+                "next_cursor": university_page.next_cursor,
                 "results": university_schema.dump(university_page, many=True),
             }
         )
@@ -155,7 +198,6 @@ def search_school():
 
     req = flask.request
 
-    page = req.args.get("page", 1, type=int)
     query = req.args.get("query", None, type=str)
     display = req.args.get("display", None, type=str)
 
@@ -180,7 +222,7 @@ def search_school():
         .outerjoin(
             University,
         )
-        .filter(School.name.ilike(search_string))
+        .filter(get_search_backend().contains(School.name, search_string))
     )
 
     if display:
@@ -200,9 +242,14 @@ def search_school():
                 if filter_display == "departments":
                     dump_fields["departments"] = True
 
+    if dump_fields["departments"]:
+        schools = schools.options(selectinload(School.departments))
+
     only_fields = tuple([key for key, value in dump_fields.items() if value])
-    school_schema = SchoolSchema(only=only_fields)
-    school_page = schools.paginate(page=page, per_page=10, error_out=True)
+    school_schema = get_schema(SchoolSchema, only_fields)
+    school_page = paginate_request(
+        schools, [SortKey("id", School.id)], req.args
+    )
 
     school_page.items = list(map(_map_item_school_search, school_page.items))
 
@@ -210,10 +257,12 @@ def search_school():
         flask.jsonify(
             {
                 "message": "Success",
-                "total": schools.count(),
+                "total": school_page.total,
                 "count": len(school_page.items),
-                "page": page,
+                "page": school_page.page,
                 "pages": school_page.pages,
+                "has_next": school_page.has_next,
+                "next_cursor": school_page.next_cursor,
                 "results": school_schema.dump(school_page, many=True),
             }
         )
@@ -229,12 +278,12 @@ def search_department():
 
     req = flask.request
 
-    page = req.args.get("page", 1, type=int)
     query = req.args.get("query", None, type=str)
     filters = req.args.get("filters", None, type=str)
     display = req.args.get("display", None, type=str)
 
     search_string = _search_require_query_string(query)
+    facets = parse_facets(req.args, DEPARTMENT_FACETS)
 
     default_fields = {
         "id": True,
@@ -262,7 +311,7 @@ def search_department():
         .select_from(Department)
         .join(School, onclause=School.id == Department.school_id)
         .join(University, onclause=University.id == Department.university_id)
-        .filter(Department.name.ilike(search_string))
+        .filter(get_search_backend().contains(Department.name, search_string))
     )
 
     if filters:
@@ -308,23 +357,26 @@ def search_department():
     only_fields = tuple(
         [key for key, value in default_fields.items() if value]
     )
-    department_schema = DepartmentSchema(only=only_fields)
-    department_page = departments.paginate(
-        page=page, per_page=10, error_out=True
+    # Rows are flat column tuples, so they skip Marshmallow's generic dump
+    department_serializer = get_row_serializer(DepartmentSchema, only_fields)
+    department_page = paginate_request(
+        departments, [SortKey("id", Department.id)], req.args
     )
+    body = {
+        "message": "Success",
+        "total": department_page.total,
+        "count": len(department_page.items),
+        "page": department_page.page,
+        "pages": department_page.pages,
+        "has_next": department_page.has_next,
+        "next_cursor": department_page.next_cursor,
+        "results": department_serializer.dump(department_page),
+    }
 
-    response = flask.make_response(
-        flask.jsonify(
-            {
-                "message": "Success",
-                "total": departments.count(),
-                "count": len(department_page.items),
-                "page": page,
-                "pages": department_page.pages,
-                "results": department_schema.dump(department_page, many=True),
-            }
-        )
-    )
+    if facets:
+        body["facets"] = facet_counts(db.session, departments, facets)
+
+    response = flask.make_response(flask.jsonify(body))
 
     response.mimetype = "application/json"
 
@@ -332,11 +384,10 @@ def search_department():
 
 
 def search_course():
-    """Search courses based on their names"""
+    """Search courses by title, or by keywords with `mode=fulltext`"""
 
     req = flask.request
 
-    page = req.args.get("page", 1, type=int)
     query = req.args.get("query", None, type=str)
     filters = req.args.get("filters", None, type=str)
     displays = req.args.get("display", None, type=str)
@@ -344,6 +395,13 @@ def search_course():
     sort_by = req.args.get("sort_by", None, type=str)
     department = req.args.get("department", None, type=int)
     university = req.args.get("university", None, type=int)
+    mode = req.args.get("mode", "title", type=str)
+
+    if mode not in COURSE_SEARCH_MODES:
+        raise BadRequestError(
+            f"Query string `mode` must be one of "
+            f"{', '.join(COURSE_SEARCH_MODES)}"
+        )
 
     if not query:
         raise BadRequestError(
@@ -351,6 +409,7 @@ def search_course():
         )
 
     search_string = _search_require_query_string(query)
+    facets = parse_facets(req.args, COURSE_FACETS)
 
     dump_fields = {
         "id": True,
@@ -370,16 +429,35 @@ def search_course():
         "modified_at": False,
     }
 
-    courses = (
-        db.session.query(
-            *Course.__table__.c,
-            Department.name.label("department_name"),
-            University.full_name.label("university_name"),
+    backend = get_search_backend()
+    columns = [
+        *COURSE_COLUMNS,
+        Department.name.label("department_name"),
+        University.full_name.label("university_name"),
+    ]
+    rank = None
+
+    if mode == "fulltext":
+        predicate, rank = backend.fulltext(
+            Course.search_vector, SEARCH_DOCUMENT, search_string
+        )
+        columns.append(rank.label("rank"))
+        columns.append(
+            backend.headline(Course.description, search_string).label(
+                "highlight"
+            )
         )
+        dump_fields["rank"] = True
+        dump_fields["highlight"] = True
+    else:
+        predicate = backend.contains(Course.title, search_string)
+
+    courses = (
+        db.session.query(*columns)
         .select_from(Course)
         .join(Department, onclause=Department.id == Course.department_id)
         .join(University, onclause=University.id == Department.university_id)
-        .filter(Course.title.ilike(search_string))
+        .filter(predicate)
     )
 
     if department:
@@ -404,11 +482,20 @@ def search_course():
             if f == "doctorate":
                 courses = courses.filter(Course.level == 3)
 
+    sort_keys = [SortKey("id", Course.id)]
+
     if sort_by:
         if sort_by == "credits":
             courses = courses.order_by(Course.credits.desc())
+            sort_keys.insert(
+                0, SortKey("credits", Course.credits, descending=True)
+            )
         elif sort_by == "code":
             courses = courses.order_by(Course.code.asc())
+            sort_keys.insert(0, SortKey("code", Course.code))
+    elif rank is not None:
+        courses = courses.order_by(rank.desc(), Course.id.asc())
+        sort_keys.insert(0, SortKey("rank", rank, descending=True))
 
     if subject:
         courses = courses.filter(Course.subject.ilike(f"%{subject}%"))
@@ -424,20 +511,130 @@ def search_course():
                     dump_fields[d] = True
 
     only_fields = tuple([key for key, value in dump_fields.items() if value])
-    course_page = courses.paginate(page=page, per_page=10, error_out=True)
-    course_schema = CourseSchema(only=only_fields)
+    course_page = paginate_request(courses, sort_keys, req.args)
+    course_serializer = get_row_serializer(CourseSchema, only_fields)
+    body = {
+        "message": "Success",
+        "total": course_page.total,
+        "count": len(course_page.items),
+        "page": course_page.page,
+        "pages": course_page.pages,
+        "has_next": course_page.has_next,
+        "next_cursor": course_page.next_cursor,
+        "results": course_serializer.dump(course_page),
+    }
+
+    if facets:
+        body["facets"] = facet_counts(db.session, courses, facets)
+
+    response = flask.make_response(flask.jsonify(body))
+
+    return response, 200
+
+
+def _search_all_branch(
+    entity: str, id, name, code, university_id, predicate, limit: int
+):
+    # The window count runs over every match before the limit, so a branch
+    # returns its total along with its top rows
+    return sa.select(
+        sa.select(
+            sa.literal(entity).label("entity"),
+            id.label("id"),
+            name.label("name"),
+            code.label("code"),
+            university_id.label("university_id"),
+            sa.func.count().over().label("total"),
+        )
+        .where(predicate)
+        .order_by(id)
+        .limit(limit)
+        .subquery()
+    )
+
+
+def search_all():
+    """Search universities, schools, departments and courses at once"""
+
+    req = flask.request
+
+    query = req.args.get("query", None, type=str)
+    limit = req.args.get("limit", SEARCH_ALL_LIMIT, type=int)
+
+    search_string = _search_require_query_string(query)
+    limit = max(1, min(limit, SEARCH_ALL_MAX_LIMIT))
+
+    backend = get_search_backend()
+    no_code = sa.cast(sa.null(), sa.String)
+
+    # A single `UNION ALL` statement fetches the top rows and the total of
+    # every entity in one round trip
+    statement = sa.union_all(
+        _search_all_branch(
+            "university",
+            University.id,
+            University.full_name,
+            University.short_name,
+            University.id,
+            backend.contains(University.full_name, search_string),
+            limit,
+        ),
+        _search_all_branch(
+            "school",
+            School.id,
+            School.name,
+            no_code,
+            School.university_id,
+            backend.contains(School.name, search_string),
+            limit,
+        ),
+        _search_all_branch(
+            "department",
+            Department.id,
+            Department.name,
+            Department.code,
+            Department.university_id,
+            backend.contains(Department.name, search_string),
+            limit,
+        ),
+        _search_all_branch(
+            "course",
+            Course.id,
+            Course.title,
+            Course.code,
+            Course.university_id,
+            backend.contains(Course.title, search_string),
+            limit,
+        ),
+    )
+
+    results = {
+        entity: {"total": 0, "results": []}
+        for entity in ("university", "school", "department", "course")
+    }
+
+    for row in db.session.execute(statement):
+        group = results[row.entity]
+        group["total"] = row.total
+        group["results"].append(
+            {
+                "id": row.id,
+                "name": row.name,
+                "code": row.code,
+                "university_id": row.university_id,
+            }
+        )
 
     response = flask.make_response(
         flask.jsonify(
             {
                 "message": "Success",
-                "total": courses.count(),
-                "count": len(course_page.items),
-                "page": page,
-                "pages": course_page.pages,
-                "results": course_schema.dump(course_page, many=True),
+                "total": sum(group["total"] for group in results.values()),
+                "results": results,
             }
         )
     )
 
+    response.mimetype = "application/json"
+
     return response, 200
@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+
+"""
+Suggest (typeahead) endpoint handler
+"""
+
+import flask
+
+from cursus.util.exceptions import BadRequestError
+from cursus.util.extensions import limiter, suggest_index
+
+# Types of the suggestions, in the order of the `type` argument
+SUGGEST_TYPES = ("university", "school", "department", "course")
+
+
+@limiter.weighted(suggest_index.weight)
+def suggest():
+    """Suggest names starting with a prefix across all resources"""
+
+    req = flask.request
+    config = flask.current_app.config
+
+    query = req.args.get("query", None, type=str)
+    limit = req.args.get("limit", config["SUGGEST_LIMIT"], type=int)
+    types = req.args.get("type", None, type=str)
+
+    if not query or not query.strip():
+        raise BadRequestError(
+            "Query string cannot be empty while using this endpoint"
+        )
+
+    limit = max(1, min(limit, int(config["SUGGEST_MAX_LIMIT"])))
+
+    if types:
+        types = [t for t in types.strip().lower().split(",") if t]
+
+        if any(t not in SUGGEST_TYPES for t in types):
+            raise BadRequestError(
+                f"Query string `type` must be a comma-separated list of "
+                f"{', '.join(SUGGEST_TYPES)}"
+            )
+
+    suggestions = suggest_index.get().search(query, limit, types)
+
+    response = flask.make_response(
+        flask.jsonify(
+            {
+                "message": "Success",
+                "count": len(suggestions),
+                "results": [s._asdict() for s in suggestions],
+            }
+        )
+    )
+    response.mimetype = "application/json"
+
+    return response, 200
@@ -5,6 +5,7 @@ University API endpoint handlers
 """
 
 import flask
+import sqlalchemy as sa
 
 from cursus.models.university import (
     University,
@@ -18,6 +19,14 @@ from cursus.schema.university import (
     UniversityCampusSchema,
     UniversityFounderSchema,
 )
+from cursus.schema.registry import get_schema
+from cursus.util.extensions import db, reference_snapshot
+from cursus.util.search import get_search_backend
+from cursus.util.pagination import (
+    SortKey,
+    paginate_request,
+    paginate_sequence,
+)
 
 
 def _message_not_found(short_name: str):
@@ -48,6 +57,22 @@ of founders. If you want to add this university or its founders, please open \
 a pull request at https://github.com/richardnguyen99/cursus/pulls."
 
 
+def _university_has(model, short_name: str) -> bool:
+    """Check if a university has any row in a related table"""
+
+    return db.session.query(
+        sa.exists().where(model.school_short_name == short_name)
+    ).scalar()
+
+
+def _id_values(item) -> tuple:
+    return (item.id,)
+
+
+def _address_id_values(item) -> tuple:
+    return (item.address_id,)
+
+
 def university_by_short_name(short_name: str):
     """Get a university by its short name (code)"""
 
@@ -63,7 +88,10 @@ def university_by_short_name(short_name: str):
         "homepage",
     )
 
-    university = University.query.filter_by(short_name=short_name).first()
+    if reference_snapshot.enabled:
+        university = reference_snapshot.get().universities.get(short_name)
+    else:
+        university = University.query.filter_by(short_name=short_name).first()
 
     if university is None:
         response = flask.make_response(
@@ -79,7 +107,7 @@ def university_by_short_name(short_name: str):
 
         return response, 404
 
-    university_schema = UniversitySchema(only=dump_fields)
+    university_schema = get_schema(UniversitySchema, dump_fields)
 
     response = flask.make_response(
         flask.jsonify(
@@ -100,7 +128,6 @@ def university_domains_by_short_name(short_name: str):
 
     req = flask.request
 
-    page = req.args.get("page", 1, type=int)
     domain_type = req.args.get("type", None, type=str)
     locale = req.args.get("locale", None, type=str)
 
@@ -113,11 +140,55 @@ def university_domains_by_short_name(short_name: str):
         "updated_at",
     )
 
-    domains = UniversityDomain.query.filter(
-        UniversityDomain.school_short_name == short_name
-    )
+    if domain_type is not None:
+        domain_type = domain_type.strip().lower()
+
+    if locale is not None:
+        locale = locale.strip().lower()
+
+    sort_keys = [SortKey("id", UniversityDomain.id)]
+
+    if reference_snapshot.enabled:
+        domains = reference_snapshot.get().domains.get(short_name, ())
+        found = bool(domains)
+
+        if domain_type is not None:
+            domains = [d for d in domains if d.type == domain_type]
+
+        if locale is not None:
+            domains = [
+                d for d in domains if locale in (d.iso639_1 or "").lower()
+            ]
+
+        domain_page = paginate_sequence(
+            domains, sort_keys, _id_values, req.args, error_out=False
+        )
+    else:
+        domains = UniversityDomain.query.filter(
+            UniversityDomain.school_short_name == short_name
+        )
+
+        if domain_type is not None:
+            domains = domains.filter(UniversityDomain.type == domain_type)
+
+        if locale is not None:
+            # Escaped, so wildcards match literally like in the snapshot
+            backend = get_search_backend()
+            domains = domains.filter(
+                backend.contains(UniversityDomain.iso639_1, locale)
+            )
+
+        domain_page = paginate_request(
+            domains, sort_keys, req.args, error_out=False
+        )
+
+        # The existence check only runs when there is nothing to show, so a
+        # successful lookup costs a single query.
+        found = bool(domain_page.items) or _university_has(
+            UniversityDomain, short_name
+        )
 
-    if domains.count() == 0:
+    if not found:
         response = flask.make_response(
             flask.jsonify(
                 {
@@ -131,27 +202,18 @@ def university_domains_by_short_name(short_name: str):
 
         return response, 404
 
-    if domain_type is not None:
-        domain_type = domain_type.strip().lower()
-        domains = domains.filter(UniversityDomain.type == domain_type)
-
-    if locale is not None:
-        locale = locale.strip().lower()
-        domains = domains.filter(
-            UniversityDomain.iso639_1.ilike(f"%{locale}%")
-        )
-
-    domain_schema = UniversityDomainSchema(only=dump_fields)
-    domain_page = domains.paginate(page=page, per_page=10, error_out=False)
+    domain_schema = get_schema(UniversityDomainSchema, dump_fields)
 
     response = flask.make_response(
         flask.jsonify(
             {
                 "message": "Success",
                 "short_name": short_name.lower(),
-                "page": page,
+                "page": domain_page.page,
                 "total_pages": domain_page.pages,
-                "total_domains": domains.count(),
+                "total_domains": domain_page.total,
+                "has_next": domain_page.has_next,
+                "next_cursor": domain_page.next_cursor,
                 "resullt": domain_schema.dump(domain_page.items, many=True),
             }
         )
@@ -166,8 +228,6 @@ def university_campuses_by_short_name(short_name: str):
 
     req = flask.request
 
-    page = req.args.get("page", 1, type=int)
-
     dump_fields = (
         "address_id",
         "address_street",
@@ -180,11 +240,33 @@ def university_campuses_by_short_name(short_name: str):
         "updated_at",
     )
 
-    campuses = UniversityCampus.query.filter(
-        UniversityCampus.school_short_name == short_name
-    )
+    sort_keys = [SortKey("id", UniversityCampus.address_id)]
+
+    if reference_snapshot.enabled:
+        campuses = reference_snapshot.get().campuses.get(short_name, ())
+        found = bool(campuses)
+
+        campus_page = paginate_sequence(
+            campuses,
+            sort_keys,
+            _address_id_values,
+            req.args,
+            error_out=False,
+        )
+    else:
+        campuses = UniversityCampus.query.filter(
+            UniversityCampus.school_short_name == short_name
+        )
+
+        campus_page = paginate_request(
+            campuses, sort_keys, req.args, error_out=False
+        )
+
+        found = bool(campus_page.items) or _university_has(
+            UniversityCampus, short_name
+        )
 
-    if campuses.count() == 0:
+    if not found:
         response = flask.make_response(
             flask.jsonify(
                 {
@@ -198,18 +280,18 @@ def university_campuses_by_short_name(short_name: str):
 
         return response, 404
 
-    campus_schema = UniversityCampusSchema(only=dump_fields)
-
-    campus_page = campuses.paginate(page=page, per_page=10, error_out=False)
+    campus_schema = get_schema(UniversityCampusSchema, dump_fields)
 
     response = flask.make_response(
         flask.jsonify(
             {
                 "message": "success",
                 "short_name": short_name.lower(),
-                "page": page,
+                "page": campus_page.page,
                 "total_pages": campus_page.pages,
-                "total_campuses": campuses.count(),
+                "total_campuses": campus_page.total,
+                "has_next": campus_page.has_next,
+                "next_cursor": campus_page.next_cursor,
                 "result": campus_schema.dump(campus_page.items, many=True),
             }
         )
@@ -224,8 +306,6 @@ def university_founders_by_short_name(short_name: str):
 
     req = flask.request
 
-    page = req.args.get("page", 1, type=int)
-
     dump_fields = (
         "id",
         "biography_link",
@@ -237,11 +317,29 @@ def university_founders_by_short_name(short_name: str):
         "updated_at",
     )
 
-    founders = UniversityFounder.query.filter(
-        UniversityFounder.school_short_name == short_name
-    )
+    sort_keys = [SortKey("id", UniversityFounder.id)]
+
+    if reference_snapshot.enabled:
+        founders = reference_snapshot.get().founders.get(short_name, ())
+        found = bool(founders)
+
+        founder_page = paginate_sequence(
+            founders, sort_keys, _id_values, req.args, error_out=False
+        )
+    else:
+        founders = UniversityFounder.query.filter(
+            UniversityFounder.school_short_name == short_name
+        )
+
+        founder_page = paginate_request(
+            founders, sort_keys, req.args, error_out=False
+        )
+
+        found = bool(founder_page.items) or _university_has(
+            UniversityFounder, short_name
+        )
 
-    if founders.count() == 0:
+    if not found:
         response = flask.make_response(
             flask.jsonify(
                 {
@@ -255,16 +353,17 @@ def university_founders_by_short_name(short_name: str):
 
         return response, 404
 
-    founder_page = founders.paginate(page=page, per_page=10, error_out=False)
-    founder_schema = UniversityFounderSchema(only=dump_fields)
+    founder_schema = get_schema(UniversityFounderSchema, dump_fields)
 
     response = flask.make_response(
         flask.jsonify(
             {
                 "message": "success",
-                "page": page,
+                "page": founder_page.page,
                 "total_pages": founder_page.pages,
-                "total_founders": founders.count(),
+                "total_founders": founder_page.total,
+                "has_next": founder_page.has_next,
+                "next_cursor": founder_page.next_cursor,
                 "school_short_name": short_name.lower(),
                 "result": founder_schema.dump(founder_page.items, many=True),
             }
@@ -17,7 +17,24 @@ from logging.config import dictConfig
 
 from .apis import api_bp as api_bp_v1
 from .views import view_bp, oauth_bp
-from .util.extensions import db, migrate, ma, login_manager, assets, cache
+from .util.extensions import (
+    db,
+    db_pool,
+    replicas,
+    migrate,
+    ma,
+    login_manager,
+    assets,
+    cache,
+    limiter,
+    token_cache,
+    reference_snapshot,
+    response_cache,
+    suggest_index,
+    query_stats,
+    metrics,
+    access_log,
+)
 from .models import User, ActiveToken, Account
 from .util import generate_content_hash
 
@@ -86,12 +103,24 @@ def create_app(config_module_str: Optional[str] = None) -> Flask:
         app.register_blueprint(swaggerui_blueprint)
 
     # Register Flask extensions
+    # The replica binds and the engine options are set before Flask-SQLAlchemy
+    # creates the engines
+    replicas.init_app(app)
+    db_pool.init_app(app)
     db.init_app(app)
     migrate.init_app(app, db)
     ma.init_app(app)
     assets.init_app(app)
     login_manager.init_app(app)
     cache.init_app(app)
+    limiter.init_app(app, cache)
+    token_cache.init_app(app, cache)
+    reference_snapshot.init_app(app, db)
+    response_cache.init_app(app, cache)
+    suggest_index.init_app(app, db)
+    query_stats.init_app(app)
+    metrics.init_app(app)
+    access_log.init_app(app)
 
     with app.app_context():
         login_manager.login_view = "views.show"
@@ -207,13 +236,9 @@ def create_app(config_module_str: Optional[str] = None) -> Flask:
 
     @app.after_request
     def after(response: flask.Response):
-        current_app = flask.current_app
         req = flask.request
 
-        current_app.logger.info(
-            f'"{req.remote_addr}" {req.method} {req.path} \
-{response.status_code} {response.content_length}'
-        )
+        access_log.log(response)
 
         if req.path.startswith("/static"):
             # Cache static assets for 1 year
@@ -26,6 +26,25 @@ class Config(object):
     # Config for Flask SQLAlchemy and Alembic
     SQLALCHEMY_DATABASE_URI = os.environ.get("DATABASE_URL")
 
+    # Config for the database connection pools. Unset values keep the
+    # defaults of SQLAlchemy. The statement timeout is in milliseconds.
+    DB_POOL_SIZE = os.environ.get("DB_POOL_SIZE")
+    DB_MAX_OVERFLOW = os.environ.get("DB_MAX_OVERFLOW")
+    DB_POOL_TIMEOUT = os.environ.get("DB_POOL_TIMEOUT")
+    DB_POOL_RECYCLE = os.environ.get("DB_POOL_RECYCLE")
+    DB_POOL_PRE_PING = os.environ.get("DB_POOL_PRE_PING")
+    DB_STATEMENT_TIMEOUT = int(os.environ.get("DB_STATEMENT_TIMEOUT", 0))
+
+    # Config for the read replicas of the API requests. The URLs are
+    # comma-separated, and the sticky window, in seconds, sends the reads of a
+    # user to the primary after a write of the user. 0 disables it.
+    DATABASE_REPLICA_URLS = os.environ.get("DATABASE_REPLICA_URLS")
+    REPLICA_ROUTE_PREFIX = os.environ.get("REPLICA_ROUTE_PREFIX", "/api/v1/")
+    REPLICA_RETRY_INTERVAL = float(
+        os.environ.get("REPLICA_RETRY_INTERVAL", 30)
+    )
+    REPLICA_STICKY_WINDOW = int(os.environ.get("REPLICA_STICKY_WINDOW", 0))
+
     # Config for Flask Session
     SECRET_KEY = os.environ.get("SECRET_KEY")
     REMEMBER_COOKIE_NAME = "cursus_remember"
@@ -39,6 +58,91 @@ class Config(object):
     CACHE_REDIS_URL = os.environ.get("CACHE_REDIS_URL")
     CACHE_DEFAULT_TIMEOUT = os.environ.get("CACHE_DEFAULT_TIMEOUT")
 
+    # Config for the API token rate limiter
+    RATELIMIT_LIMIT = int(os.environ.get("RATELIMIT_LIMIT", 50))
+    RATELIMIT_WINDOW = int(os.environ.get("RATELIMIT_WINDOW", 60 * 60))
+    RATELIMIT_STRATEGY = os.environ.get("RATELIMIT_STRATEGY", "fixed")
+
+    # Maximum number of IDs in a request to a batch endpoint
+    BATCH_MAX_IDS = int(os.environ.get("BATCH_MAX_IDS", 100))
+
+    # Config for the in-process cache of validated API tokens
+    TOKEN_CACHE_SIZE = int(os.environ.get("TOKEN_CACHE_SIZE", 1024))
+    TOKEN_CACHE_TTL = int(os.environ.get("TOKEN_CACHE_TTL", 60))
+    TOKEN_CACHE_SYNC_INTERVAL = int(
+        os.environ.get("TOKEN_CACHE_SYNC_INTERVAL", 5)
+    )
+
+    # Config for the in-memory snapshot of the university reference data
+    REFERENCE_SNAPSHOT = (
+        os.environ.get("REFERENCE_SNAPSHOT", "true").lower() != "false"
+    )
+    REFERENCE_SNAPSHOT_INTERVAL = int(
+        os.environ.get("REFERENCE_SNAPSHOT_INTERVAL", 60)
+    )
+    REFERENCE_SNAPSHOT_MAX_AGE = int(
+        os.environ.get("REFERENCE_SNAPSHOT_MAX_AGE", 60 * 60)
+    )
+
+    # Config for the in-memory prefix index of the suggest endpoint
+    SUGGEST_INTERVAL = int(os.environ.get("SUGGEST_INTERVAL", 5 * 60))
+    SUGGEST_LIMIT = int(os.environ.get("SUGGEST_LIMIT", 10))
+    SUGGEST_MAX_LIMIT = int(os.environ.get("SUGGEST_MAX_LIMIT", 25))
+    SUGGEST_WEIGHT = float(os.environ.get("SUGGEST_WEIGHT", 0.1))
+
+    # Config for the response cache of the read-only API resources. TTLs are
+    # in seconds and can be set per resource.
+    RESPONSE_CACHE = (
+        os.environ.get("RESPONSE_CACHE", "true").lower() != "false"
+    )
+    RESPONSE_CACHE_TTL = int(os.environ.get("RESPONSE_CACHE_TTL", 5 * 60))
+    RESPONSE_CACHE_TTLS = {
+        resource: int(os.environ[f"RESPONSE_CACHE_TTL_{resource.upper()}"])
+        for resource in ("university", "school", "department", "course")
+        if f"RESPONSE_CACHE_TTL_{resource.upper()}" in os.environ
+    }
+
+    # Search backend for the search API endpoints: "trigram" or "like". If it
+    # is not set, the backend is chosen based on the database dialect.
+    SEARCH_BACKEND = os.environ.get("SEARCH_BACKEND")
+
+    # Config for the per-request SQL query statistics. Statements slower than
+    # the threshold, in milliseconds, are logged.
+    QUERY_STATS = os.environ.get("QUERY_STATS", "false").lower() == "true"
+    QUERY_SLOW_THRESHOLD = float(os.environ.get("QUERY_SLOW_THRESHOLD", 500))
+
+    # Config for the Prometheus metrics served at `/metrics`. With several
+    # worker processes, the metrics directory is shared by the workers and
+    # emptied when the deployment starts. Without a token, anyone can read
+    # the metrics, unless a token is required.
+    METRICS = os.environ.get("METRICS", "true").lower() == "true"
+    METRICS_DIR = os.environ.get("METRICS_DIR")
+    METRICS_FLUSH_INTERVAL = float(os.environ.get("METRICS_FLUSH_INTERVAL", 5))
+    METRICS_TOKEN = os.environ.get("METRICS_TOKEN")
+    METRICS_REQUIRE_TOKEN = (
+        os.environ.get("METRICS_REQUIRE_TOKEN", "false").lower() == "true"
+    )
+
+    # Config for the access log. In "queue" mode, JSON lines are written by a
+    # background thread and dropped when the queue is full. 200 responses of
+    # the sampled endpoints, e.g. "api.search.*", are logged at the sample
+    # rate.
+    ACCESS_LOG_MODE = os.environ.get("ACCESS_LOG_MODE", "sync")
+    ACCESS_LOG_FILE = os.environ.get("ACCESS_LOG_FILE")
+    ACCESS_LOG_QUEUE_SIZE = int(os.environ.get("ACCESS_LOG_QUEUE_SIZE", 10000))
+    ACCESS_LOG_SAMPLE_RATE = float(
+        os.environ.get("ACCESS_LOG_SAMPLE_RATE", 1.0)
+    )
+    ACCESS_LOG_SAMPLED_ENDPOINTS = os.environ.get(
+        "ACCESS_LOG_SAMPLED_ENDPOINTS", ""
+    )
+
+    # Rows read per batch from the server-side cursor of an export
+    EXPORT_BATCH_SIZE = int(os.environ.get("EXPORT_BATCH_SIZE", 1000))
+
+    # Seconds the facet counts of a search are cached
+    FACETS_CACHE_TTL = int(os.environ.get("FACETS_CACHE_TTL", 5 * 60))
+
     # Config for Flask Assets
     # https://webassets.readthedocs.io/en/latest/builtin_filters.html#uglifyjs
     UGLIFYJS_EXTRA_ARGS = [
@@ -130,6 +234,21 @@ class ProdConfig(Config):
     PREFERRED_URL_SCHEME = "https"
     DATABASE_URL = os.environ.get("DATABASE_URL")
 
+    # A pool that fails fast when it is exhausted, rather than letting the
+    # requests pile up, and a bound on the duration of a statement. The CLI
+    # commands and the migrations lift the statement timeout.
+    DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", 10))
+    DB_MAX_OVERFLOW = int(os.environ.get("DB_MAX_OVERFLOW", 20))
+    DB_POOL_TIMEOUT = float(os.environ.get("DB_POOL_TIMEOUT", 5))
+    DB_POOL_RECYCLE = int(os.environ.get("DB_POOL_RECYCLE", 30 * 60))
+    DB_POOL_PRE_PING = (
+        os.environ.get("DB_POOL_PRE_PING", "true").lower() == "true"
+    )
+    DB_STATEMENT_TIMEOUT = int(os.environ.get("DB_STATEMENT_TIMEOUT", 15000))
+
+    # The metrics are only served to clients with the token
+    METRICS_REQUIRE_TOKEN = True
+
 
 class TestingConfig(Config):
     """Testing configuration class for the application
@@ -151,3 +270,6 @@ class TestingConfig(Config):
     CACHE_REDIS_PORT = "6379"
     CACHE_REDIS_DB = "0"
     CACHE_REDIS_URL = "redis://localhost:6379/0"
+
+    # The test suite makes more API calls than the default limit allows
+    RATELIMIT_LIMIT = 1000
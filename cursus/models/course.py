@@ -8,17 +8,30 @@ import sqlalchemy as sa
 
 from sqlalchemy import (
     ForeignKey,
+    Index,
     String,
     Integer,
     Boolean,
     UniqueConstraint,
     DateTime,
     TIMESTAMP,
+    Text,
+    Computed,
 )
+from sqlalchemy.dialects.postgresql import TSVECTOR
 from sqlalchemy.orm import Mapped, mapped_column
 from sqlalchemy.sql import func
 
 from cursus.util.extensions import db
+from cursus.util.search import TextSearchDocument
+
+# Full-text document of the `mode=fulltext` course search, ranked by title,
+# then subject, then description
+SEARCH_DOCUMENT = TextSearchDocument(
+    ("title", "A"),
+    ("subject", "B"),
+    ("description", "C"),
+)
 
 
 class Course(db.Model):
@@ -26,7 +39,20 @@ class Course(db.Model):
 
     __tablename__ = "courses"
 
-    __table_args__ = (UniqueConstraint("code", "university_id"),)
+    __table_args__ = (
+        UniqueConstraint("code", "university_id"),
+        Index(
+            "ix_courses_title_trgm",
+            "title",
+            postgresql_using="gin",
+            postgresql_ops={"title": "gin_trgm_ops"},
+        ),
+        Index(
+            "ix_courses_search_vector",
+            "search_vector",
+            postgresql_using="gin",
+        ).ddl_if(dialect="postgresql"),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
 
@@ -104,6 +130,20 @@ class Course(db.Model):
             onupdate="CASCADE",
         ),
         nullable=False,
+        index=True,
+    )
+
+    # Hash of the source row, maintained by the data loader
+    content_hash: Mapped[str] = mapped_column(
+        String(32),
+        nullable=True,
+    )
+
+    search_vector: Mapped[str] = mapped_column(
+        TSVECTOR().with_variant(Text(), "sqlite"),
+        Computed(SEARCH_DOCUMENT, persisted=True),
+        nullable=False,
+        deferred=True,
     )
 
     def __init__(self, title, code, website, active=True):
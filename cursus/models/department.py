@@ -6,6 +6,7 @@ Departments model
 
 from sqlalchemy import (
     ForeignKey,
+    Index,
     TIMESTAMP,
     String,
     Integer,
@@ -25,7 +26,15 @@ class Department(db.Model):
 
     __tablename__ = "departments"
 
-    __table_args__ = (UniqueConstraint("code", "school_id"),)
+    __table_args__ = (
+        UniqueConstraint("code", "school_id"),
+        Index(
+            "ix_departments_name_trgm",
+            "name",
+            postgresql_using="gin",
+            postgresql_ops={"name": "gin_trgm_ops"},
+        ),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
 
@@ -92,12 +101,20 @@ class Department(db.Model):
         Integer,
         ForeignKey("universities.id", ondelete="CASCADE", onupdate="CASCADE"),
         nullable=False,
+        index=True,
     )
 
     school_id: Mapped[int] = mapped_column(
         Integer,
         ForeignKey("schools.id", ondelete="CASCADE", onupdate="CASCADE"),
         nullable=False,
+        index=True,
+    )
+
+    # Hash of the source row, maintained by the data loader
+    content_hash: Mapped[str] = mapped_column(
+        String(32),
+        nullable=True,
     )
 
     courses: Relationship[list["Course"]] = relationship(
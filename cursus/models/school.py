@@ -8,6 +8,7 @@ import sqlalchemy as sa
 
 from sqlalchemy import (
     ForeignKey,
+    Index,
     String,
     Integer,
     UniqueConstraint,
@@ -27,7 +28,15 @@ class School(db.Model):
 
     __tablename__ = "schools"
 
-    __table_args__ = (UniqueConstraint("name", "university_id"),)
+    __table_args__ = (
+        UniqueConstraint("name", "university_id"),
+        Index(
+            "ix_schools_name_trgm",
+            "name",
+            postgresql_using="gin",
+            postgresql_ops={"name": "gin_trgm_ops"},
+        ),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
 
@@ -50,6 +59,7 @@ class School(db.Model):
             onupdate="CASCADE",
         ),
         nullable=False,
+        index=True,
     )
 
     created_at: Mapped[DateTime] = mapped_column(
@@ -64,11 +74,79 @@ class School(db.Model):
         server_default=func.now(),
     )
 
+    # Number of departments of the school, maintained by database triggers
+    department_count: Mapped[int] = mapped_column(
+        Integer,
+        nullable=False,
+        server_default="0",
+    )
+
+    # Hash of the source row, maintained by the data loader
+    content_hash: Mapped[str] = mapped_column(
+        String(32),
+        nullable=True,
+    )
+
+    # Departments are only loaded on request, most endpoints only need
+    # `department_count`
     departments: Relationship[list["Department"]] = relationship(
         "Department",
         backref="school",
-        lazy="joined",
+        lazy="select",
         primaryjoin="School.id == Department.school_id",
         cascade="all, delete-orphan",
         collection_class=set,
     )
+
+
+# Triggers keeping `schools.department_count` in sync with the departments.
+# Databases created from the models get them as well as migrated ones.
+_DEPARTMENT_COUNT_FUNCTION = """\
+CREATE OR REPLACE FUNCTION schools_department_count() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        UPDATE schools SET department_count = department_count + 1
+        WHERE id = NEW.school_id;
+    END IF;
+
+    IF TG_OP IN ('DELETE', 'UPDATE') THEN
+        UPDATE schools SET department_count = department_count - 1
+        WHERE id = OLD.school_id;
+    END IF;
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql"""
+
+_DEPARTMENT_COUNT_TRIGGERS = {
+    "postgresql": (
+        _DEPARTMENT_COUNT_FUNCTION,
+        "CREATE TRIGGER departments_school_count "
+        "AFTER INSERT OR DELETE OR UPDATE OF school_id ON departments "
+        "FOR EACH ROW EXECUTE FUNCTION schools_department_count()",
+    ),
+    "sqlite": (
+        "CREATE TRIGGER departments_school_count_insert "
+        "AFTER INSERT ON departments BEGIN "
+        "UPDATE schools SET department_count = department_count + 1 "
+        "WHERE id = NEW.school_id; END",
+        "CREATE TRIGGER departments_school_count_delete "
+        "AFTER DELETE ON departments BEGIN "
+        "UPDATE schools SET department_count = department_count - 1 "
+        "WHERE id = OLD.school_id; END",
+        "CREATE TRIGGER departments_school_count_update "
+        "AFTER UPDATE OF school_id ON departments BEGIN "
+        "UPDATE schools SET department_count = department_count + 1 "
+        "WHERE id = NEW.school_id; "
+        "UPDATE schools SET department_count = department_count - 1 "
+        "WHERE id = OLD.school_id; END",
+    ),
+}
+
+for _dialect, _statements in _DEPARTMENT_COUNT_TRIGGERS.items():
+    for _statement in _statements:
+        sa.event.listen(
+            Department.__table__,
+            "after_create",
+            sa.DDL(_statement).execute_if(dialect=_dialect),
+        )
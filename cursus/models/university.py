@@ -7,6 +7,7 @@ University model
 
 from sqlalchemy import (
     ForeignKey,
+    Index,
     String,
     Integer,
     UniqueConstraint,
@@ -28,6 +29,15 @@ class University(db.Model):
 
     __tablename__ = "universities"
 
+    __table_args__ = (
+        Index(
+            "ix_universities_full_name_trgm",
+            "full_name",
+            postgresql_using="gin",
+            postgresql_ops={"full_name": "gin_trgm_ops"},
+        ),
+    )
+
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
 
     short_name: Mapped[str] = mapped_column(
@@ -75,6 +85,12 @@ class University(db.Model):
         server_default=func.now(),
     )
 
+    # Hash of the source row, maintained by the data loader
+    content_hash: Mapped[str] = mapped_column(
+        String(32),
+        nullable=True,
+    )
+
     founders: Relationship[list["UniversityFounder"]] = relationship(
         "UniversityFounder",
         backref="university",
@@ -170,7 +186,10 @@ class UniversityDomain(db.Model):
     )
 
     school_short_name: Mapped[str] = mapped_column(
-        String(32), ForeignKey("universities.short_name"), nullable=False
+        String(32),
+        ForeignKey("universities.short_name"),
+        nullable=False,
+        index=True,
     )
 
 
@@ -206,7 +225,10 @@ class UniversityFounder(db.Model):
     )
 
     school_short_name: Mapped[str] = mapped_column(
-        String(32), ForeignKey("universities.short_name"), nullable=False
+        String(32),
+        ForeignKey("universities.short_name"),
+        nullable=False,
+        index=True,
     )
 
     def __init__(self, first_name: str, last_name: str):
@@ -263,7 +285,10 @@ class UniversityCampus(db.Model):
     )
 
     school_short_name: Mapped[str] = mapped_column(
-        String(32), ForeignKey("universities.short_name"), nullable=False
+        String(32),
+        ForeignKey("universities.short_name"),
+        nullable=False,
+        index=True,
     )
 
     country = relationship("Country")
@@ -4,6 +4,7 @@
 Schema Module for Cursus Application
 """
 
+from .registry import get_schema
 from .country import CountrySchema
 from .school import SchoolSchema
 from .department import DepartmentSchema
@@ -15,6 +15,7 @@ class CourseSchema(SQLAlchemyAutoSchema):
         model = Course
         load_instance = True
         include_relationships = True
+        exclude = ("content_hash", "search_vector")
 
     id = auto_field()
     title = auto_field()
@@ -32,6 +33,8 @@ class CourseSchema(SQLAlchemyAutoSchema):
     level = fields.Method("get_level", dump_only=True)
     department_name = fields.String()
     university_name = fields.String()
+    rank = fields.Float()
+    highlight = fields.String()
 
     def get_level(self, obj: Course):
         if obj.level == 1:
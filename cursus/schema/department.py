@@ -16,6 +16,7 @@ class DepartmentSchema(SQLAlchemyAutoSchema):
         model = Department
         load_instance = True
         include_relationships = True
+        exclude = ("content_hash",)
 
     id = auto_field()
     name = auto_field()
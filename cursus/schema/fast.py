@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+
+"""
+Fast-path serializer for flat query rows
+
+Some search endpoints select flat column tuples instead of ORM objects. Pushing
+those rows through `Schema.dump()` pays for Marshmallow's generic attribute
+lookup and field dispatch on every value. A `RowSerializer` resolves, once per
+field set, where each field comes from in the row and how to convert it, and
+then maps rows straight to JSON-ready dictionaries.
+
+The output is the same as `Schema.dump()` for the field types used by the
+schemas: integers, strings, booleans, datetimes and `Method` fields (such as
+`CourseSchema.get_level`). Other field types fall back to the Marshmallow
+field itself.
+"""
+
+import time
+import functools
+
+from typing import Any, Callable, Iterable, Optional, Type
+
+from marshmallow import Schema, fields
+
+from cursus.util.metrics import SERIALIZER_SECONDS
+
+from .registry import SCHEMA_REGISTRY_SIZE, get_schema
+
+__all__ = [
+    "RowSerializer",
+    "get_row_serializer",
+]
+
+
+def _to_int(value: Any) -> Optional[int]:
+    return None if value is None else int(value)
+
+
+def _to_str(value: Any) -> Optional[str]:
+    return None if value is None else str(value)
+
+
+def _to_bool(value: Any) -> Optional[bool]:
+    return None if value is None else bool(value)
+
+
+def _to_isoformat(value: Any) -> Optional[str]:
+    return None if value is None else value.isoformat()
+
+
+def _value_converter(field: fields.Field) -> Optional[Callable[[Any], Any]]:
+    # Only the exact field classes are mapped, so subclasses with custom
+    # serialization keep going through Marshmallow.
+    field_type = type(field)
+
+    if field_type is fields.Integer and not field.as_string:
+        return _to_int
+
+    if field_type is fields.String:
+        return _to_str
+
+    if field_type is fields.Boolean:
+        return _to_bool
+
+    if field_type is fields.DateTime and field.format in (None, "iso"):
+        return _to_isoformat
+
+    return None
+
+
+class RowSerializer:
+    """Serializer of `Row` tuples for a schema and a set of fields
+
+    :param schema: Schema instance the fields are taken from
+    """
+
+    def __init__(self, schema: Schema):
+        self.schema = schema
+        self._name = type(schema).__name__
+        self._plans: dict[tuple[str, ...], list] = {}
+
+    def _plan(self, keys: tuple[str, ...]) -> list:
+        # A plan is a list of (output key, row index, converter, fallback)
+        # entries. Fields that are missing from the row are left out, the
+        # same way Marshmallow skips missing attributes.
+        plan = []
+        positions = {key: index for index, key in enumerate(keys)}
+
+        for name, field in self.schema.dump_fields.items():
+            key = field.data_key if field.data_key is not None else name
+
+            if isinstance(field, fields.Method):
+                method = getattr(self.schema, field.serialize_method_name)
+                plan.append((key, None, method, None))
+                continue
+
+            attribute = field.attribute or name
+
+            if attribute not in positions:
+                continue
+
+            converter = _value_converter(field)
+            fallback = None if converter is not None else field
+
+            plan.append((key, positions[attribute], converter, fallback))
+
+        return plan
+
+    def dump(self, rows: Iterable[Any]) -> list[dict[str, Any]]:
+        """Serialize rows into a list of dictionaries"""
+
+        started = time.perf_counter()
+        results = []
+        plan = None
+
+        for row in rows:
+            if plan is None:
+                keys = tuple(row._fields)
+                plan = self._plans.get(keys)
+
+                if plan is None:
+                    plan = self._plans[keys] = self._plan(keys)
+
+            item = {}
+
+            for key, index, converter, fallback in plan:
+                if index is None:
+                    # `Method` fields are computed from the whole row
+                    item[key] = converter(row)
+                elif converter is not None:
+                    item[key] = converter(row[index])
+                else:
+                    item[key] = fallback._serialize(row[index], key, row)
+
+            results.append(item)
+
+        SERIALIZER_SECONDS.inc(self._name, value=time.perf_counter() - started)
+
+        return results
+
+
+@functools.lru_cache(maxsize=SCHEMA_REGISTRY_SIZE)
+def _build_row_serializer(
+    schema_cls: Type[Schema], only: Optional[frozenset[str]]
+) -> RowSerializer:
+    return RowSerializer(get_schema(schema_cls, only))
+
+
+def get_row_serializer(
+    schema_cls: Type[Schema], only: Optional[Iterable[str]] = None
+) -> RowSerializer:
+    """Get a shared row serializer for a schema and a set of fields"""
+
+    return _build_row_serializer(
+        schema_cls, frozenset(only) if only is not None else None
+    )
@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+
+"""
+Registry of prebuilt schema instances
+
+Instantiating a `SQLAlchemyAutoSchema` binds every field and validates the
+`only` field names, which is expensive to do for every request. Since schema
+instances are stateless for dumping, each variant is built once per
+`(schema class, only fields, many)` and reused. The registry is bounded so
+arbitrary `display` combinations can't grow it without limit.
+"""
+
+import functools
+
+from typing import Iterable, Optional, Type
+
+from marshmallow import Schema
+
+__all__ = [
+    "get_schema",
+]
+
+
+# Maximum number of schema variants kept in the registry
+SCHEMA_REGISTRY_SIZE = 256
+
+
+@functools.lru_cache(maxsize=SCHEMA_REGISTRY_SIZE)
+def _build_schema(
+    schema_cls: Type[Schema], only: Optional[frozenset[str]], many: bool
+) -> Schema:
+    return schema_cls(only=only, many=many)
+
+
+def get_schema(
+    schema_cls: Type[Schema],
+    only: Optional[Iterable[str]] = None,
+    many: bool = False,
+) -> Schema:
+    """Get a shared schema instance for a set of fields
+
+    The order of `only` doesn't matter, so equivalent field sets share the
+    same instance.
+
+    :param schema_cls: Schema class to instantiate
+    :param only: Names of the fields to dump, or `None` for all fields
+    :param many: Whether the schema dumps collections by default
+    """
+
+    return _build_schema(
+        schema_cls, frozenset(only) if only is not None else None, many
+    )
@@ -16,6 +16,7 @@ class SchoolSchema(SQLAlchemyAutoSchema):
         model = School
         load_instance = True
         include_relationships = True
+        exclude = ("content_hash", "department_count")
 
     id = auto_field()
     name = auto_field()
@@ -37,4 +38,6 @@ class SchoolSchema(SQLAlchemyAutoSchema):
         many=True,
     )
 
-    total_departments = fields.Integer(dump_only=True)
+    total_departments = fields.Integer(
+        attribute="department_count", dump_only=True
+    )
@@ -108,6 +108,7 @@ class UniversitySchema(SQLAlchemyAutoSchema):
         model = University
         load_instance = True
         include_relationships = True
+        exclude = ("content_hash",)
 
     id = auto_field()
     full_name = auto_field(dump_only=True)
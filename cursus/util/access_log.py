@@ -0,0 +1,272 @@
+# -*- coding: utf-8 -*-
+
+"""
+Access log of the HTTP requests
+
+With `ACCESS_LOG_MODE` set to `sync`, the default, one text line per request
+is logged through the app logger, by the request thread.
+
+With `queue`, the request thread only builds a log record and puts it on a
+bounded queue. A `QueueListener` thread formats the records as JSON lines and
+writes them to the standard output and to `ACCESS_LOG_FILE`, so the request
+never waits for file I/O or log rotation. When the queue is full, the record
+is dropped and counted instead of blocking the request.
+
+200 responses of the endpoints matching `ACCESS_LOG_SAMPLED_ENDPOINTS` are
+logged with the probability `ACCESS_LOG_SAMPLE_RATE`. Sampled lines carry the
+rate, so counts can be scaled back up.
+"""
+
+import os
+import json
+import atexit
+import time
+import queue
+import random
+import fnmatch
+import hashlib
+import logging
+import datetime
+import threading
+
+from logging.handlers import (
+    QueueHandler,
+    QueueListener,
+    RotatingFileHandler,
+)
+from typing import Any, Optional
+
+import flask
+
+from flask import Flask
+
+from .metrics import registry
+
+__all__ = [
+    "AccessLog",
+    "JSONFormatter",
+]
+
+
+ACCESS_LOG_MODES = ("sync", "queue")
+
+DROPPED = registry.counter(
+    "cursus_access_log_dropped_total",
+    "Access log lines dropped because the log queue was full",
+)
+
+
+def token_fingerprint(token: str) -> str:
+    """Short, non-reversible identifier of an API token for the logs"""
+
+    return hashlib.blake2b(token.encode(), digest_size=6).hexdigest()
+
+
+class JSONFormatter(logging.Formatter):
+    """Format records whose message is a dictionary as JSON lines"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        fields = dict(record.msg) if isinstance(record.msg, dict) else {}
+
+        if not fields:
+            fields["message"] = record.getMessage()
+
+        timestamp = datetime.datetime.fromtimestamp(
+            record.created, datetime.timezone.utc
+        )
+
+        return json.dumps(
+            {"time": timestamp.isoformat(timespec="milliseconds"), **fields},
+            separators=(",", ":"),
+            default=str,
+        )
+
+
+class _DroppingQueueHandler(QueueHandler):
+    def __init__(self, log_queue: queue.Queue, state: "_State"):
+        super().__init__(log_queue)
+        self.state = state
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Formatting is left to the listener thread
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.state.dropped += 1
+            DROPPED.inc()
+
+
+class _State:
+    def __init__(self, app: Flask):
+        config = app.config
+
+        self.mode = config["ACCESS_LOG_MODE"]
+        self.sample_rate = float(config["ACCESS_LOG_SAMPLE_RATE"])
+        self.sampled = [
+            pattern.strip()
+            for pattern in config["ACCESS_LOG_SAMPLED_ENDPOINTS"].split(",")
+            if pattern.strip()
+        ]
+        self.queue_size = int(config["ACCESS_LOG_QUEUE_SIZE"])
+        self.filename = config["ACCESS_LOG_FILE"]
+        self.dropped = 0
+
+        self.lock = threading.Lock()
+        self.pid: Optional[int] = None
+        self.logger: Optional[logging.Logger] = None
+        self.listener: Optional[QueueListener] = None
+
+    def handlers(self) -> list[logging.Handler]:
+        handlers: list[logging.Handler] = [logging.StreamHandler()]
+
+        if self.filename:
+            handlers.append(
+                RotatingFileHandler(
+                    self.filename,
+                    maxBytes=1024 * 1024 * 5,
+                    backupCount=5,
+                )
+            )
+
+        for handler in handlers:
+            handler.setFormatter(JSONFormatter())
+
+        return handlers
+
+    def start(self) -> logging.Logger:
+        """Start the listener thread of the current process"""
+
+        if self.pid == os.getpid():
+            return self.logger
+
+        with self.lock:
+            # A forked worker doesn't inherit the listener thread of its
+            # parent, so it starts its own
+            if self.pid != os.getpid():
+                log_queue: queue.Queue = queue.Queue(self.queue_size)
+
+                logger = logging.Logger("cursus.access", logging.INFO)
+                logger.addHandler(_DroppingQueueHandler(log_queue, self))
+
+                self.listener = QueueListener(log_queue, *self.handlers())
+                self.listener.start()
+                self.logger = logger
+                self.pid = os.getpid()
+
+            return self.logger
+
+    def stop(self) -> None:
+        with self.lock:
+            if self.listener is not None and self.pid == os.getpid():
+                self.listener.stop()
+
+                for handler in self.listener.handlers:
+                    handler.close()
+
+            self.listener = None
+            self.pid = None
+
+
+class AccessLog:
+    """Flask extension writing one access log line per request
+
+    Configuration variables:
+
+    - `ACCESS_LOG_MODE`: `sync` or `queue` (default: `sync`)
+    - `ACCESS_LOG_FILE`: file of the JSON lines in `queue` mode, besides the
+      standard output, `None` to disable (default: `None`)
+    - `ACCESS_LOG_QUEUE_SIZE`: records waiting to be written before new ones
+      are dropped (default: 10000)
+    - `ACCESS_LOG_SAMPLE_RATE`: share of the 200 responses of the sampled
+      endpoints that are logged (default: 1.0)
+    - `ACCESS_LOG_SAMPLED_ENDPOINTS`: comma-separated endpoint patterns, e.g.
+      `api.search.*` (default: `""`)
+    """
+
+    def __init__(self, app: Optional[Flask] = None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app: Flask) -> None:
+        app.config.setdefault("ACCESS_LOG_MODE", "sync")
+        app.config.setdefault("ACCESS_LOG_FILE", None)
+        app.config.setdefault("ACCESS_LOG_QUEUE_SIZE", 10000)
+        app.config.setdefault("ACCESS_LOG_SAMPLE_RATE", 1.0)
+        app.config.setdefault("ACCESS_LOG_SAMPLED_ENDPOINTS", "")
+
+        if app.config["ACCESS_LOG_MODE"] not in ACCESS_LOG_MODES:
+            raise ValueError(
+                f"ACCESS_LOG_MODE must be one of {', '.join(ACCESS_LOG_MODES)}"
+            )
+
+        state = app.extensions["cursus_access_log"] = _State(app)
+        app.before_request(self._before_request)
+
+        if state.mode == "queue":
+            atexit.register(state.stop)
+
+    @staticmethod
+    def _before_request() -> None:
+        flask.g.access_log_start = time.perf_counter()
+
+    @staticmethod
+    def _sampled(state: _State, endpoint: Optional[str]) -> bool:
+        if state.sample_rate >= 1 or endpoint is None:
+            return False
+
+        return any(
+            fnmatch.fnmatchcase(endpoint, pattern) for pattern in state.sampled
+        )
+
+    def log(self, response: flask.Response) -> None:
+        """Log a response to the current request"""
+
+        app = flask.current_app
+        state: _State = app.extensions["cursus_access_log"]
+        req = flask.request
+
+        if state.mode == "sync":
+            app.logger.info(
+                f'"{req.remote_addr}" {req.method} {req.path} '
+                f"{response.status_code} {response.content_length}"
+            )
+            return
+
+        fields: dict[str, Any] = {}
+
+        if response.status_code == 200 and self._sampled(state, req.endpoint):
+            if random.random() >= state.sample_rate:
+                return
+
+            fields["sample_rate"] = state.sample_rate
+
+        start = flask.g.get("access_log_start")
+        token = req.headers.get("X-CURSUS-API-TOKEN")
+
+        fields.update(
+            remote_addr=req.remote_addr,
+            method=req.method,
+            path=req.path,
+            query=req.query_string.decode("latin-1"),
+            endpoint=req.endpoint,
+            status=response.status_code,
+            bytes=response.content_length,
+            duration_ms=(
+                round((time.perf_counter() - start) * 1000, 3)
+                if start is not None
+                else None
+            ),
+            token=token_fingerprint(token) if token else None,
+            user=flask.g.get("api_user"),
+        )
+
+        state.start().info(fields)
+
+    @staticmethod
+    def stop(app: Flask) -> None:
+        """Flush the queued lines and stop the listener thread"""
+
+        app.extensions["cursus_access_log"].stop()
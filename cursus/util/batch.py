@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+
+"""
+Helpers for the batch (multi-get) API endpoints
+
+A batch endpoint takes a comma-separated list of IDs in its `ids` argument,
+e.g. `/course/batch?ids=1,2,3`, fetches all of them with a single `IN` query
+and returns them in the order of the request, along with the IDs that were not
+found.
+"""
+
+from typing import Any, Callable, Iterable, Sequence
+
+import flask
+
+from .exceptions import BadRequestError
+
+__all__ = [
+    "parse_ids",
+    "order_by_ids",
+    "ids_weight",
+]
+
+
+def _split(value: str) -> list[str]:
+    return [part.strip() for part in value.split(",") if part.strip()]
+
+
+def parse_ids(args, limit: int) -> list[int]:
+    """Parse the `ids` argument of a batch request
+
+    Duplicated IDs are only kept once, in the position they first appear.
+
+    :raises BadRequestError: if the argument is missing, has a non-integer
+        ID or more than `limit` IDs
+    """
+
+    parts = _split(args.get("ids", "", type=str))
+
+    if not parts:
+        raise BadRequestError("Query string `ids` is required")
+
+    try:
+        ids = list(dict.fromkeys(int(part) for part in parts))
+    except ValueError:
+        raise BadRequestError(
+            "Query string `ids` must be a comma-separated list of integers"
+        ) from None
+
+    if len(ids) > limit:
+        raise BadRequestError(f"At most {limit} IDs can be requested at once")
+
+    return ids
+
+
+def order_by_ids(
+    ids: Sequence[int], items: Iterable[Any], key: Callable[[Any], int]
+) -> tuple[list[Any], list[int]]:
+    """Put fetched items in the order of the requested IDs
+
+    :returns: the found items and the IDs that were not found
+    """
+
+    by_id = {key(item): item for item in items}
+
+    found = [by_id[id] for id in ids if id in by_id]
+    missing = [id for id in ids if id not in by_id]
+
+    return found, missing
+
+
+def ids_weight(request: flask.Request) -> int:
+    """Rate limit weight of a batch request: one per requested item
+
+    Malformed requests, including those with more than `BATCH_MAX_IDS` IDs,
+    weigh one, so they are rejected by the handler with a 400 rather than by
+    the rate limit. Their weight is refunded anyway.
+    """
+
+    count = len(set(_split(request.args.get("ids", "", type=str))))
+
+    if count > flask.current_app.config["BATCH_MAX_IDS"]:
+        return 1
+
+    return max(1, count)
@@ -0,0 +1,745 @@
+# -*- coding: utf-8 -*-
+
+"""
+Bulk loader for the TSV seed files in `data/`
+
+Every file is loaded in three steps:
+
+1. The rows are streamed into a temporary staging table of text columns. On
+   PostgreSQL this uses `COPY ... FROM STDIN`; on other databases the rows
+   are inserted with `executemany` in batches of `batch_size`. Only one batch
+   is held in memory at a time.
+2. The staged rows are cast to the column types of the target table and
+   resolved against the tables they reference, in SQL. Files refer to their
+   parents by natural key, never by identifier, since identifiers differ
+   between databases: either directly, e.g. `school_short_name` against
+   `universities.short_name`, or through a `Lookup` of the identifier, e.g.
+   `university_short_name` to `schools.university_id`. Rows referencing
+   missing parents are skipped, and for duplicated keys only the last row is
+   kept.
+3. The rows are upserted with `INSERT ... ON CONFLICT` on the unique
+   constraint of the table. Existing rows are only updated when one of their
+   values differs, so unchanged rows keep their timestamps.
+
+The numbers of inserted, updated, unchanged and skipped rows are counted in
+SQL before the upsert.
+
+Universities, schools, departments and courses also store a content hash of
+their source row. Reloading them only compares hashes, and in sync mode, rows
+that disappeared from the files are deleted. Rows without a hash, which were
+not loaded from a file, are never deleted. A sync runs in a single
+transaction and returns a `Changeset` of the affected rows, which cache layers
+can use for targeted invalidation. A hashed dataset with skipped rows fails
+the load with a `DataLoadError`, since its rows are never meant to be left
+out.
+"""
+
+import io
+import os
+import csv
+import hashlib
+import sqlalchemy as sa
+
+from typing import Any, Iterable, Iterator, Optional, Sequence
+
+from sqlalchemy.dialects import postgresql, sqlite
+
+__all__ = [
+    "DataLoadError",
+    "Dataset",
+    "Lookup",
+    "LoadReport",
+    "Changeset",
+    "datasets",
+    "content_hash",
+    "load_data",
+]
+
+
+# Column holding the hash of the source row of hashed datasets
+HASH_COLUMN = "content_hash"
+
+
+class DataLoadError(Exception):
+    """Raised when the rows of a file can't all be loaded"""
+
+
+class Lookup:
+    """Identifier of a parent row, found by its natural key
+
+    :param column: Identifier column of the parent, e.g. `School.id`
+    :param match: Mapping of the columns of the parent to the columns of the
+        file, or to the `Lookup` of another parent, that identify the row
+    """
+
+    def __init__(self, column: sa.Column, match: dict[str, Any]):
+        self.column = column
+        self.match = match
+
+    def __repr__(self) -> str:
+        return f"<Lookup {self.column}>"
+
+    def fields(self) -> list[str]:
+        """Columns of the file the lookup reads"""
+
+        fields = []
+
+        for value in self.match.values():
+            if isinstance(value, Lookup):
+                fields.extend(value.fields())
+            else:
+                fields.append(value)
+
+        return fields
+
+    def resolve(self, staging: sa.Table):
+        """Scalar subquery of the identifier of the parent of a staged row"""
+
+        parent = self.column.table
+        conditions = []
+
+        for name, value in self.match.items():
+            if isinstance(value, Lookup):
+                conditions.append(parent.c[name] == value.resolve(staging))
+            else:
+                conditions.append(
+                    parent.c[name] == _typed(parent.c[name], staging.c[value])
+                )
+
+        # Nested lookups are not correlated automatically, as the staging
+        # table is not in the query directly enclosing them
+        return (
+            sa.select(self.column)
+            .where(*conditions)
+            .correlate(staging)
+            .scalar_subquery()
+        )
+
+
+class Dataset:
+    """A TSV file and the table it is loaded into
+
+    :param file_name: Name of the file in the data directory
+    :param model: Model of the target table
+    :param key: Columns of the unique constraint used for upserts
+    :param references: Pairs of a column of the file and the column of
+        another table it must match
+    :param lookups: Mapping of columns of the table to the `Lookup` of their
+        value from the columns of the file
+    :param renames: Mapping of file headers to column names
+    :param touch: Timestamp column set to `now()` when a row is written
+    :param hashed: The table has a `content_hash` column and is synced
+    """
+
+    def __init__(
+        self,
+        file_name: str,
+        model,
+        key: Sequence[str],
+        references: Sequence[tuple[str, sa.Column]] = (),
+        lookups: Optional[dict[str, Lookup]] = None,
+        renames: Optional[dict[str, str]] = None,
+        touch: str = "updated_at",
+        hashed: bool = False,
+    ):
+        self.file_name = file_name
+        self.model = model
+        self.key = tuple(key)
+        self.references = tuple(references)
+        self.lookups = lookups or {}
+        self.renames = renames or {}
+        self.touch = touch
+        self.hashed = hashed
+
+    def __repr__(self) -> str:
+        return f"<Dataset {self.file_name}>"
+
+    @property
+    def table(self) -> sa.Table:
+        return self.model.__table__
+
+
+class LoadReport:
+    """Outcome of loading a dataset"""
+
+    table: str
+    staged: int
+    inserted: int
+    updated: int
+    unchanged: int
+    skipped: int
+    deleted: int
+
+    def __init__(
+        self,
+        table: str,
+        staged: int,
+        inserted: int,
+        updated: int,
+        unchanged: int,
+        skipped: int,
+        deleted: int = 0,
+    ):
+        self.table = table
+        self.staged = staged
+        self.inserted = inserted
+        self.updated = updated
+        self.unchanged = unchanged
+        self.skipped = skipped
+        self.deleted = deleted
+
+    def __repr__(self) -> str:
+        return (
+            f"<LoadReport {self.table}: +{self.inserted} ~{self.updated} "
+            f"={self.unchanged} !{self.skipped} -{self.deleted}>"
+        )
+
+
+class Changeset:
+    """Rows inserted, updated and deleted by a sync, by table
+
+    Rows are identified by their primary key and the columns of their unique
+    key, e.g. `{"id": 3, "code": "CS 101", "university_id": 1}`.
+    """
+
+    def __init__(self):
+        self.tables: dict[str, dict[str, list[dict[str, Any]]]] = {}
+
+    def __repr__(self) -> str:
+        return f"<Changeset ({len(self)} rows)>"
+
+    def __len__(self) -> int:
+        return sum(
+            len(rows)
+            for changes in self.tables.values()
+            for rows in changes.values()
+        )
+
+    def add(self, table: str, change: str, rows: Iterable[Any]) -> None:
+        changes = self.tables.setdefault(
+            table, {"inserted": [], "updated": [], "deleted": []}
+        )
+        changes[change].extend(dict(row._mapping) for row in rows)
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            table: changes
+            for table, changes in self.tables.items()
+            if any(changes.values())
+        }
+
+
+def datasets() -> list[Dataset]:
+    """Datasets of the `data/` directory, in dependency order"""
+
+    from cursus.models import (
+        Country,
+        Course,
+        Department,
+        School,
+        University,
+        UniversityCampus,
+        UniversityDomain,
+        UniversityFounder,
+    )
+
+    university = Lookup(University.id, {"short_name": "university_short_name"})
+    school = Lookup(
+        School.id, {"name": "school_name", "university_id": university}
+    )
+
+    return [
+        Dataset("country-iso.tsv", Country, ["alpha2"]),
+        Dataset(
+            "top-100-universities.tsv",
+            University,
+            ["short_name"],
+            hashed=True,
+        ),
+        Dataset(
+            "top-100-university-domains.tsv",
+            UniversityDomain,
+            ["domain_name", "school_short_name"],
+            references=[("school_short_name", University.short_name)],
+        ),
+        Dataset(
+            "top-100-university-campuses.tsv",
+            UniversityCampus,
+            ["address_street", "country_code", "school_short_name"],
+            references=[
+                ("school_short_name", University.short_name),
+                ("country_code", Country.alpha2),
+            ],
+            renames={"arddress_street": "address_street"},
+        ),
+        Dataset(
+            "top-100-university-founders.tsv",
+            UniversityFounder,
+            ["first_name", "last_name", "school_short_name"],
+            references=[("school_short_name", University.short_name)],
+        ),
+        Dataset(
+            "initial-school.tsv",
+            School,
+            ["name", "university_id"],
+            lookups={"university_id": university},
+            touch="modified_at",
+            hashed=True,
+        ),
+        Dataset(
+            "initial-departments.tsv",
+            Department,
+            ["code", "school_id"],
+            lookups={
+                "university_id": university,
+                "school_id": school,
+            },
+            touch="modified_at",
+            hashed=True,
+        ),
+        Dataset(
+            "initial-courses.tsv",
+            Course,
+            ["code", "university_id"],
+            lookups={
+                "university_id": university,
+                # Department codes are only unique within a school
+                "department_id": Lookup(
+                    Department.id,
+                    {"code": "department_code", "school_id": school},
+                ),
+            },
+            touch="modified_at",
+            hashed=True,
+        ),
+    ]
+
+
+def content_hash(values: Sequence[Optional[str]]) -> str:
+    """Hash the fields of a source row"""
+
+    # Fields are separated by a unit separator, and NULL is told apart from
+    # an empty string by a character that can't appear in the files.
+    payload = "\x1f".join("\x00" if v is None else v for v in values)
+
+    return hashlib.blake2b(payload.encode(), digest_size=16).hexdigest()
+
+
+def _rows(file, hashed: bool) -> Iterator[list[Optional[str]]]:
+    for row in csv.reader(file, delimiter="\t"):
+        # Like COPY in CSV mode, empty fields are NULL
+        values = [value or None for value in row]
+
+        if hashed:
+            values.append(content_hash(values))
+
+        yield values
+
+
+def _batches(rows: Iterable[list], size: int) -> Iterator[list]:
+    batch = []
+
+    for row in rows:
+        batch.append(row)
+
+        if len(batch) >= size:
+            yield batch
+            batch = []
+
+    if batch:
+        yield batch
+
+
+class _CopyStream:
+    """File-like object feeding `COPY` with rows encoded as CSV"""
+
+    def __init__(self, rows: Iterable[list], batch_size: int):
+        self._batches = _batches(rows, batch_size)
+        self._buffer = ""
+
+    def _fill(self) -> bool:
+        batch = next(self._batches, None)
+
+        if batch is None:
+            return False
+
+        output = io.StringIO()
+        csv.writer(output, delimiter="\t", lineterminator="\n").writerows(
+            batch
+        )
+        self._buffer += output.getvalue()
+
+        return True
+
+    def read(self, size: int = -1) -> str:
+        while (size < 0 or len(self._buffer) < size) and self._fill():
+            pass
+
+        if size < 0:
+            size = len(self._buffer)
+
+        data, self._buffer = self._buffer[:size], self._buffer[size:]
+
+        return data
+
+    def readline(self, size: int = -1) -> str:
+        while "\n" not in self._buffer and self._fill():
+            pass
+
+        end = self._buffer.find("\n") + 1 or len(self._buffer)
+        line, self._buffer = self._buffer[:end], self._buffer[end:]
+
+        return line
+
+
+def _stage_copy(connection, staging: sa.Table, columns, rows, batch_size):
+    names = ", ".join(f'"{name}"' for name in columns)
+    cursor = connection.connection.cursor()
+
+    try:
+        cursor.copy_expert(
+            f'COPY "{staging.name}" ({names}) FROM STDIN '
+            "WITH (FORMAT csv, DELIMITER E'\\t')",
+            _CopyStream(rows, batch_size),
+        )
+    finally:
+        cursor.close()
+
+
+def _stage_executemany(connection, staging: sa.Table, columns, rows, size):
+    statement = staging.insert()
+
+    for batch in _batches(rows, size):
+        connection.execute(
+            statement, [dict(zip(columns, row)) for row in batch]
+        )
+
+
+def _typed(column: sa.Column, value):
+    # Text is cast to the type of the target column. Strings are left alone,
+    # since casting to `VARCHAR(n)` silently truncates on PostgreSQL.
+    if isinstance(column.type, sa.String):
+        return value
+
+    return sa.cast(value, column.type)
+
+
+def _insert(dialect_name: str):
+    if dialect_name == "postgresql":
+        return postgresql.insert
+
+    return sqlite.insert
+
+
+class _Load:
+    """Staged load of a dataset"""
+
+    def __init__(self, connection, dataset: Dataset, batch_size: int):
+        self.connection = connection
+        self.dataset = dataset
+        self.batch_size = batch_size
+
+    def count(self, statement) -> int:
+        return self.connection.execute(
+            sa.select(sa.func.count()).select_from(statement.subquery())
+        ).scalar()
+
+    def stage(self, path: str) -> None:
+        dataset, table = self.dataset, self.dataset.table
+
+        with open(path, "r", encoding="utf-8", newline="") as file:
+            header = next(csv.reader([file.readline()], delimiter="\t"))
+            header = [dataset.renames.get(name, name) for name in header]
+            columns = header + [HASH_COLUMN] if dataset.hashed else header
+
+            self.staging = sa.Table(
+                f"_staging_{table.name}",
+                sa.MetaData(),
+                sa.Column("_row", sa.Integer, primary_key=True),
+                *[sa.Column(name, sa.Text) for name in columns],
+                prefixes=["TEMPORARY"],
+            )
+            self.staging.drop(self.connection, checkfirst=True)
+            self.staging.create(self.connection)
+
+            rows = _rows(file, dataset.hashed)
+
+            if self.connection.dialect.name == "postgresql":
+                _stage_copy(
+                    self.connection,
+                    self.staging,
+                    columns,
+                    rows,
+                    self.batch_size,
+                )
+            else:
+                _stage_executemany(
+                    self.connection,
+                    self.staging,
+                    columns,
+                    rows,
+                    self.batch_size,
+                )
+
+        # Columns of the file only read by lookups are not loaded
+        self.inputs = [
+            field
+            for lookup in dataset.lookups.values()
+            for field in lookup.fields()
+        ]
+        self.columns = [
+            name for name in columns if name not in self.inputs
+        ] + list(dataset.lookups)
+        self.values = [
+            name for name in self.columns if name not in dataset.key
+        ]
+        self.valid = self._valid()
+
+    def _valid(self):
+        dataset, table, staging = (
+            self.dataset,
+            self.dataset.table,
+            self.staging,
+        )
+
+        resolved = sa.select(
+            staging.c._row,
+            *[
+                _typed(table.c[name], staging.c[name]).label(name)
+                for name in self.columns
+                if name not in dataset.lookups
+            ],
+            *[
+                lookup.resolve(staging).label(name)
+                for name, lookup in dataset.lookups.items()
+            ],
+            *[staging.c[name] for name in dict.fromkeys(self.inputs)],
+        ).cte("resolved")
+
+        # Only the last row of a key is kept, as an upsert can't touch the
+        # same row twice in one statement.
+        latest = sa.select(sa.func.max(resolved.c._row)).group_by(
+            *[resolved.c[name] for name in dataset.key]
+        )
+
+        valid = sa.select(*[resolved.c[name] for name in self.columns]).where(
+            resolved.c._row.in_(latest)
+        )
+
+        for name, column in dataset.references:
+            valid = valid.where(sa.exists().where(column == resolved.c[name]))
+
+        # A lookup of an empty natural key is a NULL parent, while a lookup
+        # that finds no row is a missing parent
+        for name, lookup in dataset.lookups.items():
+            valid = valid.where(
+                sa.or_(
+                    resolved.c[name].is_not(None),
+                    *[
+                        resolved.c[field].is_(None)
+                        for field in lookup.fields()
+                    ],
+                )
+            )
+
+        # Keys of every staged row, skipped ones included, which a sync
+        # must not delete
+        self.keys = sa.select(*[resolved.c[name] for name in dataset.key]).cte(
+            "staged_keys"
+        )
+
+        return valid.cte("valid")
+
+    def _identity(self):
+        table = self.dataset.table
+
+        return [
+            *table.primary_key.columns,
+            *[table.c[name] for name in self.dataset.key],
+        ]
+
+    def upsert(self, changeset: Optional[Changeset] = None) -> LoadReport:
+        dataset, table, valid = self.dataset, self.dataset.table, self.valid
+
+        on_key = sa.and_(
+            *[table.c[name] == valid.c[name] for name in dataset.key]
+        )
+
+        # Hashed rows are compared by hash only. The other values are
+        # compared as well to tell real changes from rows that get their
+        # first hash, which keep their timestamp.
+        compared = [HASH_COLUMN] if dataset.hashed else self.values
+        changed = [name for name in self.values if name != HASH_COLUMN]
+
+        def differs(target, source, names):
+            return sa.or_(
+                *[
+                    target[name].is_distinct_from(source[name])
+                    for name in names
+                ]
+            )
+
+        staged = self.count(sa.select(self.staging))
+        total = self.count(sa.select(valid))
+        inserted = self.count(
+            sa.select(valid)
+            .select_from(valid.outerjoin(table, on_key))
+            .where(table.c[dataset.key[0]].is_(None))
+        )
+        updated_rows = (
+            sa.select(*self._identity())
+            .select_from(valid.join(table, on_key))
+            .where(differs(table.c, valid.c, compared))
+            .where(differs(table.c, valid.c, changed))
+        )
+        updated = self.count(updated_rows)
+
+        if changeset is not None:
+            changeset.add(
+                table.name, "updated", self.connection.execute(updated_rows)
+            )
+            last_id = self.connection.execute(
+                sa.select(sa.func.max(*table.primary_key.columns))
+            ).scalar()
+
+        insert = _insert(self.connection.dialect.name)(table)
+        insert = insert.from_select(
+            self.columns + [dataset.touch],
+            # The `WHERE` clause keeps SQLite from parsing `ON CONFLICT` as
+            # part of a join
+            sa.select(
+                *[valid.c[name] for name in self.columns], sa.func.now()
+            ).where(sa.true()),
+        )
+        self.connection.execute(
+            insert.on_conflict_do_update(
+                index_elements=list(dataset.key),
+                set_={
+                    **{name: insert.excluded[name] for name in self.values},
+                    dataset.touch: sa.case(
+                        (
+                            differs(table.c, insert.excluded, changed),
+                            sa.func.now(),
+                        ),
+                        else_=table.c[dataset.touch],
+                    ),
+                },
+                where=differs(table.c, insert.excluded, compared),
+            )
+        )
+
+        if changeset is not None:
+            # New rows get identifiers above the highest one before the
+            # insert
+            primary_key = list(table.primary_key.columns)[0]
+            new_rows = sa.select(*self._identity())
+
+            if last_id is not None:
+                new_rows = new_rows.where(primary_key > last_id)
+
+            changeset.add(
+                table.name, "inserted", self.connection.execute(new_rows)
+            )
+
+        return LoadReport(
+            table.name,
+            staged=staged,
+            inserted=inserted,
+            updated=updated,
+            unchanged=total - inserted - updated,
+            skipped=staged - total,
+        )
+
+    def delete(self, changeset: Optional[Changeset] = None) -> int:
+        """Delete the rows that are not in the file anymore"""
+
+        table, keys = self.dataset.table, self.keys
+
+        # Rows without a hash were not loaded from a file, e.g. rows added
+        # through the application, so they are left alone
+        gone = sa.and_(
+            table.c[HASH_COLUMN].is_not(None),
+            ~sa.exists().where(
+                *[table.c[name] == keys.c[name] for name in self.dataset.key]
+            ),
+        )
+        deleted_rows = sa.select(*self._identity()).where(gone)
+
+        # Counted beforehand, as drivers don't all report the row count of a
+        # `DELETE` with a `WITH` clause
+        if changeset is not None:
+            rows = self.connection.execute(deleted_rows).all()
+            changeset.add(table.name, "deleted", rows)
+            deleted = len(rows)
+        else:
+            deleted = self.count(deleted_rows)
+
+        self.connection.execute(sa.delete(table).where(gone))
+
+        return deleted
+
+    def drop(self) -> None:
+        self.staging.drop(self.connection)
+
+
+def load_data(
+    session,
+    data_dir: str,
+    only: Optional[Sequence[str]] = None,
+    batch_size: int = 5000,
+    sync: bool = False,
+    changeset: Optional[Changeset] = None,
+) -> list[LoadReport]:
+    """Load the TSV files of a data directory
+
+    Without `sync`, each file is committed on its own, so a failure leaves
+    the files loaded before it in place. With `sync`, all files are loaded in
+    a single transaction and the rows of hashed datasets that are missing
+    from the files are deleted, children first.
+
+    :param session: Database session
+    :param data_dir: Directory of the TSV files
+    :param only: Names of the tables to load, all of them by default
+    :param batch_size: Rows per batch sent to the database
+    :param sync: Delete the rows that disappeared from the files
+    :param changeset: Changeset collecting the rows affected by a sync
+    :raises DataLoadError: if rows of a hashed dataset are skipped. The
+        dataset is rolled back, along with the whole sync.
+    """
+
+    loads, reports = [], []
+
+    try:
+        for dataset in datasets():
+            if only and dataset.table.name not in only:
+                continue
+
+            load = _Load(session.connection(), dataset, batch_size)
+            load.stage(os.path.join(data_dir, dataset.file_name))
+            reports.append(load.upsert(changeset if sync else None))
+
+            if dataset.hashed and reports[-1].skipped:
+                raise DataLoadError(
+                    f"{reports[-1].skipped} rows of {dataset.file_name} "
+                    "were skipped, because of missing parents or duplicated "
+                    "keys"
+                )
+
+            if sync:
+                loads.append((load, reports[-1]))
+            else:
+                load.drop()
+                session.commit()
+
+        for load, report in reversed(loads):
+            if load.dataset.hashed:
+                report.deleted = load.delete(changeset)
+
+            load.drop()
+
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+
+    return reports
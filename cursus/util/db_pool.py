@@ -0,0 +1,261 @@
+# -*- coding: utf-8 -*-
+
+"""
+Database connection pool configuration and metrics
+
+`DatabasePool` turns the `DB_*` configuration variables into the engine
+options of Flask-SQLAlchemy, for the default engine and every bind, so the
+pool sizes and timeouts can be tuned from the environment. It must be
+initialized before Flask-SQLAlchemy, which creates the engines.
+
+Engines use `InstrumentedQueuePool`, a `QueuePool` that records how long
+checkouts wait for a connection and how often they time out, and exposes the
+number of checked out and idle connections as gauges. A checkout wait that
+grows with the traffic means the pool is too small for the threads of the
+worker.
+
+On PostgreSQL, `DB_STATEMENT_TIMEOUT` is set as the `statement_timeout` of
+every new connection, so a pathological query is cancelled by the server
+instead of holding a pooled connection indefinitely. The timeout is meant for
+the requests: the CLI commands that run long statements, like `load-data` and
+`index-advisor`, and the migrations lift it on their connection with
+`lift_statement_timeout`.
+"""
+
+import time
+import weakref
+
+from typing import Any, Callable, Optional
+
+import sqlalchemy as sa
+
+from flask import Flask
+from sqlalchemy.pool import QueuePool
+
+from .metrics import registry
+
+__all__ = [
+    "DatabasePool",
+    "InstrumentedQueuePool",
+    "lift_statement_timeout",
+]
+
+
+# Engine options set from the configuration variables
+ENGINE_OPTIONS = {
+    "pool_size": ("DB_POOL_SIZE", int),
+    "max_overflow": ("DB_MAX_OVERFLOW", int),
+    "pool_timeout": ("DB_POOL_TIMEOUT", float),
+    "pool_recycle": ("DB_POOL_RECYCLE", int),
+    "pool_pre_ping": ("DB_POOL_PRE_PING", lambda v: str(v).lower() == "true"),
+}
+
+# Database names of in-memory SQLite databases
+MEMORY = (None, "", ":memory:")
+
+_pools: "weakref.WeakSet[InstrumentedQueuePool]" = weakref.WeakSet()
+
+
+def _pool_connections():
+    for pool in list(_pools):
+        yield (pool.name, "checked_out"), pool.checkedout()
+        yield (pool.name, "idle"), pool.checkedin()
+
+
+def _pool_capacity():
+    for pool in list(_pools):
+        if pool.capacity is not None:
+            yield (pool.name,), pool.capacity
+
+
+POOL_CHECKOUT = registry.histogram(
+    "cursus_db_pool_checkout_seconds",
+    "Time spent getting a connection from the pool, including waits for a "
+    "free connection and new connections",
+    ("pool",),
+)
+POOL_TIMEOUTS = registry.counter(
+    "cursus_db_pool_timeouts_total",
+    "Checkouts that timed out because every connection was in use",
+    ("pool",),
+)
+POOL_CONNECTIONS = registry.gauge(
+    "cursus_db_pool_connections",
+    "Connections of the pool by state: checked_out or idle",
+    ("pool", "state"),
+    _pool_connections,
+)
+POOL_CAPACITY = registry.gauge(
+    "cursus_db_pool_capacity",
+    "Maximum number of connections of the pool, overflow included",
+    ("pool",),
+    _pool_capacity,
+)
+
+
+def _statement_timeout(milliseconds: int) -> Callable:
+    def set_statement_timeout(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute(f"SET statement_timeout = {int(milliseconds)}")
+        cursor.close()
+
+        # Otherwise the setting is rolled back with the first transaction
+        dbapi_connection.commit()
+
+    return set_statement_timeout
+
+
+def lift_statement_timeout(connection: sa.Connection) -> None:
+    """Disable the `statement_timeout` of a connection, on PostgreSQL
+
+    The setting is part of the current transaction of the connection, so it
+    must be committed to outlive it.
+    """
+
+    if connection.dialect.name == "postgresql":
+        connection.exec_driver_sql("SET statement_timeout = 0")
+
+
+class InstrumentedQueuePool(QueuePool):
+    """`QueuePool` recording the checkout metrics of the pool
+
+    :param pool_name: Name of the pool in the metrics
+    :param statement_timeout: `statement_timeout` of the new connections, in
+        milliseconds, 0 to keep the server default. PostgreSQL only.
+    """
+
+    # Log under the namespace of SQLAlchemy, which is quiet by default and
+    # follows `echo_pool`
+    _sqla_logger_namespace = "sqlalchemy.pool.impl.QueuePool"
+
+    def __init__(
+        self,
+        creator,
+        pool_size: int = 5,
+        max_overflow: int = 10,
+        pool_name: str = "default",
+        statement_timeout: int = 0,
+        **kw: Any,
+    ):
+        super().__init__(
+            creator, pool_size=pool_size, max_overflow=max_overflow, **kw
+        )
+
+        self.name = pool_name
+        self.capacity = pool_size + max_overflow if max_overflow >= 0 else None
+        self.statement_timeout = statement_timeout
+
+        # A recreated pool inherits the listeners of the pool it replaces
+        if statement_timeout and "_dispatch" not in kw:
+            sa.event.listen(
+                self, "connect", _statement_timeout(statement_timeout)
+            )
+
+        _pools.add(self)
+
+    def _do_get(self):
+        start = time.perf_counter()
+
+        try:
+            return super()._do_get()
+        except sa.exc.TimeoutError:
+            POOL_TIMEOUTS.inc(self.name)
+            raise
+        finally:
+            POOL_CHECKOUT.observe(time.perf_counter() - start, self.name)
+
+    def recreate(self) -> "InstrumentedQueuePool":
+        pool = super().recreate()
+        pool.name = self.name
+        pool.statement_timeout = self.statement_timeout
+
+        return pool
+
+
+class DatabasePool:
+    """Flask extension configuring the engines of Flask-SQLAlchemy
+
+    Configuration variables, unset ones keep the defaults of SQLAlchemy:
+
+    - `DB_POOL_SIZE`: connections kept open by the pool
+    - `DB_MAX_OVERFLOW`: connections opened beyond the pool size under load
+    - `DB_POOL_TIMEOUT`: seconds a checkout waits for a free connection
+    - `DB_POOL_RECYCLE`: seconds after which a connection is replaced
+    - `DB_POOL_PRE_PING`: test connections when they are checked out
+    - `DB_STATEMENT_TIMEOUT`: milliseconds after which PostgreSQL cancels a
+      statement, 0 to disable
+
+    Options set in `SQLALCHEMY_ENGINE_OPTIONS` or in the options of a bind
+    take precedence.
+    """
+
+    def __init__(self, app: Optional[Flask] = None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app: Flask) -> None:
+        for name, _ in ENGINE_OPTIONS.values():
+            app.config.setdefault(name, None)
+
+        app.config.setdefault("DB_STATEMENT_TIMEOUT", 0)
+
+        defaults = {
+            option: convert(app.config[name])
+            for option, (name, convert) in ENGINE_OPTIONS.items()
+            if app.config[name] is not None
+        }
+
+        # Copies, so the options of the configuration classes are not changed
+        options = {
+            **defaults,
+            **app.config.get("SQLALCHEMY_ENGINE_OPTIONS", {}),
+        }
+        uri = app.config.get("SQLALCHEMY_DATABASE_URI")
+
+        if uri is not None:
+            app.config["SQLALCHEMY_ENGINE_OPTIONS"] = self._options(
+                app, uri, options, None
+            )
+
+        binds = {}
+
+        for key, value in app.config.get("SQLALCHEMY_BINDS", {}).items():
+            bind = (
+                {"url": value}
+                if isinstance(value, (str, sa.engine.URL))
+                else dict(value)
+            )
+            binds[key] = self._options(
+                app, bind["url"], {**options, **bind}, key
+            )
+
+        app.config["SQLALCHEMY_BINDS"] = binds
+
+    @staticmethod
+    def _options(
+        app: Flask, uri, options: dict[str, Any], key: Optional[str]
+    ) -> dict[str, Any]:
+        url = sa.engine.make_url(uri)
+        options = dict(options)
+
+        # In-memory SQLite databases use a single static connection
+        if url.get_backend_name() == "sqlite" and url.database in MEMORY:
+            for option in ENGINE_OPTIONS:
+                options.pop(option, None)
+
+            return options
+
+        options.setdefault("poolclass", InstrumentedQueuePool)
+
+        # Other pool classes don't take the arguments of the instrumented one
+        if not issubclass(options["poolclass"], InstrumentedQueuePool):
+            return options
+
+        options.setdefault("pool_name", key or "default")
+
+        timeout = int(app.config["DB_STATEMENT_TIMEOUT"] or 0)
+
+        if timeout and url.get_backend_name() == "postgresql":
+            options.setdefault("statement_timeout", timeout)
+
+        return options
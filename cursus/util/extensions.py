@@ -11,14 +11,35 @@ from flask_login import LoginManager
 from flask_assets import Environment
 from flask_caching import Cache
 
+from .access_log import AccessLog
+from .db_pool import DatabasePool
+from .metrics import Metrics
+from .query_stats import QueryStats
+from .ratelimit import RateLimiter
+from .replicas import ReplicaRouter, RoutingSession
+from .response_cache import ResponseCache
+from .snapshot import ReferenceSnapshot
+from .suggest import SuggestIndex
+from .token_cache import TokenCache
+
 
 class Base(DeclarativeBase):
     """Base class for all models"""
 
 
-db = SQLAlchemy(model_class=Base)
+db = SQLAlchemy(model_class=Base, session_options={"class_": RoutingSession})
 migrate = Migrate()
 ma = Marshmallow()
 login_manager = LoginManager()
 assets = Environment()
 cache = Cache()
+limiter = RateLimiter()
+token_cache = TokenCache()
+reference_snapshot = ReferenceSnapshot()
+response_cache = ResponseCache()
+suggest_index = SuggestIndex()
+query_stats = QueryStats()
+metrics = Metrics()
+access_log = AccessLog()
+db_pool = DatabasePool()
+replicas = ReplicaRouter()
@@ -0,0 +1,212 @@
+# -*- coding: utf-8 -*-
+
+"""
+Facet counts for the search API endpoints
+
+A facet counts the results of a search by the values of a column, e.g. the
+number of matching courses per level or per university, so clients can build
+filter sidebars without running the search once per filter value.
+
+All the requested facets of a search are counted by a single aggregate query
+over the filtered search query. On PostgreSQL, it groups by `GROUPING SETS`,
+one set per facet, so the matching rows are only read once. Databases without
+`GROUPING SETS`, e.g. SQLite, get a `UNION ALL` of one `GROUP BY` per facet.
+
+Counts are cached by the normalized query string of the request: argument
+order, pagination and display arguments don't change the counts, and the
+search query is case-insensitive.
+"""
+
+import flask
+import sqlalchemy as sa
+
+from typing import Any, Callable, Optional, Sequence
+from urllib.parse import urlencode
+
+from .extensions import cache
+from .exceptions import BadRequestError
+
+__all__ = [
+    "Facet",
+    "parse_facets",
+    "facet_counts",
+]
+
+
+# Arguments that don't change the set of results of a search
+IGNORED_ARGS = ("page", "cursor", "total", "display", "sort_by", "facets")
+
+
+class Facet:
+    """Column of a search query that results are counted by
+
+    :param name: Name of the facet in the `facets` argument and the response
+    :param column: Name of the column of the search query with the value
+    :param label: Name of the column with a display label of the value
+    :param format: Function building the display label from the value
+    """
+
+    def __init__(
+        self,
+        name: str,
+        column: str,
+        label: Optional[str] = None,
+        format: Optional[Callable[[Any], Any]] = None,
+    ):
+        self.name = name
+        self.column = column
+        self.label = label
+        self.format = format
+
+    def __repr__(self) -> str:
+        return f"<Facet {self.name}>"
+
+    def columns(self, subquery) -> list:
+        columns = [subquery.c[self.column]]
+
+        if self.label is not None:
+            columns.append(subquery.c[self.label])
+
+        return columns
+
+    def item(self, value: Any, label: Any, count: int) -> dict[str, Any]:
+        item = {"value": value, "count": count}
+
+        if self.label is not None:
+            item["label"] = label
+        elif self.format is not None:
+            item["label"] = self.format(value)
+
+        return item
+
+
+def parse_facets(args, available: Sequence[Facet]) -> list[Facet]:
+    """Parse the `facets` argument of a search request
+
+    :raises BadRequestError: if a requested facet is not available
+    """
+
+    names = [
+        name
+        for name in args.get("facets", "", type=str).strip().lower().split(",")
+        if name
+    ]
+    by_name = {facet.name: facet for facet in available}
+
+    unknown = [name for name in names if name not in by_name]
+
+    if unknown:
+        raise BadRequestError(
+            f"Query string `facets` must be a comma-separated list of "
+            f"{', '.join(by_name)}"
+        )
+
+    return [by_name[name] for name in dict.fromkeys(names)]
+
+
+def _cache_key(request: flask.Request, facets: Sequence[Facet]) -> str:
+    args = sorted(
+        (key, value.strip().lower() if key == "query" else value)
+        for key, value in request.args.items(multi=True)
+        if key not in IGNORED_ARGS
+    )
+    names = ",".join(sorted(facet.name for facet in facets))
+
+    return f"facets:{request.path}:{names}?{urlencode(args)}"
+
+
+def _grouping_sets(session, subquery, facets: Sequence[Facet]):
+    columns = {}
+
+    for facet in facets:
+        for column in facet.columns(subquery):
+            columns[column.key] = column
+
+    flags = [
+        sa.func.grouping(subquery.c[facet.column]).label(f"_grouping_{i}")
+        for i, facet in enumerate(facets)
+    ]
+    statement = sa.select(
+        *columns.values(), *flags, sa.func.count().label("_count")
+    ).group_by(
+        sa.func.grouping_sets(
+            *[sa.tuple_(*facet.columns(subquery)) for facet in facets]
+        )
+    )
+
+    for row in session.execute(statement):
+        for i, facet in enumerate(facets):
+            # `GROUPING()` is 0 for the columns of the set a row belongs to
+            if row._mapping[f"_grouping_{i}"] == 0:
+                mapping = row._mapping
+                label = mapping[facet.label] if facet.label else None
+
+                yield facet, mapping[facet.column], label, row._count
+                break
+
+
+def _union_all(session, subquery, facets: Sequence[Facet]):
+    statements = []
+
+    for i, facet in enumerate(facets):
+        value = subquery.c[facet.column]
+        label = subquery.c[facet.label] if facet.label else sa.null()
+
+        statements.append(
+            sa.select(
+                sa.literal(i).label("_facet"),
+                value.label("_value"),
+                label.label("_label"),
+                sa.func.count().label("_count"),
+            ).group_by(*facet.columns(subquery))
+        )
+
+    for row in session.execute(sa.union_all(*statements)):
+        yield facets[row._facet], row._value, row._label, row._count
+
+
+def facet_counts(
+    session, query, facets: Sequence[Facet]
+) -> dict[str, list[dict[str, Any]]]:
+    """Count the results of a search query by facet
+
+    The counts are cached for `FACETS_CACHE_TTL` seconds, keyed by the
+    normalized query string of the current request.
+
+    :param session: Database session
+    :param query: Filtered search query, before pagination
+    :param facets: Facets to count, with columns of the search query
+    """
+
+    if not facets:
+        return {}
+
+    key = _cache_key(flask.request, facets)
+    counts = cache.get(key)
+
+    if counts is not None:
+        return counts
+
+    subquery = query.order_by(None).subquery()
+
+    if session.get_bind().dialect.name == "postgresql":
+        rows = _grouping_sets(session, subquery, facets)
+    else:
+        rows = _union_all(session, subquery, facets)
+
+    counts = {facet.name: [] for facet in facets}
+
+    for facet, value, label, count in rows:
+        counts[facet.name].append(facet.item(value, label, count))
+
+    # Largest facet values first, then in the order of their values
+    for items in counts.values():
+        items.sort(key=lambda item: (-item["count"], str(item["value"])))
+
+    cache.set(
+        key,
+        counts,
+        timeout=int(flask.current_app.config["FACETS_CACHE_TTL"]),
+    )
+
+    return counts
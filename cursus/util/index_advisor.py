@@ -0,0 +1,262 @@
+# -*- coding: utf-8 -*-
+
+"""
+Index advisor for the queries of the API endpoints
+
+It explains a catalogue of queries shaped like the ones issued by the API
+handlers and flags full scans of large tables, which usually mean that an
+index is missing or is not usable by the query. It is meant to run against a
+database with production-like data before deploying.
+
+On PostgreSQL, the queries are run with `EXPLAIN (ANALYZE, BUFFERS)` and every
+`Seq Scan` node is checked. On SQLite, `EXPLAIN QUERY PLAN` is used and every
+`SCAN` of a table without an index is checked.
+"""
+
+import json
+import sqlalchemy as sa
+
+from typing import Callable, Iterator, Optional
+
+__all__ = [
+    "Finding",
+    "QueryReport",
+    "advise",
+]
+
+
+class Finding:
+    """A full scan of a large table in the plan of a query"""
+
+    table: str
+    rows: int
+    detail: str
+
+    def __init__(self, table: str, rows: int, detail: str):
+        self.table = table
+        self.rows = rows
+        self.detail = detail
+
+    def __repr__(self) -> str:
+        return f"<Finding {self.table} ({self.rows} rows)>"
+
+
+class QueryReport:
+    """Plan summary of a query of the catalogue"""
+
+    name: str
+    findings: list[Finding]
+    execution_time: Optional[float]
+
+    def __init__(
+        self,
+        name: str,
+        findings: list[Finding],
+        execution_time: Optional[float] = None,
+    ):
+        self.name = name
+        self.findings = findings
+        self.execution_time = execution_time
+
+    def __repr__(self) -> str:
+        return f"<QueryReport {self.name} ({len(self.findings)} findings)>"
+
+
+def _samples(session) -> dict:
+    """Pick existing values to fill in the parameters of the queries"""
+
+    from cursus.models import Course, Department, University
+
+    university = session.execute(
+        sa.select(University.id, University.short_name)
+        .order_by(University.id)
+        .limit(1)
+    ).first()
+
+    department_id = session.scalar(sa.select(sa.func.min(Department.id)))
+    course_ids = session.scalars(
+        sa.select(Course.id).order_by(Course.id).limit(10)
+    ).all()
+
+    return {
+        "university_id": university[0] if university else 1,
+        "short_name": university[1] if university else "",
+        "department_id": department_id or 1,
+        "course_ids": course_ids or [1],
+        "query": "%eng%",
+    }
+
+
+def _catalogue() -> dict[str, Callable[[dict], sa.Select]]:
+    from cursus.models import (
+        Course,
+        Department,
+        School,
+        University,
+        UniversityCampus,
+        UniversityDomain,
+        UniversityFounder,
+    )
+
+    return {
+        "university_domains": lambda s: sa.select(UniversityDomain).where(
+            UniversityDomain.school_short_name == s["short_name"]
+        ),
+        "university_campuses": lambda s: sa.select(UniversityCampus).where(
+            UniversityCampus.school_short_name == s["short_name"]
+        ),
+        "university_founders": lambda s: sa.select(UniversityFounder).where(
+            UniversityFounder.school_short_name == s["short_name"]
+        ),
+        "schools_by_university_id": lambda s: (
+            sa.select(School)
+            .where(School.university_id == s["university_id"])
+            .order_by(School.id)
+            .limit(10)
+        ),
+        "departments_by_university_id": lambda s: (
+            sa.select(Department)
+            .where(Department.university_id == s["university_id"])
+            .order_by(Department.id)
+            .limit(10)
+        ),
+        "courses_by_department": lambda s: (
+            sa.select(Course)
+            .where(Course.department_id == s["department_id"])
+            .order_by(Course.id)
+            .limit(10)
+        ),
+        "courses_by_ids": lambda s: sa.select(Course).where(
+            Course.id.in_(s["course_ids"])
+        ),
+        "search_department": lambda s: (
+            sa.select(Department, School.name, University.full_name)
+            .join(School, School.id == Department.school_id)
+            .join(University, University.id == Department.university_id)
+            .where(Department.name.ilike(s["query"]))
+            .limit(10)
+        ),
+        "search_course_by_university": lambda s: (
+            sa.select(Course, Department.name)
+            .join(Department, Department.id == Course.department_id)
+            .where(Department.university_id == s["university_id"])
+            .where(Course.title.ilike(s["query"]))
+            .limit(10)
+        ),
+    }
+
+
+def _walk(node: dict) -> Iterator[dict]:
+    yield node
+
+    for child in node.get("Plans", []):
+        yield from _walk(child)
+
+
+def _explain_postgresql(connection, sql: str, sizes: dict[str, int]):
+    plan = connection.exec_driver_sql(
+        f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {sql}"
+    ).scalar()
+
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+
+    findings = []
+
+    for node in _walk(plan[0]["Plan"]):
+        if node["Node Type"] != "Seq Scan":
+            continue
+
+        table = node["Relation Name"]
+        buffers = node.get("Shared Hit Blocks", 0) + node.get(
+            "Shared Read Blocks", 0
+        )
+        detail = f"Seq Scan on {table} ({buffers} buffers)"
+        findings.append(Finding(table, sizes.get(table, 0), detail))
+
+    return findings, plan[0].get("Execution Time")
+
+
+def _explain_sqlite(connection, sql: str, sizes: dict[str, int]):
+    findings = []
+
+    for row in connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}"):
+        detail = row[-1]
+        words = detail.split()
+
+        # `SCAN <table>` reads the whole table, while `SEARCH` and scans of
+        # an index don't
+        if words[0] != "SCAN" or "USING" in words:
+            continue
+
+        table = words[1]
+
+        # Subqueries and aliases are scanned under names that aren't tables
+        if table not in sizes:
+            continue
+
+        findings.append(Finding(table, sizes[table], detail))
+
+    return findings, None
+
+
+def _table_sizes(connection) -> dict[str, int]:
+    if connection.dialect.name == "postgresql":
+        return dict(
+            connection.execute(
+                sa.text(
+                    "SELECT relname, reltuples::bigint FROM pg_class "
+                    "WHERE relkind = 'r'"
+                )
+            ).all()
+        )
+
+    from cursus.util.extensions import db
+
+    return {
+        name: connection.scalar(sa.select(sa.func.count()).select_from(table))
+        for name, table in db.metadata.tables.items()
+    }
+
+
+def advise(session, min_rows: int = 10000) -> list[QueryReport]:
+    """Explain the query catalogue and report full scans of large tables
+
+    :param session: Database session
+    :param min_rows: Tables with fewer rows are small enough to be scanned
+    """
+
+    connection = session.connection()
+    dialect = connection.dialect
+
+    if dialect.name == "postgresql":
+        explain = _explain_postgresql
+    else:
+        explain = _explain_sqlite
+
+    samples = _samples(session)
+    sizes = _table_sizes(connection)
+    reports = []
+
+    # `EXPLAIN ANALYZE` runs the queries, which are read-only. The transaction
+    # is rolled back anyway.
+    try:
+        for name, build in _catalogue().items():
+            sql = str(
+                build(samples).compile(
+                    dialect=dialect, compile_kwargs={"literal_binds": True}
+                )
+            )
+            findings, execution_time = explain(connection, sql, sizes)
+
+            reports.append(
+                QueryReport(
+                    name,
+                    [f for f in findings if f.rows >= min_rows],
+                    execution_time,
+                )
+            )
+    finally:
+        session.rollback()
+
+    return reports
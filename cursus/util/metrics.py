@@ -0,0 +1,579 @@
+# -*- coding: utf-8 -*-
+
+"""
+Metrics in the Prometheus text exposition format
+
+Counters and histograms are recorded into per-thread shards: a thread only
+ever writes to its own shard, so an increment is a plain dictionary update
+without any lock. Shards are summed when the metrics are collected, and the
+shards of finished threads are folded into a single retired shard.
+
+With several worker processes, set `METRICS_DIR` to a directory shared by the
+workers of a deployment, and empty it when the deployment starts. Every
+worker writes a snapshot of its totals to a file of that directory at most
+once per `METRICS_FLUSH_INTERVAL` seconds and when it exits, and `/metrics`
+sums the snapshots of all the workers. Counters and histograms of workers
+that have exited are kept, while their gauges are left out once their
+snapshot is older than three flush intervals.
+"""
+
+import os
+import hmac
+import time
+import json
+import bisect
+import atexit
+import tempfile
+import threading
+
+from typing import Callable, Iterable, Optional, Sequence
+
+import flask
+
+from flask import Flask
+
+__all__ = [
+    "Counter",
+    "Gauge",
+    "Histogram",
+    "Registry",
+    "Metrics",
+    "registry",
+]
+
+
+# Default buckets of latency histograms, in seconds
+LATENCY_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+)
+
+
+class _Shard:
+    def __init__(self, thread: threading.Thread):
+        self.thread = thread
+        self.counters: dict[tuple, float] = {}
+        self.histograms: dict[tuple, list[float]] = {}
+        self.gauges: dict[tuple, float] = {}
+
+
+class Registry:
+    """Metric definitions and the shards their values are recorded in"""
+
+    def __init__(self):
+        self.metrics: dict[str, "_Metric"] = {}
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._shards: list[_Shard] = []
+        self._retired = _Shard(threading.current_thread())
+
+    def shard(self) -> _Shard:
+        """Get the shard of the current thread"""
+
+        shard = getattr(self._local, "shard", None)
+
+        if shard is None:
+            shard = self._local.shard = _Shard(threading.current_thread())
+
+            # Only the first write of a thread takes the lock
+            with self._lock:
+                self._shards.append(shard)
+
+        return shard
+
+    def counter(
+        self, name: str, documentation: str, labels: Sequence[str] = ()
+    ) -> "Counter":
+        return self._register(Counter(name, documentation, labels))
+
+    def gauge(
+        self,
+        name: str,
+        documentation: str,
+        labels: Sequence[str],
+        callback: Callable[[], Iterable[tuple[tuple, float]]],
+    ) -> "Gauge":
+        return self._register(Gauge(name, documentation, labels, callback))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labels: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ) -> "Histogram":
+        return self._register(Histogram(name, documentation, labels, buckets))
+
+    def _register(self, metric):
+        metric.registry = self
+        self.metrics[metric.name] = metric
+
+        return metric
+
+    @staticmethod
+    def _merge(target: _Shard, counters: dict, histograms: dict) -> None:
+        for key, value in counters.items():
+            target.counters[key] = target.counters.get(key, 0) + value
+
+        for key, values in histograms.items():
+            merged = target.histograms.setdefault(key, [0.0] * len(values))
+
+            for i, value in enumerate(values):
+                merged[i] += value
+
+    def collect(self) -> _Shard:
+        """Sum the shards of all the threads of this process"""
+
+        total = _Shard(threading.current_thread())
+
+        with self._lock:
+            alive = []
+
+            for shard in self._shards:
+                if shard.thread.is_alive():
+                    alive.append(shard)
+                else:
+                    self._merge(
+                        self._retired, shard.counters, shard.histograms
+                    )
+
+            self._shards = alive
+            self._merge(
+                total, self._retired.counters, self._retired.histograms
+            )
+
+        for shard in alive:
+            # Copies of dictionaries are atomic, while the owner thread may
+            # be adding keys
+            histograms = {
+                key: list(values)
+                for key, values in shard.histograms.copy().items()
+            }
+            self._merge(total, shard.counters.copy(), histograms)
+
+        # Gauges are read when collected, not recorded by the threads
+        for metric in list(self.metrics.values()):
+            if isinstance(metric, Gauge):
+                for labels, value in metric.callback():
+                    key = (metric.name, tuple(labels))
+                    total.gauges[key] = total.gauges.get(key, 0) + value
+
+        return total
+
+    def dump(self, shard: _Shard) -> dict:
+        return {
+            "time": time.time(),
+            "counters": [
+                [*key, value] for key, value in shard.counters.items()
+            ],
+            "histograms": [
+                [*key, values] for key, values in shard.histograms.items()
+            ],
+            "gauges": [[*key, value] for key, value in shard.gauges.items()],
+        }
+
+    def load(
+        self, data: dict, into: _Shard, max_age: Optional[float] = None
+    ) -> None:
+        """Add the values of a snapshot
+
+        :param max_age: Seconds after which the gauges of a snapshot are
+            ignored, e.g. the snapshot of a worker that has exited
+        """
+
+        counters = {
+            (name, tuple(labels)): value
+            for name, labels, value in data["counters"]
+        }
+        histograms = {
+            (name, tuple(labels)): values
+            for name, labels, values in data["histograms"]
+        }
+        self._merge(into, counters, histograms)
+
+        if max_age is None or time.time() - data.get("time", 0) <= max_age:
+            for name, labels, value in data.get("gauges", ()):
+                key = (name, tuple(labels))
+                into.gauges[key] = into.gauges.get(key, 0) + value
+
+    def exposition(self, shard: _Shard) -> str:
+        """Render collected values in the Prometheus text format"""
+
+        lines = []
+
+        for metric in self.metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            lines.extend(metric.samples(shard))
+
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Iterable[str], values: Iterable[str]) -> str:
+    pairs = [f'{n}="{_escape(str(v))}"' for n, v in zip(names, values)]
+
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == int(value):
+        return str(int(value))
+
+    return repr(float(value))
+
+
+class _Metric:
+    type = "untyped"
+
+    registry: Registry
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str]):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+
+    def __repr__(self) -> str:
+        return f"<{type(self).__name__} {self.name}>"
+
+
+class Counter(_Metric):
+    """Monotonic counter"""
+
+    type = "counter"
+
+    def inc(self, *labels: str, value: float = 1) -> None:
+        """Add `value` to the counter of a label set"""
+
+        counters = self.registry.shard().counters
+        key = (self.name, labels)
+        counters[key] = counters.get(key, 0) + value
+
+    def samples(self, shard: _Shard) -> list[str]:
+        return [
+            f"{self.name}{_format_labels(self.labels, labels)} "
+            f"{_format_value(value)}"
+            for (name, labels), value in sorted(shard.counters.items())
+            if name == self.name
+        ]
+
+
+class Gauge(_Metric):
+    """Value read from a callback when the metrics are collected
+
+    :param callback: Function returning the pairs of label values and value
+        of the gauge in the current process
+    """
+
+    type = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labels: Sequence[str],
+        callback: Callable[[], Iterable[tuple[tuple, float]]],
+    ):
+        super().__init__(name, documentation, labels)
+        self.callback = callback
+
+    def samples(self, shard: _Shard) -> list[str]:
+        return [
+            f"{self.name}{_format_labels(self.labels, labels)} "
+            f"{_format_value(value)}"
+            for (name, labels), value in sorted(shard.gauges.items())
+            if name == self.name
+        ]
+
+
+class Histogram(_Metric):
+    """Distribution of observed values in cumulative buckets"""
+
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labels: Sequence[str],
+        buckets: Sequence[float],
+    ):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, *labels: str) -> None:
+        """Record a value for a label set"""
+
+        histograms = self.registry.shard().histograms
+        key = (self.name, labels)
+        values = histograms.get(key)
+
+        if values is None:
+            # One slot per bucket, one for +Inf, then the sum and the count
+            values = histograms[key] = [0.0] * (len(self.buckets) + 3)
+
+        values[bisect.bisect_left(self.buckets, value)] += 1
+        values[-2] += value
+        values[-1] += 1
+
+    def samples(self, shard: _Shard) -> list[str]:
+        samples = []
+
+        for (name, labels), values in sorted(shard.histograms.items()):
+            if name != self.name:
+                continue
+
+            cumulative = 0.0
+
+            for bound, count in zip(
+                [*map(repr, self.buckets), "+Inf"], values[:-2]
+            ):
+                cumulative += count
+                samples.append(
+                    f"{self.name}_bucket"
+                    f"{_format_labels((*self.labels, 'le'), (*labels, bound))}"
+                    f" {_format_value(cumulative)}"
+                )
+
+            suffix = _format_labels(self.labels, labels)
+            samples.append(
+                f"{self.name}_sum{suffix} {_format_value(values[-2])}"
+            )
+            samples.append(
+                f"{self.name}_count{suffix} {_format_value(values[-1])}"
+            )
+
+        return samples
+
+
+registry = Registry()
+
+REQUESTS = registry.counter(
+    "cursus_http_requests_total",
+    "HTTP requests by endpoint, method and status code",
+    ("endpoint", "method", "status"),
+)
+REQUEST_DURATION = registry.histogram(
+    "cursus_http_request_duration_seconds",
+    "Latency of the HTTP requests by endpoint",
+    ("endpoint",),
+)
+DB_QUERIES = registry.counter(
+    "cursus_db_queries_total",
+    "SQL statements run by endpoint",
+    ("endpoint",),
+)
+DB_SECONDS = registry.counter(
+    "cursus_db_seconds_total",
+    "Time spent running SQL statements by endpoint",
+    ("endpoint",),
+)
+REDIS_SECONDS = registry.counter(
+    "cursus_redis_seconds_total",
+    "Time spent in Redis calls by operation",
+    ("operation",),
+)
+TOKEN_CACHE = registry.counter(
+    "cursus_token_cache_lookups_total",
+    "API token lookups by the layer that answered them: local, shared or "
+    "database",
+    ("result",),
+)
+RESPONSE_CACHE = registry.counter(
+    "cursus_response_cache_lookups_total",
+    "Response cache lookups by result: hit or miss",
+    ("result",),
+)
+RATE_LIMIT_REJECTIONS = registry.counter(
+    "cursus_ratelimit_rejections_total",
+    "Requests rejected by the API token rate limit",
+)
+SERIALIZER_SECONDS = registry.counter(
+    "cursus_serializer_seconds_total",
+    "Time spent serializing rows by schema",
+    ("schema",),
+)
+
+
+class _State:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.flushed_at = time.monotonic()
+
+
+class Metrics:
+    """Flask extension recording request metrics and serving `/metrics`
+
+    Configuration variables:
+
+    - `METRICS`: record metrics and serve them at `/metrics` (default:
+      `True`)
+    - `METRICS_DIR`: directory shared by the worker processes, `None` for a
+      single process (default: `None`)
+    - `METRICS_FLUSH_INTERVAL`: minimum seconds between two snapshots of a
+      worker (default: 5)
+    - `METRICS_TOKEN`: bearer token required to read `/metrics`, if set
+    - `METRICS_REQUIRE_TOKEN`: disable the metrics when `METRICS_TOKEN` is
+      not set, so they are never served publicly (default: `False`)
+    """
+
+    def __init__(self, app: Optional[Flask] = None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app: Flask) -> None:
+        app.config.setdefault("METRICS", True)
+        app.config.setdefault("METRICS_DIR", None)
+        app.config.setdefault("METRICS_FLUSH_INTERVAL", 5)
+        app.config.setdefault("METRICS_TOKEN", None)
+        app.config.setdefault("METRICS_REQUIRE_TOKEN", False)
+
+        app.extensions["cursus_metrics"] = _State()
+
+        if (
+            app.config["METRICS"]
+            and app.config["METRICS_REQUIRE_TOKEN"]
+            and not app.config["METRICS_TOKEN"]
+        ):
+            app.logger.warning(
+                "METRICS_TOKEN is not set, metrics are disabled"
+            )
+            app.config["METRICS"] = False
+
+        if not app.config["METRICS"]:
+            return
+
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        app.add_url_rule("/metrics", "metrics", self._metrics)
+
+        if app.config["METRICS_DIR"]:
+            atexit.register(self.flush, app.config["METRICS_DIR"])
+
+    @staticmethod
+    def _before_request() -> None:
+        flask.g.metrics_start = time.perf_counter()
+
+    def _after_request(self, response: flask.Response) -> flask.Response:
+        start = flask.g.pop("metrics_start", None)
+
+        if start is None:
+            return response
+
+        req = flask.request
+        endpoint = req.endpoint or "unknown"
+
+        REQUESTS.inc(endpoint, req.method, str(response.status_code))
+        REQUEST_DURATION.observe(time.perf_counter() - start, endpoint)
+
+        counter = flask.g.get("query_counter")
+
+        if counter is not None and counter.count:
+            DB_QUERIES.inc(endpoint, value=counter.count)
+            DB_SECONDS.inc(endpoint, value=counter.duration)
+
+        self._maybe_flush()
+
+        return response
+
+    def _maybe_flush(self) -> None:
+        config = flask.current_app.config
+        directory = config["METRICS_DIR"]
+
+        if not directory:
+            return
+
+        state: _State = flask.current_app.extensions["cursus_metrics"]
+        interval = float(config["METRICS_FLUSH_INTERVAL"])
+
+        if time.monotonic() - state.flushed_at < interval:
+            return
+
+        # A single thread writes the snapshot, the others move on
+        if not state.lock.acquire(blocking=False):
+            return
+
+        try:
+            self.flush(directory)
+            state.flushed_at = time.monotonic()
+        finally:
+            state.lock.release()
+
+    @staticmethod
+    def flush(directory: str) -> None:
+        """Write the snapshot of this process to the metrics directory"""
+
+        os.makedirs(directory, exist_ok=True)
+        data = registry.dump(registry.collect())
+
+        # The snapshot is replaced atomically, so readers never see a
+        # partial file
+        fd, path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+
+        with os.fdopen(fd, "w") as file:
+            json.dump(data, file)
+
+        os.replace(path, os.path.join(directory, f"{os.getpid()}.json"))
+
+    @staticmethod
+    def collect(directory: Optional[str], max_age: Optional[float] = None):
+        """Sum the values of this process and of the other workers
+
+        :param max_age: Seconds after which the gauges of a snapshot are
+            ignored
+        """
+
+        total = registry.collect()
+
+        if not directory or not os.path.isdir(directory):
+            return total
+
+        own = f"{os.getpid()}.json"
+
+        for name in os.listdir(directory):
+            if not name.endswith(".json") or name == own:
+                continue
+
+            try:
+                with open(os.path.join(directory, name)) as file:
+                    registry.load(json.load(file), total, max_age)
+            except (OSError, ValueError):
+                continue
+
+        return total
+
+    def _metrics(self):
+        config = flask.current_app.config
+        token = config["METRICS_TOKEN"]
+
+        # Compared in constant time, so the response time doesn't tell how
+        # much of a guessed token is right
+        if token and not hmac.compare_digest(
+            flask.request.headers.get("Authorization", "").encode(),
+            f"Bearer {token}".encode(),
+        ):
+            return flask.Response("Unauthorized\n", status=401)
+
+        # Gauges describe the current state of a worker, so those of the
+        # workers that stopped writing snapshots are left out
+        max_age = 3 * float(config["METRICS_FLUSH_INTERVAL"])
+        total = self.collect(config["METRICS_DIR"], max_age)
+
+        return flask.Response(
+            registry.exposition(total),
+            mimetype="text/plain",
+            headers={"Content-Type": "text/plain; version=0.0.4"},
+        )
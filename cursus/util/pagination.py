@@ -0,0 +1,434 @@
+# -*- coding: utf-8 -*-
+
+"""
+Pagination helpers for the API endpoints
+
+Flask-SQLAlchemy's `paginate()` issues a `COUNT` query before fetching a page,
+and most handlers called `.count()` on the same query again to fill the
+`total` field of the response. The helpers in this module fetch a page of rows
+and the total number of rows in a single round trip by attaching a
+`COUNT(*) OVER()` window column to the query.
+
+Offset pagination gets slower the deeper a client goes, since the database
+has to scan and discard every earlier row. For crawling clients, `seek()`
+implements keyset pagination: an opaque cursor encodes the sort key values of
+the last row of a page, and the next page starts right after it with a seek
+predicate instead of an `OFFSET`.
+
+`paginate_sequence()` applies the same request arguments to an in-memory
+sequence, so data served from memory pages the same way as query results.
+"""
+
+import base64
+import bisect
+import binascii
+import json
+import math
+import flask
+import sqlalchemy as sa
+
+from typing import Any, Callable, Iterator, Optional, Sequence
+
+from .exceptions import BadRequestError
+
+__all__ = [
+    "Page",
+    "SortKey",
+    "paginate",
+    "seek",
+    "paginate_request",
+    "paginate_sequence",
+    "total_requested",
+]
+
+
+# Label of the window column that holds the total number of rows
+TOTAL_LABEL = "_cursus_total"
+
+# Label prefix of the columns that hold the sort key values for cursors
+KEY_LABEL = "_cursus_key"
+
+
+class Page:
+    """A page of results returned by the pagination helpers
+
+    It exposes the same attributes as Flask-SQLAlchemy's `Pagination` that are
+    used by the API handlers, so it can be passed to `Schema.dump()` directly.
+    `total` and `pages` are `None` when the total was not requested, and
+    `page` is `None` for pages fetched with a cursor.
+    """
+
+    items: list[Any]
+    page: Optional[int]
+    per_page: int
+    total: Optional[int]
+    has_next: bool
+    next_cursor: Optional[str]
+
+    def __init__(
+        self,
+        items: list[Any],
+        page: Optional[int],
+        per_page: int,
+        total: Optional[int] = None,
+        has_next: bool = False,
+        next_cursor: Optional[str] = None,
+    ):
+        self.items = items
+        self.page = page
+        self.per_page = per_page
+        self.total = total
+        self.has_next = has_next
+        self.next_cursor = next_cursor
+
+    def __iter__(self) -> Iterator[Any]:
+        return iter(self.items)
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def __repr__(self) -> str:
+        return f"<Page {self.page} ({len(self.items)} items)>"
+
+    @property
+    def pages(self) -> Optional[int]:
+        if self.total is None:
+            return None
+
+        return math.ceil(self.total / self.per_page) if self.total else 0
+
+    @property
+    def has_prev(self) -> bool:
+        return self.page is not None and self.page > 1
+
+
+class SortKey:
+    """A column of a keyset ordering
+
+    :param name: Stable name of the key, used to tie cursors to an ordering
+    :param expression: Column or SQL expression to sort by. It must not be
+        nullable, wrap nullable columns with `COALESCE()`.
+    :param descending: Sort in descending order
+    """
+
+    def __init__(self, name: str, expression, descending: bool = False):
+        self.name = name
+        self.expression = expression
+        self.descending = descending
+
+    def __repr__(self) -> str:
+        return f"<SortKey {self.signature}>"
+
+    @property
+    def signature(self) -> str:
+        return f"{self.name}:{'desc' if self.descending else 'asc'}"
+
+    def order_by(self):
+        if self.descending:
+            return self.expression.desc()
+
+        return self.expression.asc()
+
+    def after(self, value: Any):
+        if self.descending:
+            return self.expression < value
+
+        return self.expression > value
+
+
+def total_requested(args) -> bool:
+    """Check if the client wants the total number of results
+
+    Clients that only need to know whether there is a next page can pass
+    `total=false` to skip counting the rows.
+    """
+
+    return args.get("total", "true", type=str).lower() != "false"
+
+
+def _signature(keys: Sequence[SortKey]) -> str:
+    return ",".join(key.signature for key in keys)
+
+
+def encode_cursor(keys: Sequence[SortKey], values: Sequence[Any]) -> str:
+    """Encode the sort key values of a row into an opaque cursor"""
+
+    payload = json.dumps(
+        {"k": _signature(keys), "v": list(values)},
+        separators=(",", ":"),
+        default=str,
+    )
+
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(keys: Sequence[SortKey], cursor: str) -> list[Any]:
+    """Decode a cursor into sort key values
+
+    :raises BadRequestError: if the cursor is malformed or was issued for a
+        different ordering
+    """
+
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        signature, values = payload["k"], payload["v"]
+    except (binascii.Error, ValueError, TypeError, KeyError):
+        raise BadRequestError("Invalid cursor") from None
+
+    if signature != _signature(keys) or len(values) != len(keys):
+        raise BadRequestError("Cursor does not match the requested ordering")
+
+    return values
+
+
+def _seek_predicate(keys: Sequence[SortKey], values: Sequence[Any]):
+    # Expanded row-value comparison, e.g. for (a DESC, id ASC):
+    #   a < :a OR (a = :a AND id > :id)
+    clauses = []
+
+    for i, key in enumerate(keys):
+        equals = [keys[j].expression == values[j] for j in range(i)]
+        clauses.append(sa.and_(*equals, key.after(values[i])))
+
+    return sa.or_(*clauses)
+
+
+def _is_single_entity(query: sa.orm.Query) -> bool:
+    return len(query.column_descriptions) == 1
+
+
+def _strip_extra_columns(rows: list, single: bool) -> list:
+    # A query for a single entity returns the entity itself. Once extra
+    # columns are attached, the entity has to be unpacked from the row. For
+    # queries with multiple columns, the extra columns are left in the row as
+    # they are ignored by the schemas.
+    if single:
+        return [row[0] for row in rows]
+
+    return rows
+
+
+def paginate(
+    query: sa.orm.Query,
+    page: int = 1,
+    per_page: int = 10,
+    error_out: bool = True,
+    with_total: bool = True,
+) -> Page:
+    """Fetch a page of rows from a query
+
+    :param query: Query to paginate, with filters and ordering applied
+    :param page: 1-based page number
+    :param per_page: Maximum number of items per page
+    :param error_out: Abort with 404 if the page is out of range
+    :param with_total: Compute the total number of rows with the page. If
+        `False`, one extra row is fetched to tell if there is a next page.
+    """
+
+    if page < 1:
+        if error_out:
+            flask.abort(404)
+
+        page = 1
+
+    offset = (page - 1) * per_page
+    single = _is_single_entity(query)
+
+    if not with_total:
+        rows = query.limit(per_page + 1).offset(offset).all()
+
+        if not rows and page > 1 and error_out:
+            flask.abort(404)
+
+        return Page(
+            rows[:per_page],
+            page,
+            per_page,
+            total=None,
+            has_next=len(rows) > per_page,
+        )
+
+    rows = (
+        query.add_columns(sa.func.count().over().label(TOTAL_LABEL))
+        .limit(per_page)
+        .offset(offset)
+        .all()
+    )
+
+    if rows:
+        total = rows[0][-1]
+        items = _strip_extra_columns(rows, single)
+    elif page > 1:
+        if error_out:
+            flask.abort(404)
+
+        # The window column is only available with at least one row, so the
+        # total has to be counted separately for out-of-range pages.
+        total = query.order_by(None).count()
+        items = []
+    else:
+        total = 0
+        items = []
+
+    return Page(
+        items,
+        page,
+        per_page,
+        total=total,
+        has_next=offset + len(items) < total,
+    )
+
+
+def seek(
+    query: sa.orm.Query,
+    keys: Sequence[SortKey],
+    cursor: Optional[str] = None,
+    per_page: int = 10,
+) -> Page:
+    """Fetch a page of rows that come after a cursor
+
+    The query is ordered by `keys`, which must end with a unique column (the
+    primary key) so the ordering is total. An empty or `None` cursor fetches
+    the first page. The total is not computed in this mode.
+
+    :param query: Query to paginate, with filters applied
+    :param keys: Sort keys of the ordering
+    :param cursor: Cursor returned as `next_cursor` by a previous page
+    :param per_page: Maximum number of items per page
+    """
+
+    single = _is_single_entity(query)
+
+    query = query.order_by(None).order_by(*[key.order_by() for key in keys])
+    query = query.add_columns(
+        *[
+            key.expression.label(f"{KEY_LABEL}_{i}")
+            for i, key in enumerate(keys)
+        ]
+    )
+
+    if cursor:
+        query = query.filter(
+            _seek_predicate(keys, decode_cursor(keys, cursor))
+        )
+
+    rows = query.limit(per_page + 1).all()
+    has_next = len(rows) > per_page
+    rows = rows[:per_page]
+
+    next_cursor = None
+
+    if has_next:
+        next_cursor = encode_cursor(keys, tuple(rows[-1])[-len(keys) :])
+
+    return Page(
+        _strip_extra_columns(rows, single),
+        None,
+        per_page,
+        total=None,
+        has_next=has_next,
+        next_cursor=next_cursor,
+    )
+
+
+def paginate_request(
+    query: sa.orm.Query,
+    keys: Sequence[SortKey],
+    args,
+    per_page: int = 10,
+    error_out: bool = True,
+) -> Page:
+    """Paginate a query based on the request arguments
+
+    If the request has a `cursor` argument, even an empty one, the page is
+    fetched with keyset pagination. Otherwise, the `page` and `total`
+    arguments are used for offset pagination. The ordering in `keys` is only
+    applied in cursor mode; offset mode keeps the ordering of the query.
+    """
+
+    cursor = args.get("cursor", None, type=str)
+
+    if cursor is not None:
+        return seek(query, keys, cursor, per_page=per_page)
+
+    return paginate(
+        query,
+        args.get("page", 1, type=int),
+        per_page=per_page,
+        error_out=error_out,
+        with_total=total_requested(args),
+    )
+
+
+def paginate_sequence(
+    items: Sequence[Any],
+    keys: Sequence[SortKey],
+    key_values: Callable[[Any], tuple],
+    args,
+    per_page: int = 10,
+    error_out: bool = True,
+) -> Page:
+    """Paginate an in-memory sequence based on the request arguments
+
+    It mirrors `paginate_request()`, and cursors are interchangeable between
+    the two as long as the keys have the same signature.
+
+    :param items: Items sorted in ascending order of `key_values`
+    :param keys: Sort keys of the ordering, only used for cursors
+    :param key_values: Function returning the sort key values of an item
+    :param args: Request arguments
+    :param per_page: Maximum number of items per page
+    :param error_out: Abort with 404 if the page is out of range
+    """
+
+    cursor = args.get("cursor", None, type=str)
+
+    if cursor is not None:
+        start = 0
+
+        if cursor:
+            values = tuple(decode_cursor(keys, cursor))
+
+            try:
+                start = bisect.bisect_right(items, values, key=key_values)
+            except TypeError:
+                raise BadRequestError("Invalid cursor") from None
+
+        page_items = list(items[start : start + per_page])
+        has_next = start + per_page < len(items)
+        next_cursor = None
+
+        if has_next:
+            next_cursor = encode_cursor(keys, key_values(page_items[-1]))
+
+        return Page(
+            page_items,
+            None,
+            per_page,
+            total=None,
+            has_next=has_next,
+            next_cursor=next_cursor,
+        )
+
+    page = args.get("page", 1, type=int)
+
+    if page < 1:
+        if error_out:
+            flask.abort(404)
+
+        page = 1
+
+    offset = (page - 1) * per_page
+    page_items = list(items[offset : offset + per_page])
+
+    if not page_items and page > 1 and error_out:
+        flask.abort(404)
+
+    return Page(
+        page_items,
+        page,
+        per_page,
+        total=len(items) if total_requested(args) else None,
+        has_next=offset + per_page < len(items),
+    )
@@ -0,0 +1,358 @@
+# -*- coding: utf-8 -*-
+
+"""
+Preforking Waitress server
+
+One Waitress process can't use more than one core for the work that holds
+the GIL, such as serialization and JSON encoding. `Prefork` binds the
+listening socket once, loads and warms the app in a master process, and
+forks worker processes that each serve the shared socket with their own
+Waitress thread pool. The kernel spreads the connections across the workers.
+
+Workers inherit the warm in-process caches of the master (the reference
+snapshot and the suggest index) through copy-on-write memory. The master
+closes its database connections before forking, and every worker discards
+the connection pools it inherited, so no connection is ever shared between
+processes.
+
+Signals handled by the master:
+
+- `SIGTERM`, `SIGINT`: stop the workers gracefully and exit.
+- `SIGHUP`: graceful reload. The app is created again, so configuration
+  changes are picked up, then new workers are started and the old ones are
+  stopped gracefully. Code changes need a restart of the master.
+- `SIGTTIN`, `SIGTTOU`: add or remove a worker.
+
+A worker stopping gracefully closes its copy of the listening socket and its
+idle keep-alive connections, lets its in-flight requests complete for up to
+`graceful_timeout` seconds, writes its buffered logs and metrics and exits.
+Workers that die unexpectedly are replaced.
+"""
+
+import os
+import sys
+import time
+import signal
+import socket
+
+from typing import Callable, Optional
+
+import waitress
+
+from flask import Flask
+from waitress import wasyncore
+
+__all__ = [
+    "Prefork",
+    "warm_up",
+    "dispose_engines",
+]
+
+
+# Seconds between two checks of the workers by the master, which also bounds
+# how fast crashing workers are replaced
+MASTER_INTERVAL = 1.0
+
+# Seconds the master waits for a stopping worker beyond its graceful timeout,
+# for the shutdown of its threads and the flush of its logs and metrics,
+# before killing it
+STOP_MARGIN = 5.0
+
+
+def warm_up(app: Flask) -> None:
+    """Load the in-process caches of an app before it serves traffic"""
+
+    from .extensions import db, reference_snapshot, suggest_index
+
+    with app.app_context():
+        if reference_snapshot.enabled:
+            reference_snapshot.refresh()
+
+        suggest_index.refresh()
+        db.session.remove()
+
+
+def dispose_engines(app: Flask, close: bool = True) -> None:
+    """Discard the connection pools of the database engines of an app
+
+    :param close: Close the pooled connections. A forked process passes
+        `False`, so the connections of its parent are left untouched.
+    """
+
+    from .extensions import db
+
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=close)
+
+
+class _Worker:
+    """Worker process serving a listening socket"""
+
+    def __init__(
+        self,
+        app: Flask,
+        wsgi: Callable,
+        sock: socket.socket,
+        threads: int,
+        graceful_timeout: float,
+    ):
+        self.app = app
+        self.wsgi = wsgi
+        self.sock = sock
+        self.threads = threads
+        self.graceful_timeout = graceful_timeout
+        self.stopping = False
+
+    def _stop(self, signum, frame) -> None:
+        self.stopping = True
+
+    def run(self) -> None:
+        signal.signal(signal.SIGTERM, self._stop)
+        signal.signal(signal.SIGINT, self._stop)
+        signal.signal(signal.SIGHUP, signal.SIG_IGN)
+        signal.signal(signal.SIGTTIN, signal.SIG_DFL)
+        signal.signal(signal.SIGTTOU, signal.SIG_DFL)
+
+        dispose_engines(self.app, close=False)
+
+        socket_map: dict = {}
+        server = waitress.create_server(
+            self.wsgi,
+            map=socket_map,
+            sockets=[self.sock],
+            threads=self.threads,
+            ident="cursus",
+        )
+
+        while not self.stopping:
+            wasyncore.loop(timeout=1.0, map=socket_map, count=1)
+
+        # Stop accepting connections. The other workers keep serving the
+        # listening socket, as only the copy of this process is closed.
+        server.del_channel()
+        server.socket.close()
+
+        deadline = time.monotonic() + self.graceful_timeout
+
+        while server.active_channels and time.monotonic() < deadline:
+            self._close_idle(server)
+            wasyncore.loop(timeout=0.1, map=socket_map, count=1)
+
+        server.task_dispatcher.shutdown(timeout=1)
+        self._flush()
+
+    @staticmethod
+    def _close_idle(server) -> None:
+        # Waitress closes idle keep-alive connections in its maintenance,
+        # which no longer runs once the server channel is removed. Channels
+        # without a pending request are closed after their output is sent.
+        for channel in list(server.active_channels.values()):
+            if not channel.requests and channel.request is None:
+                channel.close_when_flushed = True
+
+    def _flush(self) -> None:
+        # Workers leave through `os._exit()`, which skips the `atexit`
+        # handlers, so the buffered logs and metrics are written here
+        from .extensions import access_log, metrics
+
+        access_log.stop(self.app)
+
+        if self.app.config.get("METRICS_DIR"):
+            metrics.flush(self.app.config["METRICS_DIR"])
+
+
+class Prefork:
+    """Master process of preforked Waitress workers
+
+    :param load: Function creating the Flask app, called again on reload
+    :param wrap: Function wrapping the app into the served WSGI application,
+        e.g. with middlewares
+    :param host: Host to bind to
+    :param port: Port to bind to
+    :param workers: Number of worker processes
+    :param threads: Number of threads of each worker
+    :param graceful_timeout: Seconds a stopping worker is given to complete
+        its in-flight requests
+    :param backlog: Queue size of the listening socket
+    """
+
+    def __init__(
+        self,
+        load: Callable[[], Flask],
+        wrap: Optional[Callable[[Flask], Callable]] = None,
+        host: str = "0.0.0.0",
+        port: int = 8000,
+        workers: int = 2,
+        threads: int = 4,
+        graceful_timeout: float = 30,
+        backlog: int = 1024,
+    ):
+        self.load = load
+        self.wrap = wrap or (lambda app: app)
+        self.host = host
+        self.port = port
+        self.workers = workers
+        self.threads = threads
+        self.graceful_timeout = graceful_timeout
+        self.backlog = backlog
+
+        self.sock: Optional[socket.socket] = None
+        self.app: Optional[Flask] = None
+        self.children: dict[int, float] = {}
+        self.signals: list[int] = []
+
+    def _load(self) -> None:
+        app = self.load()
+        warm_up(app)
+
+        # The master keeps no database connection, so none is inherited by
+        # the workers
+        dispose_engines(app)
+        self.app = app
+
+    def _spawn(self) -> int:
+        pid = os.fork()
+
+        if pid:
+            self.children[pid] = time.monotonic()
+            return pid
+
+        status = 0
+
+        try:
+            _Worker(
+                self.app,
+                self.wrap(self.app),
+                self.sock,
+                self.threads,
+                self.graceful_timeout,
+            ).run()
+        except BaseException:  # pragma: no cover
+            self.app.logger.exception("Worker %d failed", os.getpid())
+            status = 1
+        finally:
+            sys.stdout.flush()
+            sys.stderr.flush()
+            os._exit(status)
+
+    def _stop(self, pids, timeout: float) -> None:
+        for pid in pids:
+            self._kill(pid, signal.SIGTERM)
+
+        # The workers count the graceful timeout from the signal too, so the
+        # margin lets them shut down and flush before being killed
+        deadline = time.monotonic() + timeout + STOP_MARGIN
+        pending = set(pids)
+
+        while pending and time.monotonic() < deadline:
+            pending -= self._reap()
+            time.sleep(0.05)
+
+        for pid in pending:
+            self._kill(pid, signal.SIGKILL)
+            os.waitpid(pid, 0)
+            self.children.pop(pid, None)
+
+    def _kill(self, pid: int, signum: int) -> None:
+        try:
+            os.kill(pid, signum)
+        except ProcessLookupError:
+            pass
+
+    def _reap(self) -> set[int]:
+        """Collect the exited workers"""
+
+        exited = set()
+
+        while True:
+            try:
+                pid, _ = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                break
+
+            if not pid:
+                break
+
+            exited.add(pid)
+            self.children.pop(pid, None)
+
+        return exited
+
+    def _reload(self) -> None:
+        self.app.logger.info("Reloading %d workers", self.workers)
+
+        old = list(self.children)
+
+        try:
+            self._load()
+        except Exception:
+            # The old workers keep serving with the previous app
+            self.app.logger.exception("Reload failed")
+            return
+
+        for _ in range(self.workers):
+            self._spawn()
+
+        self._stop(old, self.graceful_timeout)
+
+    def _signal(self, signum, frame) -> None:
+        self.signals.append(signum)
+
+    def run(self) -> None:
+        """Serve until `SIGTERM` or `SIGINT`"""
+
+        self.sock = socket.create_server(
+            (self.host, self.port), backlog=self.backlog
+        )
+        self._load()
+
+        for signum in (
+            signal.SIGTERM,
+            signal.SIGINT,
+            signal.SIGHUP,
+            signal.SIGTTIN,
+            signal.SIGTTOU,
+        ):
+            signal.signal(signum, self._signal)
+
+        self.app.logger.info(
+            "Serving on %s:%d with %d workers of %d threads",
+            self.host,
+            self.port,
+            self.workers,
+            self.threads,
+        )
+
+        try:
+            self._loop()
+        finally:
+            self._stop(list(self.children), self.graceful_timeout)
+            self.sock.close()
+
+    def _loop(self) -> None:
+        while True:
+            while self.signals:
+                signum = self.signals.pop(0)
+
+                if signum in (signal.SIGTERM, signal.SIGINT):
+                    return
+
+                if signum == signal.SIGHUP:
+                    self._reload()
+                elif signum == signal.SIGTTIN:
+                    self.workers += 1
+                elif signum == signal.SIGTTOU and self.workers > 1:
+                    self.workers -= 1
+                    oldest = min(self.children, key=self.children.get)
+                    self._stop([oldest], self.graceful_timeout)
+
+            for pid in self._reap():
+                self.app.logger.warning("Worker %d exited", pid)
+
+            missing = self.workers - len(self.children)
+
+            for _ in range(max(missing, 0)):
+                self._spawn()
+
+            time.sleep(MASTER_INTERVAL)
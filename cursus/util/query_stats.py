@@ -0,0 +1,180 @@
+# -*- coding: utf-8 -*-
+
+"""
+Per-request SQL query statistics
+
+`QueryStats` hooks the `before_cursor_execute` and `after_cursor_execute`
+events of SQLAlchemy engines to count the statements a request issues and the
+time they take. With `QUERY_STATS` enabled, responses carry the numbers in a
+`Server-Timing` header, which browser developer tools display, and in an
+`X-Cursus-Queries` header.
+
+Statements slower than `QUERY_SLOW_THRESHOLD` milliseconds are logged with the
+endpoint that issued them, whether `QUERY_STATS` is enabled or not.
+
+`assert_max_queries()` counts the statements of a block of code, so tests can
+catch N+1 query regressions.
+"""
+
+import time
+import contextlib
+import sqlalchemy as sa
+
+from typing import Iterator, Optional
+
+import flask
+
+from flask import Flask
+
+__all__ = [
+    "QueryCounter",
+    "QueryStats",
+    "assert_max_queries",
+]
+
+
+class QueryCounter:
+    """Number and duration of the statements of a request"""
+
+    count: int
+    duration: float
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __repr__(self) -> str:
+        return f"<QueryCounter {self.count} ({self.duration * 1000:.1f} ms)>"
+
+    def server_timing(self) -> str:
+        return f'db;dur={self.duration * 1000:.1f};desc="{self.count} queries"'
+
+
+def _before_cursor_execute(conn, cursor, statement, *args):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, *args):
+    duration = time.perf_counter() - conn.info["query_start"].pop()
+
+    if not flask.has_app_context():
+        return
+
+    counter = flask.g.get("query_counter")
+
+    if counter is not None:
+        counter.count += 1
+        counter.duration += duration
+
+    threshold = flask.current_app.config.get("QUERY_SLOW_THRESHOLD")
+
+    if threshold is not None and duration * 1000 >= float(threshold):
+        endpoint = (
+            flask.request.endpoint if flask.has_request_context() else None
+        )
+
+        flask.current_app.logger.warning(
+            "Slow query (%.1f ms) in %s: %s",
+            duration * 1000,
+            endpoint or "-",
+            " ".join(statement.split()),
+        )
+
+
+def _handle_error(context):
+    # Failed statements never reach `after_cursor_execute`
+    if context.connection is not None:
+        starts = context.connection.info.get("query_start")
+
+        if starts:
+            starts.pop()
+
+
+class QueryStats:
+    """Flask extension collecting SQL query statistics per request
+
+    Configuration variables:
+
+    - `QUERY_STATS`: add the `Server-Timing` and `X-Cursus-Queries` headers
+      to the responses (default: `False`)
+    - `QUERY_SLOW_THRESHOLD`: log statements taking at least this many
+      milliseconds, `None` to disable (default: 500)
+    """
+
+    def __init__(self, app: Optional[Flask] = None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app: Flask) -> None:
+        app.config.setdefault("QUERY_STATS", False)
+        app.config.setdefault("QUERY_SLOW_THRESHOLD", 500)
+
+        # The events are listened to on the `Engine` class, so they cover
+        # every engine, including the ones created after this call
+        for name, listener in (
+            ("before_cursor_execute", _before_cursor_execute),
+            ("after_cursor_execute", _after_cursor_execute),
+            ("handle_error", _handle_error),
+        ):
+            if not sa.event.contains(sa.engine.Engine, name, listener):
+                sa.event.listen(sa.engine.Engine, name, listener)
+
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+
+    @staticmethod
+    def _before_request() -> None:
+        flask.g.query_counter = QueryCounter()
+
+    @staticmethod
+    def _after_request(response: flask.Response) -> flask.Response:
+        counter = flask.g.pop("query_counter", None)
+
+        # Statements of streamed responses run after the headers are sent,
+        # so they are not counted
+        if counter is not None and flask.current_app.config["QUERY_STATS"]:
+            response.headers.add("Server-Timing", counter.server_timing())
+            response.headers["X-Cursus-Queries"] = str(counter.count)
+
+        return response
+
+    @staticmethod
+    def current() -> Optional[QueryCounter]:
+        """Get the query counter of the current request, if any"""
+
+        return flask.g.get("query_counter")
+
+
+@contextlib.contextmanager
+def assert_max_queries(
+    maximum: int, engine: Optional[sa.engine.Engine] = None
+) -> Iterator[list[str]]:
+    """Fail if a block of code runs more than `maximum` SQL statements
+
+    :param maximum: Maximum number of statements
+    :param engine: Engine to watch, the default engine of the app if `None`
+    :raises AssertionError: with the statements, if there are too many
+    """
+
+    if engine is None:
+        from .extensions import db
+
+        engine = db.engine
+
+    statements: list[str] = []
+
+    def record(conn, cursor, statement, *args):
+        statements.append(" ".join(statement.split()))
+
+    sa.event.listen(engine, "after_cursor_execute", record)
+
+    try:
+        yield statements
+    finally:
+        sa.event.remove(engine, "after_cursor_execute", record)
+
+    if len(statements) > maximum:
+        raise AssertionError(
+            f"{len(statements)} queries were run, at most {maximum} "
+            f"expected:\n" + "\n".join(statements)
+        )
@@ -0,0 +1,339 @@
+# -*- coding: utf-8 -*-
+
+"""
+API token rate limiter
+
+Each API request consumes a weight from the rate limit of its token. Checking
+and consuming the limit happens atomically in a single round trip: with Redis,
+through a server-side Lua script, and with an in-process cache, e.g.
+`SimpleCache` used in development and testing, under a lock.
+
+Two algorithms are supported:
+
+- `fixed`: the window starts with the first request of a token and the
+  counter resets once the window expires.
+- `sliding`: the sliding window counter approximation, which weights the count
+  of the previous fixed window by how much of it still overlaps with the
+  sliding window. It avoids bursts of twice the limit around window edges.
+"""
+
+import math
+import time
+import datetime
+import threading
+
+from typing import Callable, Optional, Union
+
+from flask import Flask, Request, current_app
+
+from .metrics import REDIS_SECONDS
+
+__all__ = [
+    "RateLimitResult",
+    "RateLimiter",
+]
+
+
+FIXED_WINDOW_SCRIPT = """
+local key = KEYS[1]
+local limit = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local weight = tonumber(ARGV[4])
+
+local start = tonumber(redis.call("HGET", key, "start"))
+local count = tonumber(redis.call("HGET", key, "count")) or 0
+
+if not start then
+    start = math.floor(now)
+    count = 0
+    redis.call("HSET", key, "start", start, "count", 0)
+    redis.call("EXPIRE", key, window)
+end
+
+local allowed = 0
+
+if count + weight <= limit then
+    count = tonumber(redis.call("HINCRBYFLOAT", key, "count", weight))
+    allowed = 1
+end
+
+return {allowed, tostring(count), redis.call("TTL", key), start}
+"""
+
+SLIDING_WINDOW_SCRIPT = """
+local key = KEYS[1]
+local limit = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local weight = tonumber(ARGV[4])
+
+local index = math.floor(now / window)
+local current_key = key .. ":" .. index
+local previous_key = key .. ":" .. (index - 1)
+
+local current = tonumber(redis.call("GET", current_key)) or 0
+local previous = tonumber(redis.call("GET", previous_key)) or 0
+local elapsed = now - index * window
+local count = previous * (window - elapsed) / window + current
+
+local allowed = 0
+
+if count + weight <= limit then
+    redis.call("INCRBYFLOAT", current_key, weight)
+    redis.call("EXPIRE", current_key, window * 2)
+    count = count + weight
+    allowed = 1
+end
+
+return {allowed, tostring(count), math.ceil(window - elapsed), index * window}
+"""
+
+# Refunds never create a window; they only give back what was consumed.
+FIXED_WINDOW_REFUND_SCRIPT = """
+if redis.call("EXISTS", KEYS[1]) == 1 then
+    redis.call("HINCRBYFLOAT", KEYS[1], "count", -tonumber(ARGV[1]))
+end
+return 0
+"""
+
+SLIDING_WINDOW_REFUND_SCRIPT = """
+local key = KEYS[1] .. ":" .. math.floor(tonumber(ARGV[2]) / tonumber(ARGV[3]))
+if redis.call("EXISTS", key) == 1 then
+    redis.call("INCRBYFLOAT", key, -tonumber(ARGV[1]))
+end
+return 0
+"""
+
+
+class RateLimitResult:
+    """Outcome of consuming a rate limit"""
+
+    allowed: bool
+    limit: int
+    count: float
+    ttl: int
+    start: int
+
+    def __init__(
+        self, allowed: bool, limit: int, count: float, ttl: int, start: int
+    ):
+        self.allowed = allowed
+        self.limit = limit
+        self.count = count
+        self.ttl = ttl
+        self.start = start
+
+    def __repr__(self) -> str:
+        return f"<RateLimitResult {self.count}/{self.limit}>"
+
+    @property
+    def remaining(self) -> int:
+        return max(0, math.floor(self.limit - self.count))
+
+    def headers(self) -> dict[str, str]:
+        """Build the `X-Cursus-*` headers describing the rate limit"""
+
+        start = datetime.datetime.fromtimestamp(
+            self.start, datetime.timezone.utc
+        )
+
+        return {
+            "X-Cursus-Limit": str(self.limit),
+            "X-Cursus-Remaining": str(self.remaining),
+            "X-Cursus-Start": start.strftime("%a, %d %b %Y %H:%M:%S GMT"),
+            "X-Cursus-TTL": str(max(0, self.ttl)),
+        }
+
+
+class RedisStorage:
+    """Rate limit storage backed by Lua scripts on a Redis server"""
+
+    def __init__(self, client, strategy: str):
+        self.strategy = strategy
+
+        if strategy == "sliding":
+            self._hit = client.register_script(SLIDING_WINDOW_SCRIPT)
+            self._refund = client.register_script(SLIDING_WINDOW_REFUND_SCRIPT)
+        else:
+            self._hit = client.register_script(FIXED_WINDOW_SCRIPT)
+            self._refund = client.register_script(FIXED_WINDOW_REFUND_SCRIPT)
+
+    def hit(
+        self, key: str, limit: int, window: int, weight: float, now: float
+    ) -> RateLimitResult:
+        started = time.perf_counter()
+        allowed, count, ttl, start = self._hit(
+            keys=[key], args=[limit, window, now, weight]
+        )
+        REDIS_SECONDS.inc("ratelimit_hit", value=time.perf_counter() - started)
+
+        return RateLimitResult(
+            bool(allowed), limit, float(count), int(ttl), int(start)
+        )
+
+    def refund(self, key: str, window: int, weight: float, now: float):
+        started = time.perf_counter()
+        self._refund(keys=[key], args=[weight, now, window])
+        REDIS_SECONDS.inc(
+            "ratelimit_refund", value=time.perf_counter() - started
+        )
+
+
+class MemoryStorage:
+    """In-process rate limit storage
+
+    It is a stand-in for Redis when the cache is not shared between
+    processes, e.g. with `SimpleCache`, so the limits are per process.
+    """
+
+    def __init__(self, strategy: str):
+        self.strategy = strategy
+        self._lock = threading.Lock()
+        self._windows: dict[str, tuple[int, float]] = {}
+
+    def hit(
+        self, key: str, limit: int, window: int, weight: float, now: float
+    ) -> RateLimitResult:
+        with self._lock:
+            if self.strategy == "sliding":
+                return self._hit_sliding(key, limit, window, weight, now)
+
+            return self._hit_fixed(key, limit, window, weight, now)
+
+    def refund(self, key: str, window: int, weight: float, now: float):
+        with self._lock:
+            if self.strategy == "sliding":
+                key = f"{key}:{math.floor(now / window)}"
+
+            if key in self._windows:
+                start, count = self._windows[key]
+                self._windows[key] = (start, count - weight)
+
+    def _hit_fixed(self, key, limit, window, weight, now) -> RateLimitResult:
+        start, count = self._windows.get(key, (None, 0.0))
+
+        if start is None or now >= start + window:
+            start, count = math.floor(now), 0.0
+
+        allowed = count + weight <= limit
+
+        if allowed:
+            count += weight
+
+        self._windows[key] = (start, count)
+
+        ttl = math.ceil(start + window - now)
+        return RateLimitResult(allowed, limit, count, ttl, start)
+
+    def _hit_sliding(self, key, limit, window, weight, now) -> RateLimitResult:
+        index = math.floor(now / window)
+        current_key = f"{key}:{index}"
+
+        _, current = self._windows.get(current_key, (0, 0.0))
+        _, previous = self._windows.get(f"{key}:{index - 1}", (0, 0.0))
+
+        # Windows older than the previous one are no longer needed
+        self._windows.pop(f"{key}:{index - 2}", None)
+
+        elapsed = now - index * window
+        count = previous * (window - elapsed) / window + current
+        allowed = count + weight <= limit
+
+        if allowed:
+            self._windows[current_key] = (index * window, current + weight)
+            count += weight
+
+        ttl = math.ceil(window - elapsed)
+        return RateLimitResult(allowed, limit, count, ttl, index * window)
+
+
+class RateLimiter:
+    """Flask extension to rate limit API tokens
+
+    The storage is picked based on the Flask-Caching backend of the app: if it
+    has a Redis client, the limits are shared by all workers through Redis.
+    Otherwise, an in-process storage is used.
+
+    Configuration variables:
+
+    - `RATELIMIT_LIMIT`: maximum weight consumed per window (default: 50)
+    - `RATELIMIT_WINDOW`: window length in seconds (default: 3600)
+    - `RATELIMIT_STRATEGY`: `fixed` or `sliding` (default: `fixed`)
+
+    A request weighs 1 unless its view function is decorated with
+    `weighted()`.
+    """
+
+    key_prefix = "ratelimit:"
+
+    def __init__(self, app: Optional[Flask] = None, cache=None):
+        if app is not None:
+            self.init_app(app, cache)
+
+    def init_app(self, app: Flask, cache) -> None:
+        app.config.setdefault("RATELIMIT_LIMIT", 50)
+        app.config.setdefault("RATELIMIT_WINDOW", 60 * 60)
+        app.config.setdefault("RATELIMIT_STRATEGY", "fixed")
+
+        strategy = app.config["RATELIMIT_STRATEGY"]
+        backend = app.extensions["cache"][cache]
+        client = getattr(backend, "_write_client", None)
+
+        if client is not None:
+            storage = RedisStorage(client, strategy)
+        else:
+            storage = MemoryStorage(strategy)
+
+        app.extensions["cursus_ratelimit"] = storage
+
+    @staticmethod
+    def weighted(weight: Union[float, Callable[[Request], float]]):
+        """Set the weight of the requests to a view function
+
+        :param weight: Constant weight, or a function computing the weight of
+            a request
+        """
+
+        def decorator(view):
+            view.rate_limit_weight = weight
+            return view
+
+        return decorator
+
+    @staticmethod
+    def weight_of(view, request: Request) -> float:
+        """Get the weight of a request to a view function"""
+
+        weight = getattr(view, "rate_limit_weight", 1)
+
+        return weight(request) if callable(weight) else weight
+
+    @staticmethod
+    def _config():
+        return (
+            current_app.extensions["cursus_ratelimit"],
+            int(current_app.config["RATELIMIT_LIMIT"]),
+            int(current_app.config["RATELIMIT_WINDOW"]),
+        )
+
+    def hit(self, token: str, weight: float = 1) -> RateLimitResult:
+        """Consume `weight` from the rate limit of a token
+
+        The weight is only consumed if it fits in the remaining limit.
+        """
+
+        storage, limit, window = self._config()
+
+        return storage.hit(
+            f"{self.key_prefix}{token}", limit, window, weight, time.time()
+        )
+
+    def refund(self, token: str, weight: float = 1) -> None:
+        """Give back a weight consumed by a request that was not served"""
+
+        storage, _, window = self._config()
+
+        storage.refund(
+            f"{self.key_prefix}{token}", window, weight, time.time()
+        )
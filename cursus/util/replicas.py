@@ -0,0 +1,301 @@
+# -*- coding: utf-8 -*-
+
+"""
+Read-replica routing of the API requests
+
+The API endpoints only read, so the statements of a request whose path starts
+with `REPLICA_ROUTE_PREFIX` are sent to one of the replicas listed in
+`DATABASE_REPLICA_URLS`. Every other request, e.g. the web views that
+generate or revoke tokens and update profiles, and every flush stay on the
+primary.
+
+A request reads from a single replica, picked round-robin among the healthy
+ones. A replica is checked out once when it is picked: if it can't be
+reached, or if one of its statements fails with a disconnect, it is skipped
+for `REPLICA_RETRY_INTERVAL` seconds. Without any healthy replica, requests
+read from the primary.
+
+Replicas lag behind the primary. After a commit that changes the data of a
+user, the API requests of that user read from the primary for
+`REPLICA_STICKY_WINDOW` seconds, if it is set. API tokens that are not found
+on a replica are also looked up on the primary, as they may have just been
+generated.
+"""
+
+import time
+import itertools
+import contextlib
+
+from typing import Iterator, Optional
+
+import flask
+import sqlalchemy as sa
+
+from flask import Flask
+from flask_login import UserMixin
+from flask_sqlalchemy.session import Session
+
+from .metrics import registry
+
+__all__ = [
+    "ReplicaRouter",
+    "RoutingSession",
+]
+
+
+# Prefix of the bind keys of the replicas
+REPLICA_BIND_PREFIX = "replica_"
+
+# Methods of the requests that may read from a replica
+READ_METHODS = ("GET", "HEAD", "OPTIONS")
+
+READ_ROUTES = registry.counter(
+    "cursus_db_read_routes_total",
+    "Requests by the database they read from: a replica or the primary",
+    ("target",),
+)
+REPLICA_FAILURES = registry.counter(
+    "cursus_db_replica_failures_total",
+    "Replicas marked as unhealthy after a connection failure",
+    ("replica",),
+)
+
+
+class _State:
+    def __init__(self, keys: list[str]):
+        self.keys = keys
+        self.counter = itertools.count()
+        self.unhealthy: dict[str, float] = {}
+
+
+class RoutingSession(Session):
+    """Session sending the reads of the API requests to the replicas"""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        engine = super().get_bind(
+            mapper=mapper, clause=clause, bind=bind, **kwargs
+        )
+
+        # Flushes write, so they always go to the primary
+        if bind is not None or self._flushing:
+            return engine
+
+        if engine is not self._db.engines.get(None):
+            return engine
+
+        return ReplicaRouter.read_engine() or engine
+
+
+def _after_flush(session, flush_context) -> None:
+    users = session.info.setdefault("written_users", set())
+
+    for instance in itertools.chain(
+        session.new, session.dirty, session.deleted
+    ):
+        if isinstance(instance, UserMixin):
+            users.add(str(instance.get_id()))
+        elif getattr(instance, "user_id", None) is not None:
+            users.add(str(instance.user_id))
+
+
+def _after_commit(session) -> None:
+    users = session.info.pop("written_users", None)
+
+    if users:
+        ReplicaRouter.stick(users)
+
+
+def _after_rollback(session) -> None:
+    session.info.pop("written_users", None)
+
+
+def _handle_error(context) -> None:
+    if not context.is_disconnect or not flask.has_app_context():
+        return
+
+    state: Optional[_State] = flask.current_app.extensions.get(
+        "cursus_replicas"
+    )
+
+    if state is None:
+        return
+
+    from .extensions import db
+
+    for key in state.keys:
+        if db.engines[key] is context.engine:
+            ReplicaRouter.mark_unhealthy(state, key)
+
+
+class ReplicaRouter:
+    """Flask extension routing the reads of the API requests to replicas
+
+    Configuration variables:
+
+    - `DATABASE_REPLICA_URLS`: comma-separated URLs of the replicas
+      (default: none)
+    - `REPLICA_ROUTE_PREFIX`: path prefix of the requests that read from the
+      replicas (default: `/api/v1/`)
+    - `REPLICA_RETRY_INTERVAL`: seconds an unreachable replica is skipped
+      (default: 30)
+    - `REPLICA_STICKY_WINDOW`: seconds the API requests of a user read from
+      the primary after a write of the user, 0 to disable (default: 0)
+
+    It must be initialized before `DatabasePool` and Flask-SQLAlchemy, as it
+    adds a bind per replica.
+    """
+
+    def __init__(self, app: Optional[Flask] = None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app: Flask) -> None:
+        app.config.setdefault("DATABASE_REPLICA_URLS", None)
+        app.config.setdefault("REPLICA_ROUTE_PREFIX", "/api/v1/")
+        app.config.setdefault("REPLICA_RETRY_INTERVAL", 30)
+        app.config.setdefault("REPLICA_STICKY_WINDOW", 0)
+
+        urls = [
+            url.strip()
+            for url in (app.config["DATABASE_REPLICA_URLS"] or "").split(",")
+            if url.strip()
+        ]
+        binds = dict(app.config.get("SQLALCHEMY_BINDS") or {})
+
+        for i, url in enumerate(urls):
+            binds[f"{REPLICA_BIND_PREFIX}{i}"] = url
+
+        app.config["SQLALCHEMY_BINDS"] = binds
+        app.extensions["cursus_replicas"] = _State(
+            [f"{REPLICA_BIND_PREFIX}{i}" for i in range(len(urls))]
+        )
+
+        for target, name, listener in (
+            (RoutingSession, "after_flush", _after_flush),
+            (RoutingSession, "after_commit", _after_commit),
+            (RoutingSession, "after_rollback", _after_rollback),
+            (sa.engine.Engine, "handle_error", _handle_error),
+        ):
+            if not sa.event.contains(target, name, listener):
+                sa.event.listen(target, name, listener)
+
+    @staticmethod
+    def _routed() -> bool:
+        if not flask.has_request_context():
+            return False
+
+        req = flask.request
+        prefix = flask.current_app.config["REPLICA_ROUTE_PREFIX"]
+
+        return req.method in READ_METHODS and req.path.startswith(prefix)
+
+    @staticmethod
+    def mark_unhealthy(state: _State, key: str) -> None:
+        interval = float(flask.current_app.config["REPLICA_RETRY_INTERVAL"])
+        state.unhealthy[key] = time.monotonic() + interval
+        REPLICA_FAILURES.inc(key)
+
+    @classmethod
+    def _pick(cls, state: _State) -> Optional[sa.engine.Engine]:
+        from .extensions import db
+
+        now = time.monotonic()
+        start = next(state.counter)
+
+        for i in range(len(state.keys)):
+            key = state.keys[(start + i) % len(state.keys)]
+
+            if state.unhealthy.get(key, 0) > now:
+                continue
+
+            engine = db.engines[key]
+
+            # A checkout opens a connection if the pool has none, so an
+            # unreachable replica fails here rather than in the request
+            try:
+                with engine.connect():
+                    pass
+            except sa.exc.DBAPIError:
+                cls.mark_unhealthy(state, key)
+                continue
+
+            READ_ROUTES.inc(key)
+
+            return engine
+
+        READ_ROUTES.inc("primary")
+
+        return None
+
+    @classmethod
+    def read_engine(cls) -> Optional[sa.engine.Engine]:
+        """Get the replica engine the current request reads from, if any"""
+
+        state: Optional[_State] = flask.current_app.extensions.get(
+            "cursus_replicas"
+        )
+
+        if not state or not state.keys or not cls._routed():
+            return None
+
+        g = flask.g
+
+        if g.get("replica_primary"):
+            return None
+
+        if "replica_engine" not in g:
+            g.replica_engine = cls._pick(state)
+
+        return g.replica_engine
+
+    @classmethod
+    def reading_from_replica(cls) -> bool:
+        return cls.read_engine() is not None
+
+    @staticmethod
+    @contextlib.contextmanager
+    def primary() -> Iterator[None]:
+        """Read from the primary within a block of the current request"""
+
+        g = flask.g
+        previous = g.get("replica_primary", False)
+        g.replica_primary = True
+
+        try:
+            yield
+        finally:
+            g.replica_primary = previous
+
+    @staticmethod
+    def _sticky_key(user_id) -> str:
+        return f"replica-sticky:{user_id}"
+
+    @classmethod
+    def stick(cls, users) -> None:
+        """Send the reads of users to the primary for the sticky window"""
+
+        if not flask.has_app_context():
+            return
+
+        window = int(flask.current_app.config["REPLICA_STICKY_WINDOW"])
+
+        if window <= 0:
+            return
+
+        from .extensions import cache
+
+        cache.set_many(
+            {cls._sticky_key(user): True for user in users}, timeout=window
+        )
+
+    @classmethod
+    def follow(cls, user_id) -> None:
+        """Read from the primary if the user of the request wrote recently"""
+
+        if int(flask.current_app.config["REPLICA_STICKY_WINDOW"]) <= 0:
+            return
+
+        from .extensions import cache
+
+        if cache.get(cls._sticky_key(user_id)):
+            flask.g.replica_primary = True
@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+
+"""
+Response cache for the read-only API resources
+
+The university, school, department and course endpoints only read data that
+changes rarely. Their serialized responses are stored in the Flask-Caching
+backend, keyed by path and normalized query arguments, together with a strong
+ETag computed from the body.
+
+A cached response is answered straight from `before_request`: the endpoint
+handler, the database and the serializer are skipped, and a request whose
+`If-None-Match` header matches the ETag gets an empty 304 response. The API
+token is still validated and the rate limit still consumed before the cache
+is looked up.
+
+Responses are sent with `Cache-Control: no-cache`, so clients keep the body
+but revalidate it with its ETag, and every request goes through the rate
+limiter.
+"""
+
+import hashlib
+
+from typing import Optional
+from urllib.parse import urlencode
+
+import flask
+
+from flask import Flask, current_app
+
+__all__ = [
+    "CachedResponse",
+    "ResponseCache",
+]
+
+
+class CachedResponse:
+    """Serialized body of a response and its ETag"""
+
+    etag: str
+    mimetype: str
+    body: bytes
+
+    def __init__(self, etag: str, mimetype: str, body: bytes):
+        self.etag = etag
+        self.mimetype = mimetype
+        self.body = body
+
+    def __repr__(self) -> str:
+        return f'<CachedResponse "{self.etag}">'
+
+    @classmethod
+    def from_response(cls, response: flask.Response) -> "CachedResponse":
+        body = response.get_data()
+        etag = hashlib.blake2b(body, digest_size=16).hexdigest()
+
+        return cls(etag, response.mimetype, body)
+
+    def to_response(self, request: flask.Request) -> flask.Response:
+        """Build a 200 response, or a 304 response if the ETag matches"""
+
+        if request.if_none_match.contains(self.etag):
+            response = flask.Response(status=304)
+        else:
+            response = flask.Response(self.body, mimetype=self.mimetype)
+
+        response.set_etag(self.etag)
+        response.headers["Cache-Control"] = "no-cache"
+
+        return response
+
+
+class ResponseCache:
+    """Flask extension caching the responses of read-only API resources
+
+    Configuration variables:
+
+    - `RESPONSE_CACHE`: enable the response cache (default: `True`)
+    - `RESPONSE_CACHE_TTL`: seconds a response is cached (default: 300)
+    - `RESPONSE_CACHE_TTLS`: per-resource TTLs overriding the default one,
+      keyed by `university`, `school`, `department` or `course`
+    """
+
+    key_prefix = "response:"
+
+    # Blueprints of the resources whose responses are cached
+    resources = ("university", "school", "department", "course")
+
+    def __init__(self, app: Optional[Flask] = None, cache=None):
+        if app is not None:
+            self.init_app(app, cache)
+
+    def init_app(self, app: Flask, cache) -> None:
+        app.config.setdefault("RESPONSE_CACHE", True)
+        app.config.setdefault("RESPONSE_CACHE_TTL", 5 * 60)
+        app.config.setdefault("RESPONSE_CACHE_TTLS", {})
+
+        app.extensions["cursus_response_cache"] = app.extensions["cache"][
+            cache
+        ]
+
+    @staticmethod
+    def _resource(request: flask.Request) -> Optional[str]:
+        # Nested blueprints are named after their parents, e.g. `api.school`
+        resource = (request.blueprint or "").rpartition(".")[2]
+
+        return resource if resource in ResponseCache.resources else None
+
+    def key(self, request: flask.Request) -> str:
+        """Build the cache key of a request from its path and arguments"""
+
+        args = sorted(request.args.items(multi=True))
+
+        return f"{self.key_prefix}{request.path}?{urlencode(args)}"
+
+    def cacheable(self, request: flask.Request) -> bool:
+        return (
+            bool(current_app.config["RESPONSE_CACHE"])
+            and request.method == "GET"
+            and self._resource(request) is not None
+        )
+
+    def get(self, request: flask.Request) -> Optional[CachedResponse]:
+        """Get the cached response of a request, if any"""
+
+        backend = current_app.extensions["cursus_response_cache"]
+
+        return backend.get(self.key(request))
+
+    def set(
+        self, request: flask.Request, response: flask.Response
+    ) -> CachedResponse:
+        """Cache the body of a response to a request"""
+
+        resource = self._resource(request)
+        ttl = current_app.config["RESPONSE_CACHE_TTLS"].get(
+            resource, current_app.config["RESPONSE_CACHE_TTL"]
+        )
+
+        cached = CachedResponse.from_response(response)
+        backend = current_app.extensions["cursus_response_cache"]
+        backend.set(self.key(request), cached, timeout=int(ttl))
+
+        return cached
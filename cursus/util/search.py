@@ -0,0 +1,251 @@
+# -*- coding: utf-8 -*-
+
+"""
+Search backends used by the search API endpoints
+
+Every search endpoint matches a user-provided query string as a substring of a
+name column, e.g. `University.full_name` or `Course.title`. A plain
+`ILIKE '%query%'` can't use the B-tree indexes declared on those columns, so
+each search would end up as a sequential scan.
+
+On PostgreSQL, the `pg_trgm` extension provides GIN operator classes that can
+serve `LIKE`/`ILIKE` substring patterns directly, as long as the pattern has at
+least one trigram, i.e. three characters that are not wildcards. The backends
+below build the substring predicates in a way those indexes can use, while the
+SQLite fallback keeps the same semantics for tests.
+
+Course descriptions are searched by keywords instead, with a full-text search
+over a weighted document of several columns. On PostgreSQL, the document is a
+generated `tsvector` column served by a GIN index and ranked with `ts_rank`.
+The SQLite fallback matches every keyword with `LIKE` and ranks rows by the
+weights of the columns the keywords appear in.
+"""
+
+import abc
+import flask
+import sqlalchemy as sa
+
+from typing import Optional, Sequence
+
+from sqlalchemy.ext.compiler import compiles
+
+from .extensions import db
+from .exceptions import BadRequestError
+
+__all__ = [
+    "TextSearchDocument",
+    "SearchBackend",
+    "TrigramSearchBackend",
+    "LikeSearchBackend",
+    "get_search_backend",
+]
+
+
+# Minimum number of characters required for a search query. Trigram indexes
+# can't serve patterns shorter than three characters.
+MIN_QUERY_LENGTH = 3
+
+# Text search configuration of the full-text documents and queries
+TEXT_SEARCH_CONFIG = "english"
+
+# Weights of the `tsvector` labels, the defaults of `ts_rank()`
+TEXT_SEARCH_WEIGHTS = {"A": 1.0, "B": 0.4, "C": 0.2, "D": 0.1}
+
+# Options of `ts_headline()` for highlight snippets
+HEADLINE_OPTIONS = "StartSel=<b>, StopSel=</b>, MaxFragments=2, MaxWords=20"
+
+
+class TextSearchDocument(sa.sql.expression.ColumnElement):
+    """Weighted full-text document over columns of a table
+
+    It is only meant as the expression of a generated column. On PostgreSQL,
+    it compiles to a `tsvector` with a weight label per column; elsewhere, to
+    the concatenated text of the columns.
+
+    :param weighted: Pairs of a column name and its weight label (`A` to `D`)
+    """
+
+    inherit_cache = True
+
+    type = sa.types.NullType()
+
+    def __init__(self, *weighted: tuple[str, str]):
+        self.weighted = weighted
+
+
+@compiles(TextSearchDocument)
+def _compile_text_search_document(element, compiler, **kw):
+    return " || ' ' || ".join(
+        f"coalesce({name}, '')" for name, _ in element.weighted
+    )
+
+
+@compiles(TextSearchDocument, "postgresql")
+def _compile_text_search_document_postgresql(element, compiler, **kw):
+    return " || ".join(
+        f"setweight(to_tsvector('{TEXT_SEARCH_CONFIG}', "
+        f"coalesce({name}, '')), '{weight}')"
+        for name, weight in element.weighted
+    )
+
+
+class SearchBackend(abc.ABC):
+    """Base search backend with substring semantics"""
+
+    name: str = "base"
+
+    # Escape character for wildcards that are part of the user query
+    escape: str = "\\"
+
+    def validate(self, query: Optional[str]) -> str:
+        """Validate a user query string and return it stripped
+
+        :param query: Raw query string from the request arguments
+        :raises BadRequestError: if the query is empty or too short
+        """
+
+        if not query:
+            raise BadRequestError(
+                "Query string cannot be empty while using this endpoint"
+            )
+
+        if len(query) < MIN_QUERY_LENGTH:
+            raise BadRequestError(
+                "Query string must be at least 3 characters long"
+            )
+
+        return query
+
+    def pattern(self, query: str) -> str:
+        """Build a substring pattern from a query string
+
+        `%` and `_` inside the query are escaped so they match literally,
+        which also guarantees the pattern always contains the trigrams of the
+        query itself.
+        """
+
+        escaped = (
+            query.replace(self.escape, self.escape * 2)
+            .replace("%", f"{self.escape}%")
+            .replace("_", f"{self.escape}_")
+        )
+
+        return f"%{escaped}%"
+
+    @abc.abstractmethod
+    def contains(self, column, query: str) -> sa.ColumnElement[bool]:
+        """Return a predicate matching `query` anywhere in `column`"""
+
+    @abc.abstractmethod
+    def fulltext(
+        self, column, document: TextSearchDocument, query: str
+    ) -> tuple[sa.ColumnElement[bool], sa.ColumnElement[float]]:
+        """Return a predicate matching the keywords of `query` in a document
+        and the rank of the matching rows
+
+        :param column: Generated column of the document
+        :param document: Expression of the generated column
+        """
+
+    @abc.abstractmethod
+    def headline(self, column, query: str) -> sa.ColumnElement[str]:
+        """Return a snippet of `column` highlighting the keywords of `query`"""
+
+
+class TrigramSearchBackend(SearchBackend):
+    """PostgreSQL search backend served by `gin_trgm_ops` indexes
+
+    The GIN trigram indexes are created by the migration `5d3c9e1a7b42`.
+    PostgreSQL picks them up for `ILIKE` predicates on the indexed column as
+    long as the column is compared directly (no `LOWER()` wrapper).
+    """
+
+    name = "trigram"
+
+    def contains(self, column, query: str) -> sa.ColumnElement[bool]:
+        return column.ilike(self.pattern(query), escape=self.escape)
+
+    @staticmethod
+    def _tsquery(query: str):
+        # `websearch_to_tsquery()` never fails on user input, and supports
+        # quoted phrases, `or` and `-` exclusions
+        return sa.func.websearch_to_tsquery(TEXT_SEARCH_CONFIG, query)
+
+    def fulltext(self, column, document, query):
+        tsquery = self._tsquery(query)
+
+        # `ts_rank()` returns a `real`, which PostgreSQL compares with the
+        # float of a cursor in double precision, so keyset pages would never
+        # match the rank of their last row
+        rank = sa.cast(sa.func.ts_rank(column, tsquery), sa.Double)
+
+        return column.bool_op("@@")(tsquery), rank
+
+    def headline(self, column, query: str) -> sa.ColumnElement[str]:
+        return sa.func.ts_headline(
+            TEXT_SEARCH_CONFIG,
+            sa.func.coalesce(column, ""),
+            self._tsquery(query),
+            HEADLINE_OPTIONS,
+            type_=sa.String,
+        )
+
+
+class LikeSearchBackend(SearchBackend):
+    """Fallback search backend for databases without `pg_trgm`, e.g. SQLite"""
+
+    name = "like"
+
+    def contains(self, column, query: str) -> sa.ColumnElement[bool]:
+        return sa.func.lower(column).like(
+            sa.func.lower(self.pattern(query)), escape=self.escape
+        )
+
+    def fulltext(self, column, document, query):
+        keywords = query.split()
+        weights = [
+            (column.table.c[name], TEXT_SEARCH_WEIGHTS[label])
+            for name, label in document.weighted
+        ]
+
+        rank = sum(
+            (
+                sa.case((self.contains(source, keyword), weight), else_=0.0)
+                for keyword in keywords
+                for source, weight in weights
+            ),
+            sa.literal(0.0),
+        )
+
+        return (
+            sa.and_(*[self.contains(column, keyword) for keyword in keywords]),
+            rank,
+        )
+
+    def headline(self, column, query: str) -> sa.ColumnElement[str]:
+        # Without a text search parser, the whole text is returned
+        return sa.func.coalesce(column, "")
+
+
+_BACKENDS = {
+    TrigramSearchBackend.name: TrigramSearchBackend(),
+    LikeSearchBackend.name: LikeSearchBackend(),
+}
+
+
+def get_search_backend() -> SearchBackend:
+    """Get the search backend for the current application
+
+    The backend can be forced with the `SEARCH_BACKEND` configuration variable.
+    Otherwise, it is chosen based on the database dialect.
+    """
+
+    name = flask.current_app.config.get("SEARCH_BACKEND")
+
+    if name in _BACKENDS:
+        return _BACKENDS[name]
+
+    if db.engine.dialect.name == "postgresql":
+        return _BACKENDS[TrigramSearchBackend.name]
+
+    return _BACKENDS[LikeSearchBackend.name]
@@ -0,0 +1,237 @@
+# -*- coding: utf-8 -*-
+
+"""
+In-memory snapshot of the university reference data
+
+Universities and their domains, campuses and founders form a small dataset
+that rarely changes, yet every lookup used to cost two or three SQL queries.
+`ReferenceSnapshot` keeps an immutable copy of these tables in each worker,
+indexed by university short name, so the university endpoints are served
+without touching the database.
+
+The snapshot is loaded by the first request of a worker. After that, at most
+once per `REFERENCE_SNAPSHOT_INTERVAL` seconds, a single query reads the
+high-water mark of the tables: the latest `updated_at` and the row count of
+each of them. When the mark changed, or the snapshot is older than
+`REFERENCE_SNAPSHOT_MAX_AGE` seconds, e.g. for edits that did not touch
+`updated_at`, the request that noticed it builds a new snapshot and swaps it
+in with a single assignment, while other threads keep serving the previous
+one.
+"""
+
+import time
+import threading
+import collections
+import sqlalchemy as sa
+
+from types import MappingProxyType
+from typing import Any, Mapping, Optional
+
+from flask import Flask, current_app
+
+__all__ = [
+    "Snapshot",
+    "ReferenceSnapshot",
+]
+
+
+def _models() -> tuple:
+    # The models depend on the extensions module, which imports this one
+    from cursus.models.university import (
+        University,
+        UniversityDomain,
+        UniversityCampus,
+        UniversityFounder,
+    )
+
+    return University, UniversityDomain, UniversityCampus, UniversityFounder
+
+
+def _record_type(model, *extra: str) -> type:
+    """Build an immutable record type with the columns of a model"""
+
+    names = [column.key for column in model.__table__.c]
+
+    return collections.namedtuple(f"{model.__name__}Record", names + [*extra])
+
+
+def _watermark_query():
+    columns = []
+
+    for model in _models():
+        table = model.__table__
+        columns.append(
+            sa.select(sa.func.max(table.c.updated_at)).scalar_subquery()
+        )
+        columns.append(
+            sa.select(sa.func.count()).select_from(table).scalar_subquery()
+        )
+
+    return sa.select(*columns)
+
+
+class Snapshot:
+    """Immutable copy of the university reference tables
+
+    Each mapping is keyed by university short name. The related records are
+    tuples sorted by primary key, which is the order used by the pagination
+    of the endpoints.
+    """
+
+    universities: Mapping[str, Any]
+    domains: Mapping[str, tuple]
+    campuses: Mapping[str, tuple]
+    founders: Mapping[str, tuple]
+    watermark: tuple
+    loaded_at: float
+
+    def __init__(
+        self,
+        universities: dict[str, Any],
+        domains: dict[str, tuple],
+        campuses: dict[str, tuple],
+        founders: dict[str, tuple],
+        watermark: tuple,
+    ):
+        self.universities = MappingProxyType(universities)
+        self.domains = MappingProxyType(domains)
+        self.campuses = MappingProxyType(campuses)
+        self.founders = MappingProxyType(founders)
+        self.watermark = watermark
+        self.loaded_at = time.monotonic()
+
+    def __repr__(self) -> str:
+        return f"<Snapshot ({len(self.universities)} universities)>"
+
+    @staticmethod
+    def watermark_of(session) -> tuple:
+        """Read the high-water mark of the reference tables"""
+
+        return tuple(session.execute(_watermark_query()).one())
+
+    @classmethod
+    def load(cls, session) -> "Snapshot":
+        """Load the reference tables into a new snapshot"""
+
+        University, UniversityDomain, UniversityCampus, UniversityFounder = (
+            _models()
+        )
+
+        watermark = cls.watermark_of(session)
+        related = {}
+
+        for name, model, key in (
+            ("domains", UniversityDomain, UniversityDomain.id),
+            ("campuses", UniversityCampus, UniversityCampus.address_id),
+            ("founders", UniversityFounder, UniversityFounder.id),
+        ):
+            record = _record_type(model)
+            grouped: dict[str, list] = collections.defaultdict(list)
+
+            for row in session.execute(
+                sa.select(*model.__table__.c).order_by(key)
+            ):
+                item = record(*row)
+                grouped[item.school_short_name].append(item)
+
+            related[name] = {
+                short_name: tuple(items)
+                for short_name, items in grouped.items()
+            }
+
+        # `UniversitySchema.get_homepage()` looks up the domains
+        record = _record_type(University, "domains")
+        universities = {
+            row.short_name: record(
+                *row, related["domains"].get(row.short_name, ())
+            )
+            for row in session.execute(sa.select(*University.__table__.c))
+        }
+
+        return cls(universities, watermark=watermark, **related)
+
+
+class _State:
+    def __init__(self, db):
+        self.db = db
+        self.lock = threading.Lock()
+        self.snapshot: Optional[Snapshot] = None
+        self.checked_at = float("-inf")
+
+
+class ReferenceSnapshot:
+    """Flask extension holding the per-worker reference snapshot
+
+    Configuration variables:
+
+    - `REFERENCE_SNAPSHOT`: serve the university endpoints from the snapshot
+      (default: `True`)
+    - `REFERENCE_SNAPSHOT_INTERVAL`: minimum seconds between two checks of
+      the high-water mark (default: 60)
+    - `REFERENCE_SNAPSHOT_MAX_AGE`: seconds after which the snapshot is
+      reloaded even if the high-water mark did not change (default: 3600)
+    """
+
+    def __init__(self, app: Optional[Flask] = None, db=None):
+        if app is not None:
+            self.init_app(app, db)
+
+    def init_app(self, app: Flask, db) -> None:
+        app.config.setdefault("REFERENCE_SNAPSHOT", True)
+        app.config.setdefault("REFERENCE_SNAPSHOT_INTERVAL", 60)
+        app.config.setdefault("REFERENCE_SNAPSHOT_MAX_AGE", 60 * 60)
+
+        app.extensions["cursus_snapshot"] = _State(db)
+
+    @property
+    def enabled(self) -> bool:
+        return bool(current_app.config["REFERENCE_SNAPSHOT"])
+
+    def get(self) -> Snapshot:
+        """Get the current snapshot, refreshing it if the data changed"""
+
+        state: _State = current_app.extensions["cursus_snapshot"]
+        interval = float(current_app.config["REFERENCE_SNAPSHOT_INTERVAL"])
+        now = time.monotonic()
+
+        if state.snapshot is not None and now - state.checked_at < interval:
+            return state.snapshot
+
+        # Only the first load makes other threads wait. Once a snapshot
+        # exists, a single thread checks for changes and the others keep
+        # using the snapshot they have.
+        if not state.lock.acquire(blocking=state.snapshot is None):
+            return state.snapshot
+
+        try:
+            if state.snapshot is None or now - state.checked_at >= interval:
+                self._refresh(state)
+                state.checked_at = time.monotonic()
+        finally:
+            state.lock.release()
+
+        return state.snapshot
+
+    def refresh(self) -> Snapshot:
+        """Reload the snapshot right away"""
+
+        state: _State = current_app.extensions["cursus_snapshot"]
+
+        with state.lock:
+            state.snapshot = Snapshot.load(state.db.session)
+            state.checked_at = time.monotonic()
+
+        return state.snapshot
+
+    def _refresh(self, state: _State) -> None:
+        max_age = float(current_app.config["REFERENCE_SNAPSHOT_MAX_AGE"])
+        snapshot = state.snapshot
+
+        if (
+            snapshot is not None
+            and time.monotonic() - snapshot.loaded_at < max_age
+            and Snapshot.watermark_of(state.db.session) == snapshot.watermark
+        ):
+            return
+
+        state.snapshot = Snapshot.load(state.db.session)
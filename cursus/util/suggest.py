@@ -0,0 +1,291 @@
+# -*- coding: utf-8 -*-
+
+"""
+In-memory prefix index for the typeahead (suggest) endpoint
+
+Typeahead sends a request on every keystroke, which is too often for the
+paginated `ILIKE` queries of the search endpoints. `SuggestIndex` keeps the
+names of the universities, schools, departments and courses of the database
+in sorted arrays of normalized keys in each worker, and answers a prefix with
+two binary searches.
+
+Every word of a name is a key, so `mudd` suggests "Harvey Mudd College".
+Matches on the start of a name come before matches on a later word, and within
+each group, names are in lexicographic order, so shorter names come first.
+University short names and course codes are keys of their names as well.
+
+Like the reference snapshot, the index is built by the first request of a
+worker. After that, at most once per `SUGGEST_INTERVAL` seconds, a single
+query reads the high-water mark of the tables, and the index is rebuilt when
+it changed, while other threads keep serving the previous index.
+"""
+
+import time
+import bisect
+import threading
+import unicodedata
+import collections
+import sqlalchemy as sa
+
+from array import array
+from typing import Iterable, Iterator, Optional
+
+from flask import Flask, current_app
+
+__all__ = [
+    "Suggestion",
+    "PrefixIndex",
+    "SuggestIndex",
+    "normalize",
+]
+
+
+Suggestion = collections.namedtuple("Suggestion", ["type", "id", "name"])
+
+
+def normalize(text: str) -> str:
+    """Normalize a name or a prefix into a lookup key
+
+    Keys are case-folded, without accents, and with single spaces between
+    words.
+    """
+
+    decomposed = unicodedata.normalize("NFKD", text.casefold())
+
+    return " ".join(
+        "".join(c for c in decomposed if not unicodedata.combining(c)).split()
+    )
+
+
+def _models() -> tuple:
+    # The models depend on the extensions module, which imports this one
+    from cursus.models import Course, Department, School, University
+
+    return University, School, Department, Course
+
+
+def _sources() -> list[tuple]:
+    """Type, model, timestamp and key columns of every suggested table"""
+
+    University, School, Department, Course = _models()
+
+    return [
+        (
+            "university",
+            University,
+            University.updated_at,
+            (University.full_name, University.short_name),
+        ),
+        ("school", School, School.modified_at, (School.name,)),
+        ("department", Department, Department.modified_at, (Department.name,)),
+        ("course", Course, Course.modified_at, (Course.title, Course.code)),
+    ]
+
+
+def _watermark_query():
+    columns = []
+
+    for _, model, timestamp, _ in _sources():
+        columns.append(sa.select(sa.func.max(timestamp)).scalar_subquery())
+        columns.append(
+            sa.select(sa.func.count())
+            .select_from(model.__table__)
+            .scalar_subquery()
+        )
+
+    return sa.select(*columns)
+
+
+class PrefixIndex:
+    """Sorted arrays of keys pointing to suggestions
+
+    :param entries: Suggestions with their keys. The first key is the name
+        of the suggestion, the others are alternate names.
+    """
+
+    def __init__(self, entries: Iterable[tuple[Suggestion, Iterable[str]]]):
+        suggestions = []
+        names, words = [], []
+
+        for suggestion, keys in entries:
+            index = len(suggestions)
+            suggestions.append(suggestion)
+
+            for key in keys:
+                key = normalize(key or "")
+
+                if not key:
+                    continue
+
+                names.append((key, index))
+
+                # Every later word of the key starts a key of its own
+                position = key.find(" ")
+
+                while position != -1:
+                    words.append((key[position + 1 :], index))
+                    position = key.find(" ", position + 1)
+
+        self.suggestions = tuple(suggestions)
+        self._names = self._sorted(names)
+        self._words = self._sorted(words)
+
+    def __repr__(self) -> str:
+        return f"<PrefixIndex ({len(self)} suggestions)>"
+
+    def __len__(self) -> int:
+        return len(self.suggestions)
+
+    @staticmethod
+    def _sorted(pairs: list[tuple[str, int]]) -> tuple[list[str], array]:
+        pairs.sort()
+
+        return [key for key, _ in pairs], array("L", (i for _, i in pairs))
+
+    @staticmethod
+    def _scan(keys: tuple[list[str], array], prefix: str) -> Iterator[int]:
+        strings, refs = keys
+        position = bisect.bisect_left(strings, prefix)
+
+        while position < len(strings) and strings[position].startswith(prefix):
+            yield refs[position]
+            position += 1
+
+    def search(
+        self,
+        prefix: str,
+        limit: int = 10,
+        types: Optional[Iterable[str]] = None,
+    ) -> list[Suggestion]:
+        """Find the suggestions with a key starting with `prefix`
+
+        :param prefix: Prefix typed by the user
+        :param limit: Maximum number of suggestions
+        :param types: Only suggest these types, all of them by default
+        """
+
+        prefix = normalize(prefix)
+        types = set(types) if types else None
+        seen, results = set(), []
+
+        if not prefix:
+            return results
+
+        for keys in (self._names, self._words):
+            for index in self._scan(keys, prefix):
+                if index in seen:
+                    continue
+
+                seen.add(index)
+                suggestion = self.suggestions[index]
+
+                if types is not None and suggestion.type not in types:
+                    continue
+
+                results.append(suggestion)
+
+                if len(results) >= limit:
+                    return results
+
+        return results
+
+    @classmethod
+    def load(cls, session) -> "PrefixIndex":
+        """Build an index from the names in the database"""
+
+        entries = []
+
+        for kind, model, _, columns in _sources():
+            primary_key = model.__table__.c.id
+
+            for row in session.execute(
+                sa.select(primary_key, *columns).order_by(primary_key)
+            ):
+                entries.append((Suggestion(kind, row[0], row[1]), row[1:]))
+
+        return cls(entries)
+
+
+class _State:
+    def __init__(self, db):
+        self.db = db
+        self.lock = threading.Lock()
+        self.index: Optional[PrefixIndex] = None
+        self.watermark: Optional[tuple] = None
+        self.checked_at = float("-inf")
+
+
+class SuggestIndex:
+    """Flask extension holding the per-worker prefix index
+
+    Configuration variables:
+
+    - `SUGGEST_INTERVAL`: minimum seconds between two checks of the
+      high-water mark of the tables (default: 300)
+    - `SUGGEST_LIMIT`: default number of suggestions (default: 10)
+    - `SUGGEST_MAX_LIMIT`: maximum number of suggestions (default: 25)
+    - `SUGGEST_WEIGHT`: rate limit weight of a request to the suggest
+      endpoint (default: 0.1)
+    """
+
+    def __init__(self, app: Optional[Flask] = None, db=None):
+        if app is not None:
+            self.init_app(app, db)
+
+    def init_app(self, app: Flask, db) -> None:
+        app.config.setdefault("SUGGEST_INTERVAL", 5 * 60)
+        app.config.setdefault("SUGGEST_LIMIT", 10)
+        app.config.setdefault("SUGGEST_MAX_LIMIT", 25)
+        app.config.setdefault("SUGGEST_WEIGHT", 0.1)
+
+        app.extensions["cursus_suggest"] = _State(db)
+
+    def get(self) -> PrefixIndex:
+        """Get the current index, rebuilding it if the data changed"""
+
+        state: _State = current_app.extensions["cursus_suggest"]
+        interval = float(current_app.config["SUGGEST_INTERVAL"])
+        now = time.monotonic()
+
+        if state.index is not None and now - state.checked_at < interval:
+            return state.index
+
+        # Only the first build makes other threads wait
+        if not state.lock.acquire(blocking=state.index is None):
+            return state.index
+
+        try:
+            if state.index is None or now - state.checked_at >= interval:
+                watermark = tuple(
+                    state.db.session.execute(_watermark_query()).one()
+                )
+
+                if state.index is None or watermark != state.watermark:
+                    state.index = PrefixIndex.load(state.db.session)
+                    state.watermark = watermark
+
+                state.checked_at = time.monotonic()
+        finally:
+            state.lock.release()
+
+        return state.index
+
+    def refresh(self) -> PrefixIndex:
+        """Rebuild the index right away"""
+
+        state: _State = current_app.extensions["cursus_suggest"]
+
+        with state.lock:
+            state.watermark = tuple(
+                state.db.session.execute(_watermark_query()).one()
+            )
+            state.index = PrefixIndex.load(state.db.session)
+            state.checked_at = time.monotonic()
+
+        return state.index
+
+    @staticmethod
+    def weight(request) -> float:
+        """Rate limit weight of a request to the suggest endpoint"""
+
+        return float(current_app.config["SUGGEST_WEIGHT"])
@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+
+"""
+In-process cache of validated API tokens
+
+Validating an API token costs a round trip to the shared cache and, on a
+miss, a database query. Hot clients send the same token over and over, so each
+worker keeps a small LRU cache of token validity in front of the shared cache.
+
+Entries expire after `TOKEN_CACHE_TTL` seconds. Revoking or regenerating a
+token bumps a version counter in the shared cache. Every worker checks that
+counter at most once per `TOKEN_CACHE_SYNC_INTERVAL` seconds and drops its
+local entries when it changed, so a revoked token stops working everywhere
+within that bounded delay.
+"""
+
+import time
+import threading
+
+from collections import OrderedDict
+from typing import Any, Callable, Optional
+
+from flask import Flask, current_app
+
+__all__ = [
+    "LocalTokenCache",
+    "TokenCache",
+]
+
+
+# Key of the version counter in the shared cache
+VERSION_KEY = "token-cache-version"
+
+# Sentinel for tokens that are not in the local cache
+MISSING = object()
+
+
+class LocalTokenCache:
+    """Bounded, TTL-evicting LRU cache of token validity
+
+    Values are whatever is stored for the token in the shared cache: the id
+    of the user owning the token, or `False` for a revoked token.
+
+    :param size: Maximum number of tokens kept in the cache
+    :param ttl: Seconds an entry stays valid
+    :param sync_interval: Minimum seconds between two version checks
+    :param shared: Flask-Caching backend holding the version counter
+    :param clock: Monotonic clock, overridable for testing
+    """
+
+    def __init__(
+        self,
+        size: int,
+        ttl: float,
+        sync_interval: float,
+        shared=None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.size = size
+        self.ttl = ttl
+        self.sync_interval = sync_interval
+        self.shared = shared
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[str, tuple[Any, float]] = OrderedDict()
+        self._version: Optional[int] = None
+        self._synced_at = float("-inf")
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _sync(self, now: float) -> None:
+        if self.shared is None:
+            return
+
+        # A single thread reads the version per interval, without holding the
+        # lock during the round trip so the other threads keep hitting
+        with self._lock:
+            if now - self._synced_at < self.sync_interval:
+                return
+
+            self._synced_at = now
+
+        version = self.shared.get(VERSION_KEY)
+
+        with self._lock:
+            if version != self._version:
+                self._version = version
+                self._entries.clear()
+
+    def get(self, token: str) -> Any:
+        """Get the cached value of a token or `MISSING`"""
+
+        now = self.clock()
+        self._sync(now)
+
+        with self._lock:
+            entry = self._entries.get(token)
+
+            if entry is None or entry[1] <= now:
+                if entry is not None:
+                    del self._entries[token]
+
+                self.misses += 1
+                return MISSING
+
+            self._entries.move_to_end(token)
+            self.hits += 1
+
+            return entry[0]
+
+    def set(self, token: str, value: Any) -> None:
+        """Cache the value of a token, evicting the least recently used"""
+
+        if self.size <= 0:
+            return
+
+        with self._lock:
+            self._entries[token] = (value, self.clock() + self.ttl)
+            self._entries.move_to_end(token)
+
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, token: str) -> None:
+        """Drop a token locally and signal other workers to drop theirs"""
+
+        with self._lock:
+            self._entries.pop(token, None)
+
+        if self.shared is None:
+            return
+
+        if self.shared.inc(VERSION_KEY) is None:
+            self.shared.set(VERSION_KEY, 1, timeout=0)
+
+
+class TokenCache:
+    """Flask extension holding the per-worker token cache
+
+    Configuration variables:
+
+    - `TOKEN_CACHE_SIZE`: maximum number of cached tokens (default: 1024)
+    - `TOKEN_CACHE_TTL`: seconds a token stays cached (default: 60)
+    - `TOKEN_CACHE_SYNC_INTERVAL`: maximum delay in seconds before a revoked
+      token is dropped by other workers (default: 5)
+    """
+
+    def __init__(self, app: Optional[Flask] = None, cache=None):
+        if app is not None:
+            self.init_app(app, cache)
+
+    def init_app(self, app: Flask, cache) -> None:
+        app.config.setdefault("TOKEN_CACHE_SIZE", 1024)
+        app.config.setdefault("TOKEN_CACHE_TTL", 60)
+        app.config.setdefault("TOKEN_CACHE_SYNC_INTERVAL", 5)
+
+        app.extensions["cursus_token_cache"] = LocalTokenCache(
+            size=int(app.config["TOKEN_CACHE_SIZE"]),
+            ttl=float(app.config["TOKEN_CACHE_TTL"]),
+            sync_interval=float(app.config["TOKEN_CACHE_SYNC_INTERVAL"]),
+            shared=app.extensions["cache"][cache],
+        )
+
+    @property
+    def local(self) -> LocalTokenCache:
+        return current_app.extensions["cursus_token_cache"]
+
+    def get(self, token: str) -> Any:
+        return self.local.get(token)
+
+    def set(self, token: str, value: Any) -> None:
+        self.local.set(token, value)
+
+    def invalidate(self, token: str) -> None:
+        self.local.invalidate(token)
@@ -12,7 +12,7 @@ from flask_login import current_user, login_required
 from sqlalchemy.sql import func
 
 from . import view_bp
-from cursus.util.extensions import db, cache
+from cursus.util.extensions import db, cache, token_cache
 from cursus.models import ActiveToken, History
 from cursus.util import exceptions, datetime as cursus_datetime
 
@@ -182,6 +182,7 @@ def profile_revoke():
         db.session.commit()
 
         cache.set(old_token.token, False, timeout=60 * 60 * 24 * 7)
+        token_cache.invalidate(old_token.token)
 
         revoked_token = cache.get(old_token.token)
 
@@ -309,6 +310,7 @@ You have reached the maximum number of tokens generated per day",
         db.session.commit()
 
         cache.set(old_token.token, False, timeout=60 * 60 * 24 * 7)
+        token_cache.invalidate(old_token.token)
 
     # Commit the token to the database
     db.session.add(token)
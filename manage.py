@@ -2,6 +2,7 @@
 """Flask Management Script"""
 
 import os
+import json
 import click
 import waitress
 
@@ -11,7 +12,10 @@ from dotenv import load_dotenv
 
 from cursus import create_app
 from cursus.util.extensions import db, assets
-
+from cursus.util.data_loader import Changeset, DataLoadError, load_data
+from cursus.util.db_pool import lift_statement_timeout
+from cursus.util.index_advisor import advise
+from cursus.util.prefork import Prefork
 
 # Not being accessed directly. However, it is required for the migrations to
 # know where to find the models.
@@ -41,11 +45,132 @@ def create_db():
     db.session.commit()
 
 
+@cli.command("load-data")
+@click.option(
+    "--data-dir",
+    default="data",
+    type=click.Path(exists=True, file_okay=False),
+    help="Directory of the TSV files",
+)
+@click.option(
+    "--only",
+    multiple=True,
+    help="Only load this table (can be repeated)",
+)
+@click.option(
+    "--batch-size",
+    default=5000,
+    help="Rows per batch sent to the database",
+)
+@click.option(
+    "--sync",
+    is_flag=True,
+    help="Delete the rows that are not in the files anymore",
+)
+@click.option(
+    "--changeset",
+    type=click.File("w"),
+    help="Write the rows changed by a sync to this JSON file",
+)
+@with_appcontext
+def load_data_command(data_dir, only, batch_size, sync, changeset):
+    """Load the TSV seed files into the database."""
+
+    changes = Changeset()
+
+    lift_statement_timeout(db.session.connection())
+    db.session.commit()
+
+    try:
+        reports = load_data(
+            db.session,
+            data_dir,
+            only=only,
+            batch_size=batch_size,
+            sync=sync,
+            changeset=changes,
+        )
+    except DataLoadError as error:
+        raise click.ClickException(str(error)) from None
+
+    click.echo(
+        f"{'table':<24}{'staged':>9}{'inserted':>10}{'updated':>9}"
+        f"{'unchanged':>11}{'skipped':>9}{'deleted':>9}"
+    )
+
+    for report in reports:
+        click.echo(
+            f"{report.table:<24}{report.staged:>9}{report.inserted:>10}"
+            f"{report.updated:>9}{report.unchanged:>11}{report.skipped:>9}"
+            f"{report.deleted:>9}"
+        )
+
+    if changeset is not None:
+        json.dump(changes.to_dict(), changeset, indent=2, default=str)
+
+
+@cli.command("index-advisor")
+@click.option(
+    "--min-rows",
+    default=10000,
+    help="Only flag full scans of tables with at least this many rows",
+)
+@with_appcontext
+def index_advisor(min_rows):
+    """Explain representative API queries and flag full table scans."""
+
+    lift_statement_timeout(db.session.connection())
+    db.session.commit()
+
+    reports = advise(db.session, min_rows=min_rows)
+    flagged = 0
+
+    for report in reports:
+        timing = ""
+
+        if report.execution_time is not None:
+            timing = f" ({report.execution_time:.2f} ms)"
+
+        status = "SCAN" if report.findings else "ok"
+        click.echo(f"[{status:>4}] {report.name}{timing}")
+
+        for finding in report.findings:
+            click.echo(f"       {finding.detail}, {finding.rows} rows")
+
+        flagged += bool(report.findings)
+
+    if flagged:
+        click.echo(f"{flagged} queries scan large tables")
+        raise SystemExit(1)
+
+
 @cli.command("waitress")
 @click.option("--host", default="0.0.0.0", help="Host IP to bind to")
 @click.option("--port", default=8000, help="Port to bind to")
-def run_waitress(host, port):
-    """Run the application using Waitress as the production server."""
+@click.option(
+    "--workers",
+    default=1,
+    type=click.IntRange(min=1),
+    help="Number of preforked worker processes",
+)
+@click.option(
+    "--threads",
+    default=4,
+    type=click.IntRange(min=1),
+    help="Threads per worker",
+)
+@click.option(
+    "--graceful-timeout",
+    default=30.0,
+    help="Seconds a stopping worker is given to complete its requests",
+)
+def run_waitress(host, port, workers, threads, graceful_timeout):
+    """Run the application using Waitress as the production server.
+
+    With more than one worker, a master process forks the workers, which
+    share the listening socket. Send SIGHUP to the master to reload the
+    workers gracefully, and SIGTTIN or SIGTTOU to add or remove one.
+    """
 
     # Load the environment variables from the .env file manually as `waitress`
     # does not include the environment variables loading by default like Flask.
@@ -55,14 +180,36 @@ def run_waitress(host, port):
     assert os.environ.get("DATABASE_URL")
     assert os.environ.get("FLASK_ENV")
 
-    # https://stackoverflow.com/questions/11981187/flask-assets-and-flask-testing-throws-registererror-another-bundle-is-already-r
-    assets._named_bundles = {}  # pylint: disable=protected-access
-
-    app = create_app()
-    app = ProxyFix(app, x_for=1, x_host=1)
+    def load():
+        # https://stackoverflow.com/questions/11981187/flask-assets-and-flask-testing-throws-registererror-another-bundle-is-already-r
+        assets._named_bundles = {}  # pylint: disable=protected-access
+
+        return create_app()
+
+    def wrap(app):
+        return ProxyFix(app, x_for=1, x_host=1)
+
+    if workers > 1:
+        print(
+            f"Running waitress on {host}:{port} with {workers} workers of "
+            f"{threads} threads"
+        )
+
+        Prefork(
+            load,
+            wrap,
+            host=host,
+            port=port,
+            workers=workers,
+            threads=threads,
+            graceful_timeout=graceful_timeout,
+        ).run()
+        return
+
+    app = wrap(load())
     print(f"Running waitress on {host}:{port}")
 
-    waitress.serve(app, host=host, port=port)
+    waitress.serve(app, host=host, port=port, threads=threads)
 
 
 if __name__ == "__main__":
@@ -5,6 +5,8 @@ from flask import current_app
 
 from alembic import context
 
+from cursus.util.db_pool import lift_statement_timeout
+
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
 config = context.config
@@ -100,6 +102,10 @@ def run_migrations_online():
     connectable = get_engine()
 
     with connectable.connect() as connection:
+        # Migrations may run longer than the statement timeout of the requests
+        lift_statement_timeout(connection)
+        connection.commit()
+
         context.configure(
             connection=connection, target_metadata=get_metadata(), **conf_args
         )
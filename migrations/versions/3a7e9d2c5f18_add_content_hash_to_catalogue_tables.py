@@ -0,0 +1,34 @@
+"""add content hash to catalogue tables
+
+Revision ID: 3a7e9d2c5f18
+Revises: 8b1f2c4d6e90
+Create Date: 2026-10-18 13:14:52.662047
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "3a7e9d2c5f18"
+down_revision = "8b1f2c4d6e90"
+branch_labels = None
+depends_on = None
+
+
+# Tables synced by the data loader
+HASHED_TABLES = ("universities", "schools", "departments", "courses")
+
+
+def upgrade():
+    for table_name in HASHED_TABLES:
+        with op.batch_alter_table(table_name, schema=None) as batch_op:
+            batch_op.add_column(
+                sa.Column("content_hash", sa.String(length=32), nullable=True)
+            )
+
+
+def downgrade():
+    for table_name in reversed(HASHED_TABLES):
+        with op.batch_alter_table(table_name, schema=None) as batch_op:
+            batch_op.drop_column("content_hash")
@@ -0,0 +1,46 @@
+"""add trigram indexes for search
+
+Revision ID: 5d3c9e1a7b42
+Revises: e40f6f874274
+Create Date: 2026-10-18 10:45:12.481203
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "5d3c9e1a7b42"
+down_revision = "e40f6f874274"
+branch_labels = None
+depends_on = None
+
+
+# (index name, table name, column name) served by the search endpoints
+TRIGRAM_INDEXES = (
+    ("ix_universities_full_name_trgm", "universities", "full_name"),
+    ("ix_schools_name_trgm", "schools", "name"),
+    ("ix_departments_name_trgm", "departments", "name"),
+    ("ix_courses_title_trgm", "courses", "title"),
+)
+
+
+def upgrade():
+    op.execute(sa.text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+
+    for index_name, table_name, column_name in TRIGRAM_INDEXES:
+        op.create_index(
+            index_name,
+            table_name,
+            [column_name],
+            unique=False,
+            postgresql_using="gin",
+            postgresql_ops={column_name: "gin_trgm_ops"},
+        )
+
+
+def downgrade():
+    for index_name, table_name, _ in reversed(TRIGRAM_INDEXES):
+        op.drop_index(index_name, table_name=table_name)
+
+    # The extension is left installed since other objects might depend on it
@@ -0,0 +1,67 @@
+"""add indexes on foreign key columns
+
+Revision ID: 8b1f2c4d6e90
+Revises: 5d3c9e1a7b42
+Create Date: 2026-10-18 12:02:37.905118
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "8b1f2c4d6e90"
+down_revision = "5d3c9e1a7b42"
+branch_labels = None
+depends_on = None
+
+
+# (index name, table name, column name) of the foreign keys used by joins and
+# filters of the API endpoints
+FOREIGN_KEY_INDEXES = (
+    ("ix_departments_university_id", "departments", "university_id"),
+    ("ix_departments_school_id", "departments", "school_id"),
+    ("ix_courses_university_id", "courses", "university_id"),
+    ("ix_schools_university_id", "schools", "university_id"),
+    (
+        "ix_university_domains_school_short_name",
+        "university_domains",
+        "school_short_name",
+    ),
+    (
+        "ix_university_campuses_school_short_name",
+        "university_campuses",
+        "school_short_name",
+    ),
+    (
+        "ix_university_founders_school_short_name",
+        "university_founders",
+        "school_short_name",
+    ),
+)
+
+
+def upgrade():
+    # On PostgreSQL, the indexes are built concurrently so the tables stay
+    # writable. This can't run inside a transaction.
+    with op.get_context().autocommit_block():
+        for index_name, table_name, column_name in FOREIGN_KEY_INDEXES:
+            op.create_index(
+                index_name,
+                table_name,
+                [column_name],
+                unique=False,
+                if_not_exists=True,
+                postgresql_concurrently=True,
+            )
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for index_name, table_name, _ in reversed(FOREIGN_KEY_INDEXES):
+            op.drop_index(
+                index_name,
+                table_name=table_name,
+                if_exists=True,
+                postgresql_concurrently=True,
+            )
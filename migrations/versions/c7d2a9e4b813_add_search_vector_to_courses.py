@@ -0,0 +1,49 @@
+"""add search vector to courses
+
+Revision ID: c7d2a9e4b813
+Revises: 3a7e9d2c5f18
+Create Date: 2026-10-18 14:02:37.190452
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = "c7d2a9e4b813"
+down_revision = "3a7e9d2c5f18"
+branch_labels = None
+depends_on = None
+
+
+# Weighted document of `cursus.models.course.SEARCH_DOCUMENT`
+SEARCH_VECTOR = (
+    "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(subject, '')), 'B') || "
+    "setweight(to_tsvector('english', coalesce(description, '')), 'C')"
+)
+
+
+def upgrade():
+    op.add_column(
+        "courses",
+        sa.Column(
+            "search_vector",
+            postgresql.TSVECTOR(),
+            sa.Computed(SEARCH_VECTOR, persisted=True),
+            nullable=False,
+        ),
+    )
+    op.create_index(
+        "ix_courses_search_vector",
+        "courses",
+        ["search_vector"],
+        unique=False,
+        postgresql_using="gin",
+    )
+
+
+def downgrade():
+    op.drop_index("ix_courses_search_vector", table_name="courses")
+    op.drop_column("courses", "search_vector")
@@ -0,0 +1,74 @@
+"""add department count to schools
+
+Revision ID: e2b6f8a1c35d
+Revises: c7d2a9e4b813
+Create Date: 2026-10-18 15:21:08.532917
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "e2b6f8a1c35d"
+down_revision = "c7d2a9e4b813"
+branch_labels = None
+depends_on = None
+
+
+DEPARTMENT_COUNT_FUNCTION = """\
+CREATE OR REPLACE FUNCTION schools_department_count() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        UPDATE schools SET department_count = department_count + 1
+        WHERE id = NEW.school_id;
+    END IF;
+
+    IF TG_OP IN ('DELETE', 'UPDATE') THEN
+        UPDATE schools SET department_count = department_count - 1
+        WHERE id = OLD.school_id;
+    END IF;
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql"""
+
+DEPARTMENT_COUNT_TRIGGER = (
+    "CREATE TRIGGER departments_school_count "
+    "AFTER INSERT OR DELETE OR UPDATE OF school_id ON departments "
+    "FOR EACH ROW EXECUTE FUNCTION schools_department_count()"
+)
+
+
+def upgrade():
+    op.add_column(
+        "schools",
+        sa.Column(
+            "department_count",
+            sa.Integer(),
+            server_default="0",
+            nullable=False,
+        ),
+    )
+
+    # The triggers are created in the same transaction as the backfill, so
+    # no department written in between is missed
+    op.execute(sa.text(DEPARTMENT_COUNT_FUNCTION))
+    op.execute(sa.text(DEPARTMENT_COUNT_TRIGGER))
+    op.execute(
+        sa.text(
+            "UPDATE schools SET department_count = ("
+            "SELECT count(*) FROM departments "
+            "WHERE departments.school_id = schools.id)"
+        )
+    )
+
+
+def downgrade():
+    op.execute(
+        sa.text(
+            "DROP TRIGGER IF EXISTS departments_school_count ON departments"
+        )
+    )
+    op.execute(sa.text("DROP FUNCTION IF EXISTS schools_department_count()"))
+    op.drop_column("schools", "department_count")
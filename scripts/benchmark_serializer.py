@@ -0,0 +1,82 @@
+"""Python script that compares the Marshmallow and row serializers
+
+It runs the course search query of the API against the configured database
+and times the serialization of the rows into a JSON body with both paths.
+"""
+
+import sys
+import timeit
+
+import flask
+
+from cursus import create_app
+from cursus.models import Course, Department, University
+from cursus.schema import CourseSchema, get_schema
+from cursus.schema.fast import get_row_serializer
+from cursus.util.extensions import db
+
+FIELDS = (
+    "id",
+    "title",
+    "code",
+    "level",
+    "credits",
+    "active",
+    "department_id",
+    "university_id",
+    "department_name",
+    "university_name",
+    "created_at",
+)
+
+
+def fetch_rows(limit: int):
+    """Fetches rows shaped like the course search results"""
+    return (
+        db.session.query(
+            *Course.__table__.c,
+            Department.name.label("department_name"),
+            University.full_name.label("university_name"),
+        )
+        .select_from(Course)
+        .join(Department, onclause=Department.id == Course.department_id)
+        .join(University, onclause=University.id == Department.university_id)
+        .limit(limit)
+        .all()
+    )
+
+
+def main():
+    """Main function"""
+    limit = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    number = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+
+    app = create_app("cursus.config.Config")
+
+    with app.app_context():
+        rows = fetch_rows(limit)
+        schema = get_schema(CourseSchema, FIELDS)
+        serializer = get_row_serializer(CourseSchema, FIELDS)
+
+        def marshmallow_path():
+            return flask.json.dumps(schema.dump(rows, many=True))
+
+        def fast_path():
+            return flask.json.dumps(serializer.dump(rows))
+
+        if marshmallow_path() != fast_path():
+            print("The serializers produced different output")
+            sys.exit(1)
+
+        print(f"{len(rows)} rows, {number} runs")
+
+        for name, func in (
+            ("marshmallow", marshmallow_path),
+            ("fast", fast_path),
+        ):
+            seconds = timeit.timeit(func, number=number) / number
+            print(f"{name:>12}: {seconds * 1000:.2f} ms per dump")
+
+
+if __name__ == "__main__":
+    main()
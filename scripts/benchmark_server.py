@@ -0,0 +1,167 @@
+"""Python script that measures the throughput of the production server
+
+It starts `manage.py waitress` once per worker count, sends search requests
+from several client processes for a fixed duration, and prints the requests
+per second of each worker count and the speedup over a single worker.
+
+Usage:
+
+    CURSUS_API_TOKEN=<token> python scripts/benchmark_server.py \\
+        --workers 1,2,4 --threads 4 --clients 16 --duration 20
+
+The server gets the environment of the script, so `DATABASE_URL`,
+`FLASK_ENV` and `APP_SETTINGS` must be set. The rate limit is raised for the
+run. The client processes compete with the server for the CPU, so run the
+script from another machine with `--url` for the most accurate numbers, or
+on a machine with more cores than workers plus clients.
+"""
+
+import os
+import sys
+import time
+import socket
+import argparse
+import subprocess
+import http.client
+import multiprocessing
+
+from urllib.parse import urlsplit
+
+PATHS = (
+    "/api/v1/search/course?query=intro",
+    "/api/v1/search/department?query=science",
+    "/api/v1/search/school?query=school",
+    "/api/v1/search/all?query=computer",
+)
+
+
+def wait_for_port(host: str, port: int, timeout: float = 60) -> None:
+    """Waits until the server accepts connections"""
+    deadline = time.monotonic() + timeout
+
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection((host, port), timeout=1):
+                return
+        except OSError:
+            time.sleep(0.2)
+
+    raise TimeoutError(f"Server on {host}:{port} did not start")
+
+
+def client(url: str, token: str, duration: float, results) -> None:
+    """Sends requests over a keep-alive connection until the deadline"""
+    parts = urlsplit(url)
+    connection = http.client.HTTPConnection(parts.hostname, parts.port)
+    headers = {"X-CURSUS-API-TOKEN": token}
+    deadline = time.monotonic() + duration
+    done = errors = 0
+
+    while time.monotonic() < deadline:
+        path = PATHS[(done + errors) % len(PATHS)]
+
+        try:
+            connection.request("GET", path, headers=headers)
+            response = connection.getresponse()
+            response.read()
+        except (OSError, http.client.HTTPException):
+            connection.close()
+            errors += 1
+            continue
+
+        if response.status == 200:
+            done += 1
+        else:
+            errors += 1
+
+    results.put((done, errors))
+
+
+def measure(url: str, token: str, clients: int, duration: float):
+    """Returns the requests per second and the errors of a load run"""
+    results = multiprocessing.Queue()
+    processes = [
+        multiprocessing.Process(
+            target=client, args=(url, token, duration, results)
+        )
+        for _ in range(clients)
+    ]
+
+    for process in processes:
+        process.start()
+
+    totals = [results.get() for _ in processes]
+
+    for process in processes:
+        process.join()
+
+    done = sum(total[0] for total in totals)
+    errors = sum(total[1] for total in totals)
+
+    return done / duration, errors
+
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", default="1,2,4")
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=20)
+    parser.add_argument("--warmup", type=float, default=3)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument(
+        "--url", help="Benchmark a running server instead of starting one"
+    )
+    args = parser.parse_args()
+
+    token = os.environ.get("CURSUS_API_TOKEN")
+
+    if not token:
+        sys.exit("CURSUS_API_TOKEN must be set to a valid API token")
+
+    if args.url:
+        rate, errors = measure(args.url, token, args.clients, args.duration)
+        print(f"{rate:.1f} req/s, {errors} errors")
+        return
+
+    env = dict(os.environ, RATELIMIT_LIMIT=str(10**9))
+    url = f"http://127.0.0.1:{args.port}"
+    baseline = None
+
+    print(f"{'workers':>8} {'threads':>8} {'req/s':>10} {'speedup':>8}")
+
+    for workers in [int(value) for value in args.workers.split(",")]:
+        server = subprocess.Popen(
+            [
+                sys.executable,
+                "manage.py",
+                "waitress",
+                "--host=127.0.0.1",
+                f"--port={args.port}",
+                f"--workers={workers}",
+                f"--threads={args.threads}",
+            ],
+            env=env,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+
+        try:
+            wait_for_port("127.0.0.1", args.port)
+            measure(url, token, args.clients, args.warmup)
+            rate, errors = measure(url, token, args.clients, args.duration)
+        finally:
+            server.terminate()
+            server.wait()
+
+        baseline = baseline or rate
+        print(
+            f"{workers:>8} {args.threads:>8} {rate:>10.1f} "
+            f"{rate / baseline:>7.2f}x"
+            + (f" ({errors} errors)" if errors else "")
+        )
+
+
+if __name__ == "__main__":
+    main()
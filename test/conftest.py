@@ -88,6 +88,20 @@ def admin(app):
         yield user_for_login
 
 
+@pytest.fixture
+def api_headers(app, admin):
+    """Return the headers of an API request made by the admin user"""
+    from flask_login import login_user, logout_user
+
+    with app.test_request_context():
+        login_user(admin)
+        user = app.login_manager._user_callback(admin.id)
+
+        yield {"X-CURSUS-API-TOKEN": user.active_token}
+
+        logout_user()
+
+
 @pytest.hookimpl
 def pytest_configure(config):
     config.addinivalue_line("markers", "config: mark test as config test")
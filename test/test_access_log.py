@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+
+"""
+Test module for the queue-based access log
+"""
+
+import json
+import queue
+import logging
+
+from cursus.util.access_log import (
+    _DroppingQueueHandler,
+    _State,
+    token_fingerprint,
+)
+
+
+def _queue_state(app, monkeypatch, **config) -> _State:
+    monkeypatch.setitem(app.config, "ACCESS_LOG_MODE", "queue")
+
+    for key, value in config.items():
+        monkeypatch.setitem(app.config, key, value)
+
+    state = _State(app)
+    monkeypatch.setitem(app.extensions, "cursus_access_log", state)
+
+    return state
+
+
+def test_access_log_json_lines(
+    app, client, api_headers, monkeypatch, tmp_path
+):
+    path = tmp_path / "access.log"
+    state = _queue_state(app, monkeypatch, ACCESS_LOG_FILE=str(path))
+
+    client.get("/api/v1/search/school?query=school", headers=api_headers)
+    client.get("/api/v1/search/school", headers=api_headers)
+
+    state.stop()
+
+    lines = [json.loads(line) for line in path.read_text().splitlines()]
+
+    assert [line["status"] for line in lines] == [200, 400]
+    assert lines[0]["endpoint"] == "api.search.school"
+    assert lines[0]["query"] == "query=school"
+    assert lines[0]["duration_ms"] >= 0
+    assert lines[0]["token"] == token_fingerprint(
+        api_headers["X-CURSUS-API-TOKEN"]
+    )
+    assert "sample_rate" not in lines[0]
+
+
+def test_access_log_sampling(app, client, api_headers, monkeypatch, tmp_path):
+    path = tmp_path / "access.log"
+    state = _queue_state(
+        app,
+        monkeypatch,
+        ACCESS_LOG_FILE=str(path),
+        ACCESS_LOG_SAMPLE_RATE=0.0,
+        ACCESS_LOG_SAMPLED_ENDPOINTS="api.search.*",
+    )
+
+    # 200s of sampled endpoints are skipped, errors are always logged
+    client.get("/api/v1/search/school?query=school", headers=api_headers)
+    client.get("/api/v1/search/school", headers=api_headers)
+    client.get("/api/v1/university/harvard", headers=api_headers)
+
+    state.stop()
+
+    lines = [json.loads(line) for line in path.read_text().splitlines()]
+
+    assert [(line["endpoint"], line["status"]) for line in lines] == [
+        ("api.search.school", 400),
+        ("api.university.university_short_name", 200),
+    ]
+
+
+def test_access_log_drops_under_backpressure(app, monkeypatch):
+    state = _queue_state(app, monkeypatch, ACCESS_LOG_QUEUE_SIZE=1)
+    handler = _DroppingQueueHandler(queue.Queue(1), state)
+
+    for _ in range(3):
+        handler.handle(logging.makeLogRecord({"msg": {"status": 200}}))
+
+    assert handler.queue.qsize() == 1
+    assert state.dropped == 2
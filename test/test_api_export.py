@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+
+"""
+Test module for the Cursus export endpoints
+"""
+
+import csv
+import gzip
+import io
+import json
+
+
+def test_export_courses_ndjson(client, app, api_headers, monkeypatch):
+    from cursus.models import Course
+
+    monkeypatch.setitem(app.config, "EXPORT_BATCH_SIZE", 7)
+    course = Course.query.first()
+
+    res = client.get(
+        f"/api/v1/export/courses?university={course.university_id}",
+        headers=api_headers,
+    )
+
+    assert res.status_code == 200
+    assert res.is_streamed
+    assert res.mimetype == "application/x-ndjson"
+
+    items = [json.loads(line) for line in res.data.decode().splitlines()]
+
+    assert [item["id"] for item in items] == sorted(
+        course.id
+        for course in Course.query.filter_by(
+            university_id=course.university_id
+        )
+    )
+    assert items[0]["level"] in ("undergraduate", "graduate", "doctorate")
+
+
+def test_export_departments_csv_gzip(client, api_headers):
+    from cursus.models import Department
+
+    res = client.get(
+        "/api/v1/export/departments?format=csv",
+        headers={**api_headers, "Accept-Encoding": "gzip"},
+    )
+
+    assert res.status_code == 200
+    assert res.headers["Content-Encoding"] == "gzip"
+
+    rows = list(
+        csv.DictReader(io.StringIO(gzip.decompress(res.data).decode()))
+    )
+
+    assert len(rows) == Department.query.count()
+    assert rows[0]["active"] in ("true", "false")
+
+
+def test_export_invalid_format(client, api_headers):
+    res = client.get("/api/v1/export/schools?format=xml", headers=api_headers)
+
+    assert res.status_code == 400
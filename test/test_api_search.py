@@ -5,3 +5,364 @@ Test module for Cursus API search endpoints
 """
 
 import os
+import re
+
+import pytest
+
+from cursus.util.search import (
+    LikeSearchBackend,
+    SearchBackend,
+    TrigramSearchBackend,
+)
+
+
+def test_search_pattern_escapes_wildcards():
+    backend = TrigramSearchBackend()
+
+    assert backend.pattern("harvard") == "%harvard%"
+    assert backend.pattern("100%") == "%100\\%%"
+    assert backend.pattern("a_b") == "%a\\_b%"
+    assert LikeSearchBackend().pattern("a\\b") == "%a\\\\b%"
+
+
+def test_search_backend_requires_every_method():
+    class ContainsOnly(SearchBackend):
+        def contains(self, column, query):
+            return column.contains(query)
+
+    with pytest.raises(TypeError):
+        ContainsOnly()
+
+
+@pytest.mark.parametrize(
+    "endpoint", ["university", "school", "department", "course"]
+)
+def test_search_requires_query(client, api_headers, endpoint):
+    res = client.get(f"/api/v1/search/{endpoint}", headers=api_headers)
+
+    assert res.status_code == 400
+
+    res = client.get(
+        f"/api/v1/search/{endpoint}?query=ab", headers=api_headers
+    )
+
+    assert res.status_code == 400
+    assert (
+        res.get_json()["error"]["reason"]
+        == "Query string must be at least 3 characters long"
+    )
+
+
+def test_search_wildcards_match_literally(client, api_headers):
+    res = client.get(
+        "/api/v1/search/university?query=%25%25%25", headers=api_headers
+    )
+
+    assert res.status_code == 200
+    assert res.get_json()["total"] == 0
+
+
+def test_search_total_matches_results(client, api_headers):
+    res = client.get(
+        "/api/v1/search/university?query=university", headers=api_headers
+    )
+    json_data = res.get_json()
+
+    assert res.status_code == 200
+    assert json_data["total"] >= json_data["count"]
+    assert json_data["pages"] == -(-json_data["total"] // 10)
+    assert json_data["has_next"] == (json_data["pages"] > 1)
+
+
+def test_search_without_total(client, api_headers):
+    res = client.get(
+        "/api/v1/search/university?query=university&total=false",
+        headers=api_headers,
+    )
+    json_data = res.get_json()
+
+    assert res.status_code == 200
+    assert json_data["total"] is None
+    assert json_data["pages"] is None
+    assert "has_next" in json_data
+
+
+def test_search_cursor_pagination(client, api_headers):
+    url = "/api/v1/search/university?query=university&sort_by_year=asc"
+
+    offset_ids = []
+    page = 1
+
+    while True:
+        json_data = client.get(f"{url}&page={page}", headers=api_headers)
+        json_data = json_data.get_json()
+        offset_ids += [item["id"] for item in json_data["results"]]
+
+        if not json_data["has_next"]:
+            break
+
+        page += 1
+
+    cursor_ids = []
+    cursor = ""
+
+    while True:
+        res = client.get(f"{url}&cursor={cursor}", headers=api_headers)
+        json_data = res.get_json()
+
+        assert res.status_code == 200
+        assert json_data["page"] is None
+
+        cursor_ids += [item["id"] for item in json_data["results"]]
+        cursor = json_data["next_cursor"]
+
+        if not cursor:
+            break
+
+    assert len(cursor_ids) == len(set(cursor_ids))
+    assert sorted(cursor_ids) == sorted(offset_ids)
+
+
+@pytest.mark.parametrize("mode", ["page=1", "cursor="])
+def test_search_year_sort_is_the_same_in_both_modes(
+    db, client, api_headers, mode
+):
+    import sqlalchemy as sa
+
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    sa.event.listen(db.engine, "before_cursor_execute", capture)
+
+    try:
+        res = client.get(
+            f"/api/v1/search/university?query=university&sort_by_year=desc"
+            f"&{mode}",
+            headers=api_headers,
+        )
+    finally:
+        sa.event.remove(db.engine, "before_cursor_execute", capture)
+
+    assert res.status_code == 200
+
+    # Universities without a founding year sort as year 0 in either mode,
+    # and not where the database puts NULL
+    order_by = [
+        statement.split("ORDER BY", 1)[1]
+        for statement in statements
+        if "FROM universities" in statement and "ORDER BY" in statement
+    ]
+
+    # The bind parameter of the default year depends on the driver
+    coalesce = re.compile(r"\s*coalesce\(universities\.established, [^)]+\)")
+
+    assert order_by
+    assert all(coalesce.match(clause) for clause in order_by)
+
+
+def test_search_invalid_cursor(client, api_headers):
+    res = client.get(
+        "/api/v1/search/course?query=science&cursor=not-a-cursor",
+        headers=api_headers,
+    )
+
+    assert res.status_code == 400
+
+
+def test_search_course_fulltext(client, api_headers):
+    url = "/api/v1/search/course?query=learn%20biology&mode=fulltext"
+
+    res = client.get(url, headers=api_headers)
+    json_data = res.get_json()
+
+    assert res.status_code == 200
+    assert json_data["total"] > 0
+
+    ranks = [item["rank"] for item in json_data["results"]]
+
+    assert ranks == sorted(ranks, reverse=True)
+    assert all(
+        "biology" in item["highlight"].lower() for item in json_data["results"]
+    )
+
+    cursor_ids = []
+    cursor = ""
+
+    while True:
+        res = client.get(f"{url}&cursor={cursor}", headers=api_headers)
+        json_data = res.get_json()
+        cursor_ids += [item["id"] for item in json_data["results"]]
+        cursor = json_data["next_cursor"]
+
+        if not cursor:
+            break
+
+    assert len(cursor_ids) == len(set(cursor_ids))
+
+    res = client.get(
+        "/api/v1/search/course?query=learn&mode=regex", headers=api_headers
+    )
+
+    assert res.status_code == 400
+
+
+def test_fulltext_query_uses_search_vector():
+    from sqlalchemy.dialects import postgresql
+
+    from cursus.models import Course
+    from cursus.models.course import SEARCH_DOCUMENT
+
+    predicate, rank = TrigramSearchBackend().fulltext(
+        Course.search_vector, SEARCH_DOCUMENT, "machine learning"
+    )
+    sql = str(predicate.compile(dialect=postgresql.dialect()))
+
+    assert sql.startswith("courses.search_vector @@ websearch_to_tsquery(")
+    assert "ts_rank(courses.search_vector" in str(
+        rank.compile(dialect=postgresql.dialect())
+    )
+
+
+def test_fulltext_cursor_compares_double_precision_rank():
+    from sqlalchemy.dialects import postgresql
+
+    from cursus.models import Course
+    from cursus.models.course import SEARCH_DOCUMENT
+    from cursus.util.pagination import SortKey, _seek_predicate
+
+    _, rank = TrigramSearchBackend().fulltext(
+        Course.search_vector, SEARCH_DOCUMENT, "machine learning"
+    )
+    keys = [SortKey("rank", rank, descending=True), SortKey("id", Course.id)]
+    sql = str(
+        _seek_predicate(keys, [0.0607927, 42]).compile(
+            dialect=postgresql.dialect()
+        )
+    )
+
+    # Every comparison with the rank of the cursor is in double precision
+    assert sql.count("ts_rank(") == 2
+    assert sql.count("CAST(ts_rank(") == 2
+    assert "AS DOUBLE PRECISION)" in sql
+
+
+def test_schema_registry_reuses_instances():
+    from cursus.schema import CourseSchema, get_schema
+
+    schema = get_schema(CourseSchema, ("id", "title"))
+
+    assert get_schema(CourseSchema, ["title", "id"]) is schema
+    assert get_schema(CourseSchema, ("id", "title"), many=True) is not schema
+    assert set(schema.dump_fields) == {"id", "title"}
+
+
+def test_row_serializer_matches_schema(app):
+    from cursus.models import Course, Department
+    from cursus.schema import CourseSchema, get_schema
+    from cursus.schema.fast import get_row_serializer
+    from cursus.util.extensions import db
+
+    only = ("id", "title", "code", "level", "active", "department_name")
+    rows = (
+        db.session.query(
+            *Course.__table__.c, Department.name.label("department_name")
+        )
+        .join(Department, onclause=Department.id == Course.department_id)
+        .limit(20)
+        .all()
+    )
+
+    expected = get_schema(CourseSchema, only).dump(rows, many=True)
+
+    assert get_row_serializer(CourseSchema, only).dump(rows) == expected
+
+
+def test_search_all(client, api_headers):
+    res = client.get(
+        "/api/v1/search/all?query=harvard&limit=2", headers=api_headers
+    )
+    json_data = res.get_json()
+
+    assert res.status_code == 200
+    assert set(json_data["results"]) == {
+        "university",
+        "school",
+        "department",
+        "course",
+    }
+
+    for entity, group in json_data["results"].items():
+        single = client.get(
+            f"/api/v1/search/{entity}?query=harvard", headers=api_headers
+        ).get_json()
+
+        assert group["total"] == single["total"]
+        assert len(group["results"]) == min(2, single["total"])
+
+    university = json_data["results"]["university"]["results"][0]
+
+    assert university["code"] == "harvard"
+    assert json_data["total"] == sum(
+        group["total"] for group in json_data["results"].values()
+    )
+
+
+def test_search_course_facets(client, api_headers):
+    url = "/api/v1/search/course?query=topic&facets=level,university,active"
+
+    res = client.get(url, headers=api_headers)
+    json_data = res.get_json()
+
+    assert res.status_code == 200
+    assert set(json_data["facets"]) == {"level", "university", "active"}
+
+    for items in json_data["facets"].values():
+        assert sum(item["count"] for item in items) == json_data["total"]
+
+    levels = {item["label"] for item in json_data["facets"]["level"]}
+    assert levels <= {"undergraduate", "graduate", "doctorate", "unknown"}
+
+    # The counts of a facet match the results of the matching filter
+    graduate = [
+        item["count"]
+        for item in json_data["facets"]["level"]
+        if item["label"] == "graduate"
+    ]
+    filtered = client.get(
+        "/api/v1/search/course?query=topic&filters=grad", headers=api_headers
+    ).get_json()
+
+    assert graduate == ([filtered["total"]] if filtered["total"] else [])
+
+    # Pagination and argument order share the cached counts
+    res = client.get(
+        "/api/v1/search/course?facets=active,level,university&page=2"
+        "&query=TOPIC",
+        headers=api_headers,
+    )
+
+    assert res.get_json()["facets"] == json_data["facets"]
+
+
+def test_search_department_facets(client, api_headers):
+    res = client.get(
+        "/api/v1/search/department?query=science&facets=school,graduate",
+        headers=api_headers,
+    )
+    json_data = res.get_json()
+
+    assert res.status_code == 200
+    assert (
+        sum(item["count"] for item in json_data["facets"]["school"])
+        == json_data["total"]
+    )
+    assert all("label" in item for item in json_data["facets"]["school"])
+
+    res = client.get(
+        "/api/v1/search/department?query=science&facets=level",
+        headers=api_headers,
+    )
+
+    assert res.status_code == 400
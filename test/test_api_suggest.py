@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+
+"""
+Test module for the Cursus suggest (typeahead) endpoint
+"""
+
+from cursus.util.suggest import PrefixIndex, Suggestion, normalize
+
+
+def _index():
+    return PrefixIndex(
+        [
+            (
+                Suggestion("university", 1, "Harvey Mudd College"),
+                ["Harvey Mudd College", "hmc"],
+            ),
+            (
+                Suggestion("university", 2, "Harvard University"),
+                ["Harvard University", "harvard"],
+            ),
+            (Suggestion("school", 3, "Harvard Law School"), ["Harvard Law"]),
+            (Suggestion("course", 4, "Intro to Law"), ["Intro to Law"]),
+        ]
+    )
+
+
+def test_normalize():
+    assert normalize("  Université   de Montréal ") == "universite de montreal"
+
+
+def test_prefix_index_search():
+    index = _index()
+
+    # Names starting with the prefix come before later words, and shorter
+    # names come first
+    assert [s.id for s in index.search("harv")] == [2, 3, 1]
+    assert [s.id for s in index.search("LAW")] == [3, 4]
+    assert [s.id for s in index.search("mudd")] == [1]
+    assert [s.id for s in index.search("hm")] == [1]
+    assert [s.id for s in index.search("harv", limit=1)] == [2]
+    assert [s.id for s in index.search("harv", types=["school"])] == [3]
+    assert index.search("   ") == []
+    assert index.search("yale") == []
+
+
+def test_suggest_endpoint(client, api_headers):
+    from cursus.models import University
+
+    university = University.query.first()
+
+    res = client.get(
+        f"/api/v1/suggest?query={university.full_name[:4]}&type=university",
+        headers=api_headers,
+    )
+    json_data = res.get_json()
+
+    assert res.status_code == 200
+    assert {
+        "type": "university",
+        "id": university.id,
+        "name": university.full_name,
+    } in json_data["results"]
+
+    res = client.get("/api/v1/suggest?query=", headers=api_headers)
+    assert res.status_code == 400
+
+    res = client.get("/api/v1/suggest?query=a&type=city", headers=api_headers)
+    assert res.status_code == 400
+
+
+def test_suggest_rate_limit_weight(client, api_headers):
+    def remaining():
+        res = client.get("/api/v1/suggest?query=harv", headers=api_headers)
+        assert res.status_code == 200
+
+        return float(res.headers["X-Cursus-Remaining"])
+
+    # Ten suggestions weigh as much as a single search
+    before = remaining()
+
+    for _ in range(9):
+        after = remaining()
+
+    assert before - after <= 1
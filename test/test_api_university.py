@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+
+"""
+Test module for Cursus API university endpoints
+"""
+
+import pytest
+
+from cursus.util.extensions import reference_snapshot
+
+URLS = [
+    "/api/v1/university/{}",
+    "/api/v1/university/{}/domains",
+    "/api/v1/university/{}/domains?type=index",
+    "/api/v1/university/{}/domains?locale=EN&total=false",
+    "/api/v1/university/{}/domains?locale=_",
+    "/api/v1/university/{}/domains?page=2",
+    "/api/v1/university/{}/domains?cursor=",
+    "/api/v1/university/{}/campuses",
+    "/api/v1/university/{}/founders?page=0",
+]
+
+
+@pytest.mark.parametrize("url", URLS)
+@pytest.mark.parametrize("short_name", ["harvard", "hmc", "not-a-school"])
+def test_university_snapshot_matches_database(
+    app, client, api_headers, url, short_name
+):
+    responses = []
+    app.config["RESPONSE_CACHE"] = False
+
+    for enabled in (False, True):
+        app.config["REFERENCE_SNAPSHOT"] = enabled
+        res = client.get(url.format(short_name), headers=api_headers)
+        responses.append((res.status_code, res.get_json()))
+
+    app.config["REFERENCE_SNAPSHOT"] = True
+    app.config["RESPONSE_CACHE"] = True
+
+    assert responses[0] == responses[1]
+
+
+def test_university_snapshot_cursor_pages(client, api_headers, db):
+    from cursus.models.university import UniversityDomain
+
+    domains = UniversityDomain.query.order_by(UniversityDomain.id).all()
+    short_name = domains[0].school_short_name
+    expected = [
+        domain.domain_name
+        for domain in domains
+        if domain.school_short_name == short_name
+    ]
+
+    names, cursor = [], ""
+
+    while cursor is not None:
+        res = client.get(
+            f"/api/v1/university/{short_name}/domains?cursor={cursor}",
+            headers=api_headers,
+        )
+        json_data = res.get_json()
+
+        names.extend(domain["domain_name"] for domain in json_data["resullt"])
+        cursor = json_data["next_cursor"]
+
+    assert names == expected
+
+
+def test_university_snapshot_refreshes_on_change(app, db):
+    import datetime
+
+    from cursus.models.university import UniversityFounder
+
+    app.config["REFERENCE_SNAPSHOT_INTERVAL"] = 0
+    snapshot = reference_snapshot.get()
+
+    assert reference_snapshot.get() is snapshot
+
+    founder = UniversityFounder.query.first()
+    first_name, updated_at = founder.first_name, founder.updated_at
+    founder.first_name = f"{founder.first_name}-changed"
+    founder.updated_at = datetime.datetime.now() + datetime.timedelta(days=1)
+    db.session.commit()
+
+    try:
+        refreshed = reference_snapshot.get()
+
+        assert refreshed is not snapshot
+        assert any(
+            item.first_name == founder.first_name
+            for item in refreshed.founders[founder.school_short_name]
+        )
+    finally:
+        founder.first_name, founder.updated_at = first_name, updated_at
+        db.session.commit()
+        app.config["REFERENCE_SNAPSHOT_INTERVAL"] = 60
+
+
+def test_university_snapshot_reloads_after_max_age(app):
+    app.config["REFERENCE_SNAPSHOT_INTERVAL"] = 0
+    snapshot = reference_snapshot.get()
+
+    assert reference_snapshot.get() is snapshot
+
+    app.config["REFERENCE_SNAPSHOT_MAX_AGE"] = 0
+
+    try:
+        assert reference_snapshot.get() is not snapshot
+    finally:
+        app.config["REFERENCE_SNAPSHOT_INTERVAL"] = 60
+        app.config["REFERENCE_SNAPSHOT_MAX_AGE"] = 60 * 60
@@ -50,3 +50,302 @@ def test_apis_with_key(app, client, admin):
         assert res.status_code == 200
 
         logout_user()
+
+
+def test_apis_rate_limit_headers(app, client, admin):
+    with app.test_request_context():
+        login_user(admin)
+
+        user = app.login_manager._user_callback(admin.id)
+        headers = {"X-CURSUS-API-TOKEN": user.active_token}
+
+        res = client.get(
+            "/api/v1/search/university?query=harvard", headers=headers
+        )
+        remaining = int(res.headers["X-Cursus-Remaining"])
+
+        assert res.headers["X-Cursus-Limit"] == str(
+            app.config["RATELIMIT_LIMIT"]
+        )
+        assert int(res.headers["X-Cursus-TTL"]) > 0
+
+        # Bad requests are not counted against the rate limit
+        res = client.get(
+            "/api/v1/search/university?query=ab", headers=headers
+        )
+
+        assert res.status_code == 400
+        assert int(res.headers["X-Cursus-Remaining"]) == remaining
+
+        res = client.get(
+            "/api/v1/search/university?query=harvard", headers=headers
+        )
+
+        assert int(res.headers["X-Cursus-Remaining"]) == remaining - 1
+
+        logout_user()
+
+
+def test_memory_rate_limit_fixed_window():
+    from cursus.util.ratelimit import MemoryStorage
+
+    storage = MemoryStorage("fixed")
+
+    for i in range(3):
+        result = storage.hit("token", 3, 60, 1, 1000.0 + i)
+        assert result.allowed
+        assert result.remaining == 2 - i
+
+    result = storage.hit("token", 3, 60, 1, 1010.0)
+
+    assert not result.allowed
+    assert result.remaining == 0
+    assert result.ttl == 50
+
+    # The window resets once it expires
+    assert storage.hit("token", 3, 60, 1, 1060.0).allowed
+
+
+def test_memory_rate_limit_sliding_window():
+    from cursus.util.ratelimit import MemoryStorage
+
+    storage = MemoryStorage("sliding")
+
+    # Fill the limit at the end of a window [960, 1020)
+    for _ in range(4):
+        assert storage.hit("token", 4, 60, 1, 1019.0).allowed
+
+    # Half way through the next window, half of the previous count remains
+    assert storage.hit("token", 4, 60, 1, 1050.0).allowed
+    assert storage.hit("token", 4, 60, 1, 1050.0).allowed
+    assert not storage.hit("token", 4, 60, 1, 1050.0).allowed
+
+    # Weights can be fractional
+    assert not storage.hit("token", 4, 60, 0.5, 1050.0).allowed
+    assert storage.hit("token", 4, 60, 0.5, 1079.0).allowed
+
+
+def test_local_token_cache_eviction():
+    from cachelib import SimpleCache
+    from cursus.util.token_cache import LocalTokenCache, MISSING
+
+    now = [0.0]
+    local = LocalTokenCache(
+        size=2, ttl=10, sync_interval=5, clock=lambda: now[0]
+    )
+
+    local.set("a", "user-a")
+    local.set("b", "user-b")
+
+    assert local.get("a") == "user-a"
+
+    # "b" is the least recently used token
+    local.set("c", False)
+
+    assert local.get("b") is MISSING
+    assert local.get("c") is False
+
+    now[0] = 11.0
+
+    assert local.get("a") is MISSING
+
+    # Invalidating a token in one worker drops the tokens of other workers
+    # once they sync with the shared version counter
+    shared = SimpleCache()
+    worker_1 = LocalTokenCache(2, 60, 5, shared, clock=lambda: now[0])
+    worker_2 = LocalTokenCache(2, 60, 5, shared, clock=lambda: now[0])
+
+    worker_1.set("token", "user")
+    worker_2.set("token", "user")
+
+    assert worker_2.get("token") == "user"
+
+    worker_1.invalidate("token")
+
+    assert worker_1.get("token") is MISSING
+    assert worker_2.get("token") == "user"
+
+    now[0] = 20.0
+
+    assert worker_2.get("token") is MISSING
+
+
+def test_local_token_cache_syncs_without_lock():
+    from cachelib import SimpleCache
+    from cursus.util.token_cache import LocalTokenCache
+
+    class SharedCache(SimpleCache):
+        def get(self, key):
+            # Other request threads can use the local cache meanwhile
+            assert not local._lock.locked()
+            self.reads += 1
+
+            return super().get(key)
+
+    shared = SharedCache()
+    shared.reads = 0
+    now = [0.0]
+    local = LocalTokenCache(2, 60, 5, shared, clock=lambda: now[0])
+
+    local.set("token", "user")
+
+    assert local.get("token") == "user"
+    assert local.get("token") == "user"
+    assert shared.reads == 1
+
+
+def test_apis_response_cache_etag(app, client, api_headers):
+    import uuid
+
+    # A unique argument keeps entries cached by earlier runs out of the way
+    nonce = uuid.uuid4().hex
+    url = f"/api/v1/university/harvard/domains?page=1&type=index&n={nonce}"
+    first = client.get(url, headers=api_headers)
+
+    assert first.status_code == 200
+    assert first.headers["X-Cursus-Cache"] == "MISS"
+    assert first.headers["Cache-Control"] == "no-cache"
+
+    etag = first.headers["ETag"]
+
+    # The same arguments in another order hit the same cache entry
+    second = client.get(
+        f"/api/v1/university/harvard/domains?n={nonce}&type=index&page=1",
+        headers=api_headers,
+    )
+
+    assert second.headers["X-Cursus-Cache"] == "HIT"
+    assert second.headers["ETag"] == etag
+    assert second.get_data() == first.get_data()
+
+    not_modified = client.get(
+        url, headers={**api_headers, "If-None-Match": etag}
+    )
+
+    assert not_modified.status_code == 304
+    assert not_modified.get_data() == b""
+
+    # Cached and conditional responses still count against the rate limit
+    remaining = [
+        int(res.headers["X-Cursus-Remaining"])
+        for res in (first, second, not_modified)
+    ]
+
+    assert remaining == [remaining[0], remaining[0] - 1, remaining[0] - 2]
+
+
+def test_apis_response_cache_skips_search(client, api_headers):
+    res = client.get(
+        "/api/v1/search/university?query=harvard", headers=api_headers
+    )
+
+    assert res.status_code == 200
+    assert "X-Cursus-Cache" not in res.headers
+    assert "ETag" not in res.headers
+
+
+def test_apis_batch_preserves_order_and_reports_missing(client, api_headers):
+    from cursus.models import Course
+
+    ids = [course.id for course in Course.query.limit(3).all()][::-1]
+    missing = max(ids) + 1000
+    query = ",".join(str(id) for id in [*ids, missing, ids[0]])
+
+    res = client.get(f"/api/v1/course/batch?ids={query}", headers=api_headers)
+    json_data = res.get_json()
+
+    assert res.status_code == 200
+    assert [course["id"] for course in json_data["result"]] == ids
+    assert json_data["missing"] == [missing]
+    assert json_data["count"] == len(ids)
+
+
+def test_apis_batch_rate_limit_weight(client, api_headers):
+    from cursus.models import Department
+
+    ids = [department.id for department in Department.query.limit(2).all()]
+    query = ",".join(str(id) for id in ids)
+
+    first = client.get(
+        f"/api/v1/school/batch?ids={ids[0]}&show_deps=true",
+        headers=api_headers,
+    )
+    second = client.get(
+        f"/api/v1/department/batch?ids={query}", headers=api_headers
+    )
+    invalid = client.get("/api/v1/school/batch?ids=1,a", headers=api_headers)
+
+    assert first.status_code == 200
+    assert second.status_code == 200
+    assert invalid.status_code == 400
+
+    remaining = [
+        int(res.headers["X-Cursus-Remaining"])
+        for res in (first, second, invalid)
+    ]
+
+    # A batch weighs one per item, and a rejected batch is refunded
+    assert remaining[1] == remaining[0] - len(ids)
+    assert remaining[2] == remaining[1]
+
+
+def test_apis_batch_too_many_ids_is_bad_request(app, client, api_headers):
+    # More IDs than the remaining requests of the token
+    ids = ",".join(str(id) for id in range(1, 10**4))
+    res = client.get(f"/api/v1/course/batch?ids={ids}", headers=api_headers)
+
+    assert len(ids.split(",")) > app.config["BATCH_MAX_IDS"]
+    assert res.status_code == 400
+
+
+def test_school_department_count_is_maintained(db):
+    from cursus.models import Department, School
+
+    school = School.query.first()
+    count = school.department_count
+    moved = Department.query.filter(Department.school_id != school.id).first()
+
+    department = Department("Count Test", "CT1", None, school.id)
+    department.university_id = school.university_id
+    department.undergraduate = True
+    department.special_name = "-"
+    db.session.add(department)
+    db.session.flush()
+
+    moved_from = moved.school_id
+    moved.school_id = school.id
+    db.session.flush()
+
+    db.session.refresh(school)
+    assert school.department_count == count + 2
+    assert db.session.get(School, moved_from).department_count == (
+        Department.query.filter_by(school_id=moved_from).count()
+    )
+
+    db.session.delete(department)
+    db.session.flush()
+    db.session.refresh(school)
+    assert school.department_count == count + 1
+
+    db.session.rollback()
+
+
+def test_school_total_departments(client, api_headers):
+    from cursus.models import School
+
+    school = School.query.first()
+
+    res = client.get(f"/api/v1/school/{school.id}", headers=api_headers)
+    result = res.get_json()["result"]
+
+    assert res.status_code == 200
+    assert result["total_departments"] == len(school.departments)
+    assert "departments" not in result
+
+    res = client.get(
+        f"/api/v1/school/{school.id}?show_deps=true", headers=api_headers
+    )
+
+    assert len(res.get_json()["result"]["departments"]) == len(
+        school.departments
+    )
@@ -0,0 +1,278 @@
+# -*- coding: utf-8 -*-
+
+"""
+Test module for the TSV data loader
+"""
+
+import os
+
+import pytest
+import sqlalchemy as sa
+
+from sqlalchemy.orm import Session
+
+from cursus.models import (
+    Course,
+    Department,
+    School,
+    University,
+    UniversityDomain,
+)
+from cursus.util.data_loader import Changeset, DataLoadError, load_data
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), os.pardir, "data")
+
+CATALOG = ["universities", "schools", "departments", "courses"]
+
+UNIVERSITIES = """\
+full_name\tshort_name\testablished\tformer_name\tmotto\ttype
+Harvey Mudd College\thmc\t1955\t\tAmat Victoria Curam\tprivate
+Harvard University\tharvard\t1636\t\tVeritas\tprivate
+"""
+
+DOMAINS = """\
+school_short_name\tiso639_1\tdomain_name\ttype
+hmc\ten\thttps://www.hmc.edu/\tindex
+harvard\ten\thttps://www.harvard.edu/\tsub
+harvard\ten\thttps://www.harvard.edu/\tindex
+unknown\ten\thttps://www.example.edu/\tindex
+"""
+
+
+@pytest.fixture
+def session():
+    engine = sa.create_engine("sqlite://")
+
+    for model in (University, UniversityDomain, School, Department, Course):
+        model.__table__.create(engine)
+
+    with Session(engine) as session:
+        yield session
+
+    engine.dispose()
+
+
+def _write(directory, universities=UNIVERSITIES, domains=DOMAINS):
+    (directory / "top-100-universities.tsv").write_text(universities)
+    (directory / "top-100-university-domains.tsv").write_text(domains)
+
+
+def _counts(reports):
+    return {
+        report.table: (
+            report.inserted,
+            report.updated,
+            report.unchanged,
+            report.skipped,
+        )
+        for report in reports
+    }
+
+
+def test_load_data_upserts_and_reports(session, tmp_path):
+    _write(tmp_path)
+    only = ["universities", "university_domains"]
+
+    reports = load_data(session, str(tmp_path), only=only, batch_size=1)
+
+    # The duplicated domain keeps its last row and the unknown university is
+    # skipped
+    assert _counts(reports) == {
+        "universities": (2, 0, 0, 0),
+        "university_domains": (2, 0, 0, 2),
+    }
+    assert (
+        session.scalar(
+            sa.select(UniversityDomain.type).where(
+                UniversityDomain.school_short_name == "harvard"
+            )
+        )
+        == "index"
+    )
+
+    _write(tmp_path, universities=UNIVERSITIES.replace("1636", "1637"))
+
+    reports = load_data(session, str(tmp_path), only=only)
+
+    assert _counts(reports) == {
+        "universities": (0, 1, 1, 0),
+        "university_domains": (0, 0, 2, 2),
+    }
+    assert (
+        session.scalar(
+            sa.select(University.established).where(
+                University.short_name == "harvard"
+            )
+        )
+        == 1637
+    )
+
+
+def test_load_data_sync_deletes_and_reports_changeset(session, tmp_path):
+    _write(tmp_path)
+    load_data(session, str(tmp_path), only=["universities"])
+
+    hmc = session.execute(
+        sa.select(University.id, University.updated_at).where(
+            University.short_name == "hmc"
+        )
+    ).one()
+
+    universities = UNIVERSITIES.replace("1955", "1956").replace(
+        "Harvard University\tharvard\t1636\t\tVeritas\tprivate\n",
+        "Yale University\tyale\t1701\t\tLux et veritas\tprivate\n",
+    )
+    _write(tmp_path, universities=universities)
+
+    changeset = Changeset()
+    reports = load_data(
+        session,
+        str(tmp_path),
+        only=["universities"],
+        sync=True,
+        changeset=changeset,
+    )
+
+    assert reports[0].deleted == 1
+    assert _counts(reports) == {"universities": (1, 1, 0, 0)}
+
+    changes = changeset.to_dict()["universities"]
+    assert [row["short_name"] for row in changes["inserted"]] == ["yale"]
+    assert changes["updated"] == [{"id": hmc.id, "short_name": "hmc"}]
+    assert [row["short_name"] for row in changes["deleted"]] == ["harvard"]
+    assert session.scalars(
+        sa.select(University.short_name).order_by(University.short_name)
+    ).all() == ["hmc", "yale"]
+
+    # Reloading the same files touches nothing
+    changeset = Changeset()
+    reports = load_data(
+        session,
+        str(tmp_path),
+        only=["universities"],
+        sync=True,
+        changeset=changeset,
+    )
+
+    assert _counts(reports) == {"universities": (0, 0, 2, 0)}
+    assert len(changeset) == 0
+
+
+def test_load_data_sync_keeps_rows_without_hash(session, tmp_path):
+    _write(tmp_path)
+    load_data(session, str(tmp_path), only=["universities"])
+
+    # A university added through the application has no content hash
+    session.execute(
+        sa.insert(University).values(
+            full_name="Yale University",
+            short_name="yale",
+            established=1701,
+            type="private",
+        )
+    )
+    session.commit()
+
+    _write(
+        tmp_path,
+        universities=UNIVERSITIES.replace(
+            "Harvard University\tharvard\t1636\t\tVeritas\tprivate\n", ""
+        ),
+    )
+
+    reports = load_data(
+        session, str(tmp_path), only=["universities"], sync=True
+    )
+
+    assert reports[0].deleted == 1
+    assert session.scalars(
+        sa.select(University.short_name).order_by(University.short_name)
+    ).all() == ["hmc", "yale"]
+
+
+def test_load_data_directory(session):
+    def rows(file_name):
+        with open(os.path.join(DATA_DIR, file_name), encoding="utf-8") as f:
+            return sum(1 for _ in f) - 1
+
+    reports = load_data(session, DATA_DIR, only=CATALOG)
+
+    # Parents are found by their natural keys, so every row is loaded into
+    # an empty database
+    assert _counts(reports) == {
+        "universities": (rows("top-100-universities.tsv"), 0, 0, 0),
+        "schools": (rows("initial-school.tsv"), 0, 0, 0),
+        "departments": (rows("initial-departments.tsv"), 0, 0, 0),
+        "courses": (rows("initial-courses.tsv"), 0, 0, 0),
+    }
+
+    for model, file_name in (
+        (School, "initial-school.tsv"),
+        (Department, "initial-departments.tsv"),
+        (Course, "initial-courses.tsv"),
+    ):
+        count = session.scalar(sa.select(sa.func.count()).select_from(model))
+
+        assert count == rows(file_name)
+
+    # Departments belong to a school of their own university
+    assert not session.scalar(
+        sa.select(sa.func.count())
+        .select_from(Department)
+        .join(School, School.id == Department.school_id)
+        .where(School.university_id != Department.university_id)
+    )
+
+    reports = load_data(session, DATA_DIR, only=CATALOG, sync=True)
+
+    assert all(report.unchanged == report.staged for report in reports)
+    assert not any(report.deleted for report in reports)
+
+
+def test_load_data_fails_on_missing_parents(session, tmp_path):
+    _write(tmp_path)
+    (tmp_path / "initial-school.tsv").write_text(
+        "name\twebsite\tuniversity_short_name\n"
+        "School of Engineering\t\tharvard\n"
+        "School of Arts\t\tunknown\n"
+    )
+
+    load_data(session, str(tmp_path), only=["universities"])
+
+    with pytest.raises(DataLoadError, match="1 rows of initial-school.tsv"):
+        load_data(session, str(tmp_path), only=["schools"])
+
+    assert not session.scalar(sa.select(sa.func.count()).select_from(School))
+
+
+def test_load_data_resolves_departments_through_their_school(
+    session, tmp_path
+):
+    _write(tmp_path)
+    (tmp_path / "initial-school.tsv").write_text(
+        "name\twebsite\tuniversity_short_name\n"
+        "School of Engineering\t\tharvard\n"
+        "School of Arts\t\tharvard\n"
+    )
+    (tmp_path / "initial-departments.tsv").write_text(
+        "name\tcode\tuniversity_short_name\tschool_name\n"
+        "Design Engineering\tDES\tharvard\tSchool of Engineering\n"
+        "Design\tDES\tharvard\tSchool of Arts\n"
+    )
+    (tmp_path / "initial-courses.tsv").write_text(
+        "title\tcode\tlevel\tsubject\tcredits\tuniversity_short_name"
+        "\tdepartment_code\tschool_name\n"
+        "Product Design\tDES 101\t1\tdesign\t4\tharvard"
+        "\tDES\tSchool of Engineering\n"
+        "Drawing\tDES 102\t1\tdesign\t4\tharvard\tDES\tSchool of Arts\n"
+    )
+
+    reports = load_data(session, str(tmp_path), only=CATALOG)
+
+    # Both schools have a DES department, so the school tells them apart
+    assert _counts(reports)["courses"] == (2, 0, 0, 0)
+    assert session.execute(
+        sa.select(Course.code, Department.name)
+        .join(Department, Department.id == Course.department_id)
+        .order_by(Course.code)
+    ).all() == [("DES 101", "Design Engineering"), ("DES 102", "Design")]
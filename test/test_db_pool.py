@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+
+"""
+Test module for the database connection pool configuration
+"""
+
+from flask import Flask
+
+from cursus.util.db_pool import DatabasePool, InstrumentedQueuePool
+
+
+def _configure(**config) -> dict:
+    app = Flask(__name__)
+    app.config.update(config)
+    DatabasePool(app)
+
+    return app.config
+
+
+def test_engine_options_from_config():
+    config = _configure(
+        SQLALCHEMY_DATABASE_URI="postgresql://localhost/cursus",
+        SQLALCHEMY_ENGINE_OPTIONS={"pool_recycle": 60},
+        SQLALCHEMY_BINDS={"replica": "postgresql://replica/cursus"},
+        DB_POOL_SIZE="12",
+        DB_POOL_PRE_PING="true",
+        DB_POOL_RECYCLE="1800",
+        DB_STATEMENT_TIMEOUT=5000,
+    )
+    options = config["SQLALCHEMY_ENGINE_OPTIONS"]
+
+    assert options["poolclass"] is InstrumentedQueuePool
+    assert options["pool_size"] == 12
+    assert options["pool_pre_ping"] is True
+    assert options["statement_timeout"] == 5000
+
+    # Explicit engine options take precedence over the variables
+    assert options["pool_recycle"] == 60
+
+    replica = config["SQLALCHEMY_BINDS"]["replica"]
+
+    assert replica["url"] == "postgresql://replica/cursus"
+    assert replica["pool_size"] == 12
+    assert replica["pool_name"] == "replica"
+
+
+def test_engine_options_of_sqlite():
+    config = _configure(
+        SQLALCHEMY_DATABASE_URI="sqlite://",
+        SQLALCHEMY_BINDS={"file": "sqlite:////tmp/cursus.db"},
+        DB_POOL_SIZE=12,
+        DB_STATEMENT_TIMEOUT=5000,
+    )
+
+    # The static pool of in-memory databases takes no pool options
+    assert "pool_size" not in config["SQLALCHEMY_ENGINE_OPTIONS"]
+
+    # No statement timeout outside of PostgreSQL
+    assert "statement_timeout" not in config["SQLALCHEMY_BINDS"]["file"]
+
+
+def test_pool_metrics(client, db):
+    assert isinstance(db.engine.pool, InstrumentedQueuePool)
+
+    with db.engine.connect():
+        body = client.get("/metrics").get_data(as_text=True)
+
+    assert (
+        'cursus_db_pool_connections{pool="default",state="checked_out"}'
+        in (body)
+    )
+    assert 'cursus_db_pool_checkout_seconds_count{pool="default"}' in body
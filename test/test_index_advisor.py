@@ -0,0 +1,27 @@
+# -*- coding: utf-8 -*-
+
+"""
+Test module for the index advisor of the API queries
+"""
+
+from cursus.util.index_advisor import advise
+
+
+def test_index_advisor_explains_catalogue(db):
+    reports = advise(db.session, min_rows=0)
+
+    assert {report.name for report in reports} >= {
+        "university_domains",
+        "courses_by_department",
+        "courses_by_ids",
+    }
+
+    by_name = {report.name: report for report in reports}
+
+    # Lookups by primary key never need a full scan
+    assert by_name["courses_by_ids"].findings == []
+
+    for report in reports:
+        assert all(
+            finding.table in db.metadata.tables for finding in report.findings
+        )
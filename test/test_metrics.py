@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+
+"""
+Test module for the Prometheus metrics
+"""
+
+import re
+import uuid
+import threading
+
+from flask import Flask
+
+from cursus.util.metrics import Metrics, Registry
+
+
+def _sample(body: str, name: str, **labels) -> float:
+    for line in body.splitlines():
+        if line.startswith("#"):
+            continue
+
+        sample, value = line.rsplit(" ", 1)
+
+        if sample.split("{")[0] != name:
+            continue
+
+        found = dict(re.findall(r'(\w+)="([^"]*)"', sample))
+
+        if all(found.get(key) == str(val) for key, val in labels.items()):
+            return float(value)
+
+    return 0.0
+
+
+def test_metrics_endpoint(client, api_headers):
+    url = "/api/v1/search/school?query=school"
+    cached_url = f"/api/v1/university/harvard/domains?n={uuid.uuid4().hex}"
+
+    before = client.get("/metrics").get_data(as_text=True)
+
+    for _ in range(2):
+        client.get(url, headers=api_headers)
+        client.get(cached_url, headers=api_headers)
+
+    res = client.get("/metrics")
+    body = res.get_data(as_text=True)
+
+    assert res.status_code == 200
+    assert res.headers["Content-Type"].startswith("text/plain")
+    assert "# TYPE cursus_http_request_duration_seconds histogram" in body
+
+    def delta(name, **labels):
+        return _sample(body, name, **labels) - _sample(before, name, **labels)
+
+    requests = {"endpoint": "api.search.school", "method": "GET"}
+
+    assert delta("cursus_http_requests_total", status=200, **requests) == 2
+    assert (
+        delta(
+            "cursus_http_request_duration_seconds_bucket",
+            endpoint="api.search.school",
+            le="+Inf",
+        )
+        == 2
+    )
+    assert delta("cursus_db_queries_total", endpoint="api.search.school") >= 1
+    assert delta("cursus_token_cache_lookups_total", result="local") >= 1
+    assert delta("cursus_response_cache_lookups_total", result="miss") == 1
+    assert delta("cursus_response_cache_lookups_total", result="hit") == 1
+
+
+def test_metrics_token(app, client, monkeypatch):
+    monkeypatch.setitem(app.config, "METRICS_TOKEN", "secret")
+
+    assert client.get("/metrics").status_code == 401
+
+    res = client.get("/metrics", headers={"Authorization": "Bearer secret"})
+
+    assert res.status_code == 200
+
+
+def test_metrics_require_token():
+    app = Flask(__name__)
+    app.config.update(METRICS_REQUIRE_TOKEN=True)
+    Metrics(app)
+
+    assert not app.config["METRICS"]
+    assert app.test_client().get("/metrics").status_code == 404
+
+    app = Flask(__name__)
+    app.config.update(METRICS_REQUIRE_TOKEN=True, METRICS_TOKEN="secret")
+    Metrics(app)
+
+    res = app.test_client().get(
+        "/metrics", headers={"Authorization": "Bearer secret"}
+    )
+
+    assert res.status_code == 200
+
+
+def test_registry_threads_and_processes(tmp_path, monkeypatch):
+    registry = Registry()
+    counter = registry.counter("hits_total", "Hits", ("kind",))
+    histogram = registry.histogram("latency_seconds", "Latency", (), (0.1,))
+
+    def work():
+        for _ in range(1000):
+            counter.inc("a")
+
+        histogram.observe(0.05)
+        histogram.observe(0.5)
+
+    threads = [threading.Thread(target=work) for _ in range(4)]
+
+    for thread in threads:
+        thread.start()
+
+    for thread in threads:
+        thread.join()
+
+    body = registry.exposition(registry.collect())
+
+    assert 'hits_total{kind="a"} 4000' in body
+    assert 'latency_seconds_bucket{le="0.1"} 4' in body
+    assert 'latency_seconds_bucket{le="+Inf"} 8' in body
+    assert "latency_seconds_count 8" in body
+
+    # The snapshot of another worker is added to the values of this one
+    monkeypatch.setattr("cursus.util.metrics.registry", registry)
+    (tmp_path / "1.json").write_text(
+        '{"counters": [["hits_total", ["a"], 5]], "histograms": []}'
+    )
+
+    body = registry.exposition(Metrics.collect(str(tmp_path)))
+
+    assert 'hits_total{kind="a"} 4005' in body
@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+
+"""
+Test module for the preforking server helpers
+"""
+
+import os
+import time
+import signal
+import socket
+import http.client
+import multiprocessing
+
+from cursus.util.prefork import (
+    MASTER_INTERVAL,
+    Prefork,
+    dispose_engines,
+    warm_up,
+)
+
+GRACEFUL_TIMEOUT = 10
+
+
+def test_warm_up_loads_caches(app):
+    warm_up(app)
+
+    assert app.extensions["cursus_suggest"].index is not None
+
+    if app.config["REFERENCE_SNAPSHOT"]:
+        assert app.extensions["cursus_snapshot"].snapshot is not None
+
+
+def test_dispose_engines(app, db):
+    engine = db.engine
+
+    with engine.connect():
+        pass
+
+    assert engine.pool.checkedin() >= 1
+
+    dispose_engines(app, close=False)
+
+    # A new, empty pool replaces the inherited one
+    assert engine.pool.checkedin() == 0
+
+
+def _serve(port: int, directory: str) -> None:
+    from cursus import create_app
+    from cursus.util.extensions import assets
+
+    def load():
+        assets._named_bundles = {}  # pylint: disable=protected-access
+        app = create_app("cursus.config.TestingConfig")
+        app.config.update(METRICS_DIR=directory, METRICS_FLUSH_INTERVAL=0)
+
+        return app
+
+    Prefork(
+        load,
+        host="127.0.0.1",
+        port=port,
+        workers=2,
+        threads=2,
+        graceful_timeout=GRACEFUL_TIMEOUT,
+    ).run()
+
+
+def _get(port: int) -> http.client.HTTPConnection:
+    deadline = time.monotonic() + 30
+
+    while True:
+        try:
+            connection = http.client.HTTPConnection("127.0.0.1", port)
+            connection.request("GET", "/robots.txt")
+            response = connection.getresponse()
+            response.read()
+            break
+        except OSError:
+            assert time.monotonic() < deadline
+            time.sleep(0.2)
+
+    assert response.status == 200
+
+    return connection
+
+
+def _snapshots(directory) -> set[int]:
+    return {
+        int(name.split(".")[0])
+        for name in os.listdir(directory)
+        if name.endswith(".json")
+    }
+
+
+def test_prefork_master(tmp_path):
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+
+    master = multiprocessing.get_context("fork").Process(
+        target=_serve, args=(port, str(tmp_path))
+    )
+    master.start()
+
+    try:
+        # The worker serving a request writes the snapshot of its metrics
+        _get(port).close()
+        served = _snapshots(tmp_path)
+
+        assert len(served) == 1
+
+        # A worker that dies is replaced
+        os.kill(served.pop(), signal.SIGKILL)
+        time.sleep(3 * MASTER_INTERVAL)
+
+        # An idle keep-alive connection doesn't hold up the graceful stop
+        idle = _get(port)
+        start = time.monotonic()
+        os.kill(master.pid, signal.SIGTERM)
+        master.join(GRACEFUL_TIMEOUT * 2)
+
+        assert master.exitcode == 0
+        assert time.monotonic() - start < GRACEFUL_TIMEOUT / 2
+
+        idle.close()
+    finally:
+        if master.is_alive():
+            master.kill()
+            master.join()
+
+    # The killed worker, and the two workers of the master that flushed their
+    # metrics when they stopped
+    assert len(_snapshots(tmp_path)) == 3
@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+
+"""
+Test module for the per-request SQL query statistics
+"""
+
+import logging
+
+import pytest
+
+from cursus.util.query_stats import assert_max_queries
+
+
+def test_query_stats_headers(app, client, api_headers, monkeypatch):
+    monkeypatch.setitem(app.config, "QUERY_STATS", True)
+
+    res = client.get("/api/v1/search/school?query=school", headers=api_headers)
+
+    assert res.status_code == 200
+    assert int(res.headers["X-Cursus-Queries"]) >= 1
+    assert res.headers["Server-Timing"].startswith("db;dur=")
+
+    monkeypatch.setitem(app.config, "QUERY_STATS", False)
+
+    res = client.get("/api/v1/search/school?query=school", headers=api_headers)
+
+    assert "X-Cursus-Queries" not in res.headers
+
+
+def test_slow_query_log(app, client, api_headers, monkeypatch, caplog):
+    monkeypatch.setitem(app.config, "QUERY_SLOW_THRESHOLD", 0)
+
+    with caplog.at_level(logging.WARNING, logger=app.logger.name):
+        client.get("/api/v1/search/school?query=school", headers=api_headers)
+
+    assert any(
+        "in api.search.school: SELECT" in record.getMessage()
+        for record in caplog.records
+    )
+
+
+@pytest.mark.parametrize(
+    "url, maximum",
+    [
+        # The page, the total and the departments of the page
+        ("/api/v1/search/school?query=school&display=departments", 3),
+        ("/api/v1/search/department?query=science", 2),
+        ("/api/v1/search/course?query=topic&display=all", 2),
+        ("/api/v1/search/all?query=science", 1),
+    ],
+)
+def test_search_query_counts(client, api_headers, url, maximum):
+    # A first request caches the API token
+    client.get(url, headers=api_headers)
+
+    with assert_max_queries(maximum):
+        res = client.get(url, headers=api_headers)
+
+    assert res.status_code == 200
+
+
+def test_assert_max_queries_fails(app):
+    from cursus.models import School
+
+    with pytest.raises(AssertionError, match="3 queries were run"):
+        with assert_max_queries(1):
+            # One query for the schools, and then one per school for its
+            # departments, which are loaded lazily
+            for school in School.query.limit(2).all():
+                school.departments
@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+
+"""
+Test module for the read-replica routing
+"""
+
+import os
+import shutil
+
+import pytest
+import sqlalchemy as sa
+
+from cursus import create_app
+from cursus.config import TestingConfig
+from cursus.models import ActiveToken
+from cursus.util.extensions import assets, db, replicas
+
+
+@pytest.fixture()
+def replica_app(tmp_path, monkeypatch):
+    """Return an application with a copy of the test database as replica
+    and an unreachable replica"""
+
+    source = sa.engine.make_url(os.environ["TEST_DATABASE_URL"]).database
+    replica = tmp_path / "replica.db"
+    shutil.copy(source, replica)
+
+    monkeypatch.setattr(
+        TestingConfig,
+        "DATABASE_REPLICA_URLS",
+        f"sqlite:///{replica}, sqlite:///{tmp_path}/missing/replica.db",
+        raising=False,
+    )
+    monkeypatch.setattr(
+        TestingConfig, "REPLICA_STICKY_WINDOW", 60, raising=False
+    )
+
+    assets._named_bundles = {}  # pylint: disable=protected-access
+    app = create_app("cursus.config.TestingConfig")
+
+    yield app
+
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose()
+
+
+def test_replica_binds(replica_app):
+    binds = replica_app.config["SQLALCHEMY_BINDS"]
+
+    assert set(binds) == {"replica_0", "replica_1"}
+    assert binds["replica_0"]["pool_name"] == "replica_0"
+
+
+def test_api_reads_from_replica(replica_app):
+    with replica_app.test_request_context("/api/v1/search/school"):
+        engine = db.session.get_bind()
+
+        assert engine is db.engines["replica_0"]
+
+        # Writes and the other requests stay on the primary
+        with replicas.primary():
+            assert db.session.get_bind() is db.engine
+
+    with replica_app.test_request_context("/profile"):
+        assert db.session.get_bind() is db.engine
+
+    with replica_app.test_request_context(
+        "/api/v1/search/school", method="POST"
+    ):
+        assert db.session.get_bind() is db.engine
+
+
+def test_unreachable_replica_fails_over(replica_app):
+    state = replica_app.extensions["cursus_replicas"]
+
+    # The round robin picks the second, unreachable, replica
+    with replica_app.test_request_context("/api/v1/search/school"):
+        assert db.session.get_bind() is db.engines["replica_0"]
+
+    with replica_app.test_request_context("/api/v1/search/school"):
+        assert db.session.get_bind() is db.engines["replica_0"]
+
+    assert "replica_1" in state.unhealthy
+
+    # Without healthy replicas, reads go to the primary
+    state.unhealthy["replica_0"] = float("inf")
+
+    with replica_app.test_request_context("/api/v1/search/school"):
+        assert db.session.get_bind() is db.engine
+
+
+def test_token_lookup_falls_back_to_primary(replica_app, api_headers):
+    with replica_app.app_context():
+        replica = db.engines["replica_0"]
+
+        with replica.begin() as connection:
+            connection.execute(sa.delete(ActiveToken.__table__))
+
+    client = replica_app.test_client()
+    res = client.get("/api/v1/search/school?query=school", headers=api_headers)
+
+    assert res.status_code == 200
+
+
+def test_sticky_window_after_write(replica_app, admin):
+    with replica_app.test_request_context("/profile"):
+        user = db.session.get(type(admin), admin.id)
+        user.name = user.name
+        db.session.flush()
+
+        assert db.session.info["written_users"] == {admin.id}
+
+        # Rolled back writes don't send the reads to the primary
+        db.session.rollback()
+
+        assert "written_users" not in db.session.info
+
+        replicas.stick([admin.id])
+
+    with replica_app.test_request_context("/api/v1/search/school"):
+        replicas.follow(admin.id)
+
+        assert db.session.get_bind() is db.engine
+
+    with replica_app.test_request_context("/api/v1/search/school"):
+        replicas.follow("someone-else")
+
+        assert db.session.get_bind() is db.engines["replica_0"]